@@ -4,3 +4,21 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Register token cache invalidation signals
+        from . import authentication  # noqa: F401
+        # Register chat search index maintenance
+        from . import search  # noqa: F401
+        # Trigram indexes for catalog search on PostgreSQL
+        from . import postgres  # noqa: F401
+        # Enroll staff users as chat agents
+        from . import routing  # noqa: F401
+        # Register the chat message counter
+        from . import metrics  # noqa: F401
+        # Log slow statements on every database connection
+        from . import slow_queries
+        slow_queries.install()
+        # WAL, pragmas and serialized writes when SQLITE_TUNING is enabled
+        from . import sqlite_tuning
+        sqlite_tuning.install()
@@ -0,0 +1,214 @@
+# server/api/authentication.py
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+TOKEN_CACHE_DEFAULTS = {
+    'TTL': 300,
+    'LOCAL_TTL': 30,
+    'LOCAL_MAX_ENTRIES': 2048,
+}
+
+
+def _token_cache_setting(name):
+    return getattr(settings, 'TOKEN_AUTH_CACHE', {}).get(name, TOKEN_CACHE_DEFAULTS[name])
+
+
+class LRUTTLCache:
+    """
+    Small thread-safe in-process LRU whose entries expire after ``ttl`` seconds.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TokenCache:
+    """
+    Maps token keys to ``{user_id, is_active, is_staff, is_superuser}``.
+
+    Lookups go to the in-process LRU first, then the shared Django cache,
+    and only then to the database. The shared cache also keeps a
+    user id -> token key entry so a user's token can be dropped without
+    knowing the key.
+
+    Every invalidation also bumps a generation counter in the shared
+    cache. LRU entries remember the generation they were stored under and
+    are only used while it is current, so a revoked token stops working
+    on every worker at once; a local hit costs one small cache read.
+    """
+    key_prefix = 'auth-token:'
+    user_prefix = 'auth-token-user:'
+    generation_key = 'auth-token-generation'
+
+    def __init__(self):
+        self.local = LRUTTLCache(
+            _token_cache_setting('LOCAL_MAX_ENTRIES'),
+            _token_cache_setting('LOCAL_TTL'),
+        )
+
+    def generation(self):
+        return cache.get(self.generation_key, 0)
+
+    def get(self, key):
+        generation = self.generation()
+        item = self.local.get(key)
+        if item is not None and item[0] == generation:
+            return item[1]
+
+        entry = cache.get(self.key_prefix + key)
+        if entry is not None:
+            self.local.set(key, (generation, entry))
+        return entry
+
+    def set(self, key, user):
+        entry = {
+            'user_id': user.pk,
+            'is_active': user.is_active,
+            'is_staff': user.is_staff,
+            'is_superuser': user.is_superuser,
+        }
+        ttl = _token_cache_setting('TTL')
+        cache.set_many({
+            self.key_prefix + key: entry,
+            self.user_prefix + str(user.pk): key,
+        }, ttl)
+        self.local.set(key, (self.generation(), entry))
+        return entry
+
+    def next_generation(self):
+        """Retire the entries every process holds in its LRU."""
+        cache.add(self.generation_key, 0, None)
+        try:
+            cache.incr(self.generation_key)
+        except ValueError:
+            # Evicted between add() and incr()
+            cache.set(self.generation_key, 1, None)
+
+    def invalidate(self, key):
+        self.local.delete(key)
+        cache.delete(self.key_prefix + key)
+        self.next_generation()
+
+    def invalidate_user(self, user_id):
+        user_key = self.user_prefix + str(user_id)
+        key = cache.get(user_key)
+        if key:
+            self.invalidate(key)
+        else:
+            # Another process may still hold the token it mapped to
+            self.next_generation()
+        cache.delete(user_key)
+
+
+token_cache = TokenCache()
+
+
+def get_token_user(request, key):
+    """
+    Resolve ``key`` to an active User, or None.
+
+    The result is memoized on the Django request so the auth middleware
+    and the DRF authentication class share a single lookup. A cache hit
+    costs one primary-key query for the user row; a miss costs one
+    token/user join that also fills the cache.
+    """
+    cached = getattr(request, '_token_auth', None)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    user = None
+    entry = token_cache.get(key)
+    if entry is not None:
+        if entry['is_active']:
+            user = User.objects.filter(pk=entry['user_id']).first()
+    else:
+        token = Token.objects.select_related('user').filter(key=key).first()
+        if token is not None:
+            token_cache.set(key, token.user)
+            if token.user.is_active:
+                user = token.user
+
+    request._token_auth = (key, user)
+    return user
+
+
+def invalidate_user_tokens(user):
+    """
+    Drop any cached token entry for ``user``.
+    """
+    token_cache.invalidate_user(user.pk)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication backed by ``token_cache``.
+
+    Reuses the lookup already done by CrossDomainAuthMiddleware for this
+    request. ``request.auth`` is the token key rather than a Token instance.
+    """
+
+    def authenticate(self, request):
+        self._http_request = request._request
+        return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        user = get_token_user(self._http_request, key)
+        if user is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        return (user, key)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_token_cache(sender, instance, created, update_fields=None, **kwargs):
+    # Flags such as is_active/is_staff are cached alongside the token;
+    # a bare last_login bump cannot change them.
+    if created or update_fields == frozenset({'last_login'}):
+        return
+    token_cache.invalidate_user(instance.pk)
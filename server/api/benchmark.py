@@ -0,0 +1,123 @@
+# server/api/benchmark.py
+import json
+import os
+import resource
+import statistics
+import sys
+
+# Latency percentiles checked by compare_runs
+LATENCY_METRICS = ('p50_ms', 'p95_ms', 'p99_ms')
+
+
+def summarize(durations, wall_time, errors=0, queries=None):
+    """
+    Latency percentiles (ms) and throughput for one endpoint's samples.
+    """
+    samples = sorted(d * 1000 for d in durations)
+    if len(samples) >= 2:
+        cuts = statistics.quantiles(samples, n=100, method='inclusive')
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    else:
+        p50 = p95 = p99 = samples[0] if samples else 0.0
+    return {
+        'count': len(samples),
+        'errors': errors,
+        'p50_ms': round(p50, 3),
+        'p95_ms': round(p95, 3),
+        'p99_ms': round(p99, 3),
+        'mean_ms': round(statistics.fmean(samples), 3) if samples else 0.0,
+        'rps': round(len(samples) / wall_time, 2) if wall_time else 0.0,
+        'queries': queries,
+    }
+
+
+def self_peak_rss_kb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def process_peak_rss_kb(pid):
+    """
+    Peak RSS of ``pid`` and its child processes from /proc (Linux only),
+    or None when it cannot be read.
+    """
+    total = 0
+    pending = [pid]
+    try:
+        while pending:
+            current = pending.pop()
+            with open(f'/proc/{current}/status') as status:
+                for line in status:
+                    if line.startswith('VmHWM:'):
+                        total += int(line.split()[1])
+            with open(f'/proc/{current}/task/{current}/children') as children:
+                pending.extend(int(child) for child in children.read().split())
+    except (OSError, ValueError):
+        return total or None
+    return total
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as history_file:
+        return json.load(history_file)
+
+
+def append_history(path, run):
+    history = load_history(path)
+    history.append(run)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as history_file:
+        json.dump(history, history_file, indent=2)
+    return history
+
+
+def find_baseline(history, run, label=None):
+    """
+    The run to compare ``run`` against: the latest run named ``label``, or
+    the latest earlier run in the same mode on the same database backend.
+    """
+    for candidate in reversed(history):
+        if candidate is run:
+            continue
+        if label is not None:
+            if candidate.get('label') == label:
+                return candidate
+        elif candidate.get('mode') == run.get('mode') \
+                and candidate.get('database', 'sqlite') == run.get('database', 'sqlite'):
+            return candidate
+    return None
+
+
+def compare_runs(baseline, current, threshold=0.2, min_delta_ms=1.0):
+    """
+    Return a list of regression descriptions, empty if none.
+
+    Latency regresses when it grows by more than ``threshold`` (a
+    fraction) and by at least ``min_delta_ms``; throughput when it drops
+    by more than ``threshold``; query counts and errors on any increase;
+    peak RSS when it grows by more than ``threshold``.
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        for metric in LATENCY_METRICS:
+            old, new = base.get(metric), result.get(metric)
+            if old is not None and new is not None and new > old * (1 + threshold) and new - old >= min_delta_ms:
+                regressions.append(f"{name} {metric}: {old} -> {new}")
+        if base.get('rps') and result.get('rps') is not None and result['rps'] < base['rps'] * (1 - threshold):
+            regressions.append(f"{name} rps: {base['rps']} -> {result['rps']}")
+        if base.get('queries') is not None and result.get('queries') is not None \
+                and result['queries'] > base['queries']:
+            regressions.append(f"{name} queries: {base['queries']} -> {result['queries']}")
+        if result.get('errors', 0) > base.get('errors', 0):
+            regressions.append(f"{name} errors: {base.get('errors', 0)} -> {result['errors']}")
+
+    old_rss, new_rss = baseline.get('peak_rss_kb'), current.get('peak_rss_kb')
+    if old_rss and new_rss and new_rss > old_rss * (1 + threshold):
+        regressions.append(f"peak_rss_kb: {old_rss} -> {new_rss}")
+    return regressions
@@ -0,0 +1,42 @@
+# server/api/cache_backends.py
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+
+from .instrumentation import current_metrics
+
+_MISSING = object()
+
+
+class CountingCacheMixin:
+    """
+    Count reads as hits and misses on the RequestMetrics of the request
+    being handled. Configure through CACHES' BACKEND.
+    """
+
+    def get(self, key, default=None, version=None):
+        metrics = current_metrics.get()
+        if metrics is None:
+            return super().get(key, default, version)
+        value = super().get(key, _MISSING, version)
+        if value is _MISSING:
+            metrics.cache_misses += 1
+            return default
+        metrics.cache_hits += 1
+        return value
+
+
+class CountingLocMemCache(CountingCacheMixin, LocMemCache):
+    # BaseCache.get_many goes through get(), which already counts
+    pass
+
+
+class CountingRedisCache(CountingCacheMixin, RedisCache):
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = super().get_many(keys, version)
+        metrics = current_metrics.get()
+        if metrics is not None:
+            metrics.cache_hits += len(found)
+            metrics.cache_misses += len(keys) - len(found)
+        return found
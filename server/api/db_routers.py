@@ -0,0 +1,57 @@
+# server/api/db_routers.py
+import contextvars
+import random
+
+from django.conf import settings
+
+REPLICA_DEFAULTS = {
+    'PIN_SECONDS': 5,
+    'COOKIE': 'db_pin',
+    # Read right after being written by another request (login, token auth)
+    'PRIMARY_APPS': ('sessions', 'authtoken'),
+}
+
+# Routing state of the request being handled: {'use_replica', 'wrote'}.
+# Unset outside requests (commands, the chat stream), which always use
+# the primary.
+request_routing = contextvars.ContextVar('request_routing', default=None)
+
+
+def replica_setting(name):
+    return getattr(settings, 'DATABASE_REPLICA_ROUTING', {}).get(name, REPLICA_DEFAULTS[name])
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+class PrimaryReplicaRouter:
+    """
+    Send reads to a DATABASE_REPLICAS alias when the current request
+    allows it (see ReplicaRoutingMiddleware), everything else to
+    ``default``. The first write of a request pins the rest of it to the
+    primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = request_routing.get()
+        replicas = replica_aliases()
+        if state is None or not state['use_replica'] or not replicas:
+            return 'default'
+        if model._meta.app_label in replica_setting('PRIMARY_APPS'):
+            return 'default'
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = request_routing.get()
+        if state is not None:
+            state['use_replica'] = False
+            state['wrote'] = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {'default', *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
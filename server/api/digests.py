@@ -0,0 +1,120 @@
+# server/api/digests.py
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Count, F, Max
+from django.db.models.functions import Coalesce, Greatest
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Message, ParticipantState
+from .presence import get_presence
+
+logger = logging.getLogger(__name__)
+
+DIGEST_DEFAULTS = {
+    'MIN_AGE_MINUTES': 30,
+    'BATCH_SIZE': 100,
+    'CHAT_URL': 'https://tolatiles.com',
+}
+
+
+def _digest_setting(name):
+    return getattr(settings, 'CHAT_DIGEST', {}).get(name, DIGEST_DEFAULTS[name])
+
+
+def find_pending_digests(min_age_minutes):
+    """
+    Group unread messages older than ``min_age_minutes`` that no digest
+    has covered yet, by recipient.
+
+    One grouped query over participant states and messages, plus one
+    query for the newest message of each conversation. Users with an open
+    chat stream are skipped; they see messages live.
+    """
+    cutoff = timezone.now() - timedelta(minutes=min_age_minutes)
+    rows = list(
+        ParticipantState.objects.filter(unread_count__gt=0, user__is_active=True)
+        .exclude(user__email='')
+        .filter(
+            conversation__messages__receiver=F('user'),
+            conversation__messages__is_read=False,
+            conversation__messages__created_at__lt=cutoff,
+            conversation__messages__id__gt=Greatest(
+                Coalesce('last_read_message_id', 0), Coalesce('notified_message_id', 0)
+            ),
+        )
+        .values('id', 'user_id', 'user__email', 'user__first_name', 'user__username', 'conversation_id')
+        .annotate(count=Count('conversation__messages'), latest_id=Max('conversation__messages__id'))
+        .order_by('user_id', '-latest_id')
+    )
+    if not rows:
+        return []
+
+    presence = get_presence({row['user_id'] for row in rows})
+    latest = Message.objects.select_related('sender').in_bulk([row['latest_id'] for row in rows])
+
+    digests = {}
+    for row in rows:
+        if presence[row['user_id']]['online']:
+            continue
+        digest = digests.setdefault(row['user_id'], {
+            'email': row['user__email'],
+            'name': row['user__first_name'] or row['user__username'],
+            'conversations': [],
+            'states': [],
+        })
+        message = latest.get(row['latest_id'])
+        digest['conversations'].append({
+            'sender': (message.sender.get_full_name() or message.sender.username) if message else '',
+            'preview': (message.content or 'Sent an attachment')[:140] if message else '',
+            'count': row['count'],
+        })
+        digest['states'].append(ParticipantState(id=row['id'], notified_message_id=row['latest_id']))
+    return list(digests.values())
+
+
+def build_digest_email(digest, connection=None):
+    total = sum(item['count'] for item in digest['conversations'])
+    body = render_to_string('api/email/unread_digest.txt', {
+        'name': digest['name'],
+        'total': total,
+        'conversations': digest['conversations'],
+        'chat_url': _digest_setting('CHAT_URL'),
+    })
+    subject = f"You have {total} unread message{'s' if total != 1 else ''} on TolaTiles"
+    return EmailMessage(subject, body, to=[digest['email']], connection=connection)
+
+
+def send_unread_digests(min_age_minutes=None, batch_size=None):
+    """
+    Email one digest per user with unread messages, over a single mail
+    connection, ``batch_size`` mails at a time. Each batch's messages are
+    recorded as notified once it is handed to the backend, so they are
+    never mailed twice. Returns the number of emails sent.
+    """
+    if min_age_minutes is None:
+        min_age_minutes = _digest_setting('MIN_AGE_MINUTES')
+    batch_size = batch_size or _digest_setting('BATCH_SIZE')
+
+    digests = find_pending_digests(min_age_minutes)
+    if not digests:
+        return 0
+
+    sent = 0
+    connection = get_connection()
+    connection.open()
+    try:
+        for start in range(0, len(digests), batch_size):
+            batch = digests[start:start + batch_size]
+            sent += connection.send_messages([build_digest_email(digest, connection) for digest in batch]) or 0
+            ParticipantState.objects.bulk_update(
+                [state for digest in batch for state in digest['states']], ['notified_message_id']
+            )
+    finally:
+        connection.close()
+
+    logger.info(f"Sent {sent} unread message digests")
+    return sent
@@ -0,0 +1,176 @@
+# server/api/events.py
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+class InProcessSubscription:
+    def __init__(self, backend, channel, loop, max_pending):
+        self.backend = backend
+        self.channel = channel
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=max_pending)
+
+    def deliver(self, event):
+        # Runs on the subscriber's loop; a client that cannot keep up
+        # drops events and resyncs from the REST endpoints.
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            logger.warning(f"Dropping chat event for slow subscriber on {self.channel}")
+
+    async def get(self, timeout):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        self.backend.unsubscribe(self)
+
+
+class InProcessBackend:
+    """
+    Fan-out within a single process.
+
+    Publishing is thread-safe, so sync views running in worker threads
+    can publish to subscribers waiting on the ASGI event loop. Only
+    reaches clients connected to the same process; use RedisBackend when
+    running several workers.
+    """
+
+    def __init__(self, max_pending=100):
+        self.max_pending = max_pending
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # Subscriber's loop has shut down
+                self.unsubscribe(subscription)
+
+    async def subscribe(self, channel):
+        subscription = InProcessSubscription(
+            self, channel, asyncio.get_running_loop(), self.max_pending
+        )
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+class RedisSubscription:
+    def __init__(self, backend, client, pubsub):
+        self.backend = backend
+        self.client = client
+        self.pubsub = pubsub
+
+    async def get(self, timeout):
+        message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        if message is None:
+            return None
+        return json.loads(message['data'])
+
+    async def close(self):
+        self.backend.unsubscribe(self)
+        await self.pubsub.aclose()
+        await self.client.aclose()
+
+
+class RedisBackend:
+    """
+    Fan-out across worker processes through Redis pub/sub.
+
+    Requires the ``redis`` package and settings.REDIS_URL.
+    """
+    prefix = 'chat-events:'
+
+    def __init__(self, url=None):
+        import redis
+
+        self.url = url or settings.REDIS_URL
+        self.client = redis.Redis.from_url(self.url)
+        self._local_count = 0
+        self._lock = threading.Lock()
+
+    def publish(self, channel, event):
+        self.client.publish(self.prefix + channel, json.dumps(event, default=str))
+
+    async def subscribe(self, channel):
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(self.prefix + channel)
+        with self._lock:
+            self._local_count += 1
+        return RedisSubscription(self, client, pubsub)
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._local_count -= 1
+
+    def subscriber_count(self):
+        # Connections held by this process
+        return self._local_count
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                config = getattr(settings, 'CHAT_EVENTS', {})
+                backend_class = import_string(config.get('BACKEND', 'api.events.InProcessBackend'))
+                _backend = backend_class(**config.get('OPTIONS', {}))
+    return _backend
+
+
+def publish_to_users(user_ids, event_type, data):
+    """
+    Push an event to every connected client of ``user_ids`` once the
+    current transaction commits.
+    """
+    event = {'type': event_type, 'data': data}
+
+    def send():
+        backend = get_backend()
+        for user_id in set(user_ids):
+            try:
+                backend.publish(user_channel(user_id), event)
+            except Exception:
+                logger.exception(f"Failed to publish {event_type} to user {user_id}")
+
+    transaction.on_commit(send)
@@ -0,0 +1,85 @@
+# server/api/instrumentation.py
+import contextvars
+import time
+
+from django.conf import settings
+
+METRICS_DEFAULTS = {
+    'SAMPLE_RATE': 1.0,
+    'SERVER_TIMING': True,
+    # Send Server-Timing to every client, not only staff
+    'EXPOSE_HEADER': False,
+    'SLOW_REQUEST_MS': 500,
+}
+
+# RequestMetrics of the sampled request being handled, if any
+current_metrics = contextvars.ContextVar('request_metrics', default=None)
+
+
+def metrics_setting(name):
+    return getattr(settings, 'REQUEST_METRICS', {}).get(name, METRICS_DEFAULTS[name])
+
+
+class RequestMetrics:
+    """
+    Counters for one request. Times are in seconds.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view = None
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.render_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.view_started = None
+        self.view_db_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        """``connection.execute_wrapper`` hook timing every query."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+    def start_view(self):
+        self.view_started = time.perf_counter()
+        self.view_db_time = self.db_time
+
+    def finish_view(self):
+        """
+        Count the view's time outside SQL, up to the response leaving
+        DRF's finalize_response, as serializer time.
+        """
+        if self.view_started is None:
+            return
+        elapsed = time.perf_counter() - self.view_started
+        self.serializer_time += max(elapsed - (self.db_time - self.view_db_time), 0)
+        self.view_started = None
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total):
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'serializer;dur={self.serializer_time * 1000:.1f}',
+            f'render;dur={self.render_time * 1000:.1f}',
+            f'cache;desc="{self.cache_hits} hits, {self.cache_misses} misses"',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+    def as_dict(self, total):
+        return {
+            'duration_ms': round(total * 1000, 1),
+            'queries': self.queries,
+            'db_ms': round(self.db_time * 1000, 1),
+            'serializer_ms': round(self.serializer_time * 1000, 1),
+            'render_ms': round(self.render_time * 1000, 1),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+        }
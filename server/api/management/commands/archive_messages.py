@@ -0,0 +1,58 @@
+# server/api/management/commands/archive_messages.py
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+from django.utils import timezone
+
+from api.models import ArchivedMessage, Conversation, Message, ParticipantState
+
+
+class Command(BaseCommand):
+    help = "Move old read messages of idle conversations from Message into ArchivedMessage"
+
+    def add_arguments(self, parser):
+        config = getattr(settings, 'CHAT_ARCHIVE', {})
+        parser.add_argument('--older-than-days', type=int, default=config.get('MESSAGE_AGE_DAYS', 180))
+        parser.add_argument('--inactive-days', type=int, default=config.get('INACTIVE_DAYS', 30))
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        message_cutoff = now - timedelta(days=options['older_than_days'])
+        inactive_cutoff = now - timedelta(days=options['inactive_days'])
+
+        conversations = Conversation.objects.filter(updated_at__lt=inactive_cutoff)
+        # Unread messages stay hot so unread counts can still be rebuilt
+        # from Message; summary pointers keep their targets.
+        candidates = Message.objects.with_read_state().filter(
+            Q(is_read=True) | Q(id__lte=F('receiver_last_read')),
+            conversation__in=conversations,
+            created_at__lt=message_cutoff,
+        ).exclude(
+            id__in=conversations.filter(last_message__isnull=False).values('last_message_id')
+        ).exclude(
+            id__in=ParticipantState.objects.filter(last_read_message__isnull=False)
+            .values('last_read_message_id')
+        )
+
+        if options['dry_run']:
+            self.stdout.write(f"Would archive {candidates.count()} messages")
+            return
+
+        total = 0
+        last_id = 0
+        while True:
+            batch = list(
+                candidates.filter(id__gt=last_id).order_by('id')
+                .values_list('id', flat=True)[:options['batch_size']]
+            )
+            if not batch:
+                break
+            total += ArchivedMessage.archive(batch)
+            last_id = batch[-1]
+            self.stdout.write(f"Archived {total} messages")
+
+        self.stdout.write(self.style.SUCCESS(f"Archived {total} messages"))
@@ -0,0 +1,24 @@
+# server/api/management/commands/backfill_conversation_summaries.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models import Conversation
+
+
+class Command(BaseCommand):
+    help = "Rebuild Conversation.last_message and per-participant unread counts from messages"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        conversation_ids = list(Conversation.objects.order_by('id').values_list('id', flat=True))
+
+        for start in range(0, len(conversation_ids), batch_size):
+            batch = conversation_ids[start:start + batch_size]
+            with transaction.atomic():
+                Conversation.rebuild_summaries(batch)
+            self.stdout.write(f"Rebuilt {start + len(batch)}/{len(conversation_ids)} conversations")
+
+        self.stdout.write(self.style.SUCCESS("Conversation summaries rebuilt"))
@@ -0,0 +1,290 @@
+# server/api/management/commands/benchmark.py
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from api.benchmark import (
+    append_history, compare_runs, find_baseline, process_peak_rss_kb, self_peak_rss_kb, summarize
+)
+from api.models import Conversation, ProductType, Project, Tile, TileCategory
+
+SEED_PASSWORD = 'seed-password'
+
+
+def tiny_png():
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (32, 32), '#8c8279').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def build_scenarios():
+    """
+    Requests to time, built from the data created by seed_scale.
+    """
+    staff = User.objects.filter(username__startswith='seed-staff-').order_by('id').first()
+    conversation = Conversation.objects.filter(min_user__username__startswith='seed-').order_by('id').first()
+    tile = Tile.objects.filter(slug__startswith='seed-').order_by('id').first()
+    if staff is None or conversation is None or tile is None:
+        raise CommandError("No seed data found; run `manage.py seed_scale` first")
+
+    customer_id = conversation.max_user_id if conversation.min_user_id == staff.id else conversation.min_user_id
+    customer = User.objects.get(id=customer_id)
+    agent_id = conversation.min_user_id if customer_id == conversation.max_user_id else conversation.max_user_id
+    category = TileCategory.objects.get(id=tile.category_id)
+    product_type = ProductType.objects.get(id=tile.product_type_id)
+    project = Project.objects.filter(slug__startswith='seed-').order_by('id').first()
+
+    return [
+        {'name': 'tile_list', 'method': 'GET', 'path': '/api/tiles/'},
+        {'name': 'tile_list_filtered', 'method': 'GET', 'path': '/api/tiles/', 'params': {
+            'product_type': product_type.slug, 'category': category.slug, 'in_stock': 'true',
+            'material': tile.material, 'search': 'tile', 'ordering': '-price',
+        }},
+        {'name': 'tile_detail', 'method': 'GET', 'path': f'/api/tiles/{tile.slug}/'},
+        {'name': 'project_detail', 'method': 'GET', 'path': f'/api/projects/{project.slug}/'},
+        {'name': 'category_detail', 'method': 'GET', 'path': f'/api/categories/{category.slug}/'},
+        {'name': 'product_type_detail', 'method': 'GET', 'path': f'/api/product-types/{product_type.slug}/'},
+        {'name': 'conversation_inbox', 'method': 'GET', 'path': '/api/chat/conversations/', 'user': staff},
+        {'name': 'message_history', 'method': 'GET', 'path': '/api/chat/messages/history/',
+         'params': {'conversation': conversation.id}, 'user': customer},
+        {'name': 'send_message', 'method': 'POST', 'path': '/api/chat/send/', 'user': customer,
+         'json': {'receiver_id': agent_id, 'content': 'Benchmark message'}},
+        {'name': 'login', 'method': 'POST', 'path': '/api/auth/login/',
+         'json': {'username': staff.username, 'password': SEED_PASSWORD}},
+        {'name': 'image_upload', 'method': 'PATCH', 'path': f'/api/tiles/{tile.slug}/', 'user': staff,
+         'files': {'images': ('benchmark.png', tiny_png())}},
+    ]
+
+
+def encode_multipart(fields):
+    boundary = uuid.uuid4().hex
+    body = io.BytesIO()
+    for name, value in fields.items():
+        body.write(f'--{boundary}\r\n'.encode())
+        if isinstance(value, tuple):
+            filename, content = value
+            body.write(
+                f'Content-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                'Content-Type: application/octet-stream\r\n\r\n'.encode()
+            )
+            body.write(content)
+        else:
+            body.write(f'Content-Disposition: form-data; name="{name}"\r\n\r\n{value}'.encode())
+        body.write(b'\r\n')
+    body.write(f'--{boundary}--\r\n'.encode())
+    return body.getvalue(), f'multipart/form-data; boundary={boundary}'
+
+
+class Command(BaseCommand):
+    help = (
+        "Time key API endpoints against the seed_scale dataset, append the "
+        "results to a JSON history file and optionally fail on regressions"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=['client', 'live'], default='client',
+                            help="Django test client in-process, or HTTP against a spawned server")
+        parser.add_argument('--server', choices=['uvicorn', 'gunicorn'], default='uvicorn')
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--requests', type=int, default=50, help="Timed requests per endpoint")
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--concurrency', type=int, default=4, help="Live mode client threads")
+        parser.add_argument('--only', nargs='*', help="Endpoint names to run")
+        parser.add_argument('--label', default=None)
+        parser.add_argument('--history', default=os.path.join(settings.BASE_DIR, 'benchmarks', 'history.json'))
+        parser.add_argument('--compare', action='store_true', help="Fail if this run regressed against the baseline")
+        parser.add_argument('--baseline', default=None, help="Label of the run to compare with (default: previous run)")
+        parser.add_argument('--threshold', type=float, default=0.2, help="Allowed fractional regression")
+
+    def handle(self, *args, **options):
+        scenarios = build_scenarios()
+        if options['only']:
+            scenarios = [scenario for scenario in scenarios if scenario['name'] in options['only']]
+        tokens = {}
+        for scenario in scenarios:
+            user = scenario.get('user')
+            if user is not None and user.id not in tokens:
+                tokens[user.id] = Token.objects.get_or_create(user=user)[0].key
+
+        if options['mode'] == 'client':
+            results, peak_rss = self.run_client(scenarios, tokens, options)
+        else:
+            results, peak_rss = self.run_live(scenarios, tokens, options)
+
+        run = {
+            'label': options['label'] or time.strftime('%Y%m%d-%H%M%S'),
+            'timestamp': time.time(),
+            'mode': options['mode'],
+            'database': connection.vendor,
+            'server': options['server'] if options['mode'] == 'live' else None,
+            'requests': options['requests'],
+            'concurrency': options['concurrency'] if options['mode'] == 'live' else 1,
+            'peak_rss_kb': peak_rss,
+            'results': results,
+        }
+        history = append_history(options['history'], run)
+        self.print_run(run)
+
+        if options['compare']:
+            baseline = find_baseline(history, run, options['baseline'])
+            if baseline is None:
+                self.stdout.write(self.style.WARNING("No baseline run to compare with"))
+                return
+            regressions = compare_runs(baseline, run, options['threshold'])
+            if regressions:
+                for regression in regressions:
+                    self.stderr.write(f"REGRESSION {regression}")
+                raise CommandError(f"{len(regressions)} metrics regressed against '{baseline['label']}'")
+            self.stdout.write(self.style.SUCCESS(f"No regressions against '{baseline['label']}'"))
+
+    def print_run(self, run):
+        self.stdout.write(f"{'endpoint':<22}{'p50':>9}{'p95':>9}{'p99':>9}{'rps':>9}{'queries':>9}{'errors':>8}")
+        for name, result in run['results'].items():
+            queries = '-' if result['queries'] is None else result['queries']
+            self.stdout.write(
+                f"{name:<22}{result['p50_ms']:>9}{result['p95_ms']:>9}{result['p99_ms']:>9}"
+                f"{result['rps']:>9}{queries:>9}{result['errors']:>8}"
+            )
+        self.stdout.write(f"database: {run['database']}, peak RSS: {run['peak_rss_kb']} KB")
+
+    def client_request(self, client, scenario, tokens):
+        extra = {}
+        user = scenario.get('user')
+        if user is not None:
+            extra['HTTP_AUTHORIZATION'] = f'Token {tokens[user.id]}'
+        path = scenario['path']
+        if scenario['method'] == 'GET':
+            return client.get(path, scenario.get('params', {}), **extra)
+        if 'files' in scenario:
+            body, content_type = encode_multipart(scenario['files'])
+            return client.generic(scenario['method'], path, body, content_type=content_type, **extra)
+        return client.generic(
+            scenario['method'], path, json.dumps(scenario['json']), content_type='application/json', **extra
+        )
+
+    def run_client(self, scenarios, tokens, options):
+        client = Client(HTTP_HOST='localhost')
+        results = {}
+        rates = {scope: None for scope in settings.REST_FRAMEWORK.get('DEFAULT_THROTTLE_RATES', {})}
+        rest_framework = dict(settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES=rates)
+
+        with tempfile.TemporaryDirectory(prefix='benchmark-media-') as media_root, \
+                override_settings(MEDIA_ROOT=media_root, REST_FRAMEWORK=rest_framework):
+            for scenario in scenarios:
+                durations, errors, queries = [], 0, 0
+                for attempt in range(options['warmup'] + options['requests']):
+                    # CaptureQueriesContext miscounts once the bounded log is full
+                    connection.queries_log.clear()
+                    # Writes are rolled back so repeated runs see the same data
+                    with transaction.atomic(), CaptureQueriesContext(connection) as captured:
+                        started = time.perf_counter()
+                        response = self.client_request(client, scenario, tokens)
+                        elapsed = time.perf_counter() - started
+                        transaction.set_rollback(True)
+                    if attempt < options['warmup']:
+                        continue
+                    durations.append(elapsed)
+                    queries = max(queries, len(captured))
+                    if response.status_code >= 400:
+                        errors += 1
+                results[scenario['name']] = summarize(durations, sum(durations), errors, queries)
+                self.stdout.write(f"  {scenario['name']} done")
+        return results, self_peak_rss_kb()
+
+    def start_server(self, options):
+        host, port = '127.0.0.1', options['port']
+        if options['server'] == 'uvicorn':
+            command = [sys.executable, '-m', 'uvicorn', 'server.asgi:application',
+                       '--host', host, '--port', str(port), '--workers', str(options['workers']),
+                       '--log-level', 'warning']
+        else:
+            command = [sys.executable, '-m', 'gunicorn', 'server.wsgi:application',
+                       '--bind', f'{host}:{port}', '--workers', str(options['workers'])]
+        env = dict(os.environ, DISABLE_THROTTLING='1')
+        process = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f"{options['server']} exited with status {process.returncode}")
+            try:
+                socket.create_connection((host, port), timeout=0.5).close()
+                return process, f'http://{host}:{port}'
+            except OSError:
+                time.sleep(0.2)
+        process.terminate()
+        raise CommandError(f"{options['server']} did not start listening on port {port}")
+
+    def live_request(self, base_url, scenario, tokens):
+        headers = {'Host': 'localhost'}
+        user = scenario.get('user')
+        if user is not None:
+            headers['Authorization'] = f'Token {tokens[user.id]}'
+        url = base_url + scenario['path']
+        body = None
+        if scenario['method'] == 'GET':
+            if scenario.get('params'):
+                url += '?' + urlencode(scenario['params'])
+        elif 'files' in scenario:
+            body, headers['Content-Type'] = encode_multipart(scenario['files'])
+        else:
+            body = json.dumps(scenario['json']).encode()
+            headers['Content-Type'] = 'application/json'
+
+        started = time.perf_counter()
+        try:
+            with urlopen(Request(url, data=body, headers=headers, method=scenario['method']), timeout=30) as response:
+                response.read()
+                ok = True
+        except HTTPError as error:
+            error.read()
+            ok = False
+        except OSError:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    def run_live(self, scenarios, tokens, options):
+        self.stdout.write(
+            self.style.WARNING("Live mode writes messages and images to the configured database and media")
+        )
+        process, base_url = self.start_server(options)
+        results = {}
+        try:
+            with ThreadPoolExecutor(options['concurrency']) as pool:
+                for scenario in scenarios:
+                    for _ in range(options['warmup']):
+                        self.live_request(base_url, scenario, tokens)
+                    started = time.perf_counter()
+                    samples = list(pool.map(
+                        lambda _: self.live_request(base_url, scenario, tokens), range(options['requests'])
+                    ))
+                    wall_time = time.perf_counter() - started
+                    errors = sum(1 for _, ok in samples if not ok)
+                    results[scenario['name']] = summarize([duration for duration, _ in samples], wall_time, errors)
+                    self.stdout.write(f"  {scenario['name']} done")
+            peak_rss = process_peak_rss_kb(process.pid)
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+        return results, peak_rss
@@ -0,0 +1,83 @@
+# server/api/management/commands/merge_duplicate_conversations.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max, Min
+
+from api.models import ArchivedMessage, Conversation, Message, ParticipantState
+from api.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = (
+        "Merge duplicate 1:1 conversations between the same two users and "
+        "set their canonical (min_user, max_user) pair key"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report duplicates without changing anything")
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        rows = (
+            Conversation.objects
+            .annotate(
+                participant_count=Count('participants', distinct=True),
+                low=Min('participants'),
+                high=Max('participants'),
+            )
+            .filter(participant_count__in=[1, 2])
+            .order_by('id')
+            .values_list('id', 'low', 'high', 'min_user_id')
+        )
+
+        pairs = {}
+        for conversation_id, low, high, min_user_id in rows:
+            group = pairs.setdefault((low, high), [])
+            # Keep a conversation that already owns the pair key, else the oldest
+            if min_user_id is not None:
+                group.insert(0, conversation_id)
+            else:
+                group.append(conversation_id)
+
+        merged = 0
+        for (low, high), conversation_ids in pairs.items():
+            keep, duplicates = conversation_ids[0], conversation_ids[1:]
+            if duplicates:
+                self.stdout.write(f"Users {low}/{high}: merging {duplicates} into {keep}")
+                merged += len(duplicates)
+            if dry_run:
+                continue
+
+            with transaction.atomic():
+                if duplicates:
+                    self.merge(keep, duplicates)
+                Conversation.objects.filter(id=keep).update(min_user_id=low, max_user_id=high)
+
+        action = "Would merge" if dry_run else "Merged"
+        self.stdout.write(self.style.SUCCESS(f"{action} {merged} duplicate conversations"))
+
+    def merge(self, keep, duplicates):
+        """
+        Move everything hanging off ``duplicates`` to ``keep`` and delete
+        them. Runs inside the caller's transaction.
+        """
+        # Carry read watermarks over before the duplicates' states cascade away
+        watermarks = (
+            ParticipantState.objects
+            .filter(conversation_id__in=[keep, *duplicates], last_read_message__isnull=False)
+            .values('user_id')
+            .annotate(last_read=Max('last_read_message_id'))
+            .values_list('user_id', 'last_read')
+        )
+        for user_id, last_read in list(watermarks):
+            ParticipantState.objects.update_or_create(
+                conversation_id=keep, user_id=user_id, defaults={'last_read_message_id': last_read}
+            )
+
+        Message.objects.filter(conversation_id__in=duplicates).update(conversation_id=keep)
+        ArchivedMessage.objects.filter(conversation_id__in=duplicates).update(conversation_id=keep)
+        # update() sends no post_save, so re-key the search rows directly
+        get_search_backend().move_conversations(duplicates, keep)
+        Conversation.objects.filter(id__in=duplicates).delete()
+        Conversation.rebuild_summaries([keep])
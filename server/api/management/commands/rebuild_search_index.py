@@ -0,0 +1,13 @@
+# server/api/management/commands/rebuild_search_index.py
+from django.core.management.base import BaseCommand
+
+from api.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Recreate the chat message search index from Message and ArchivedMessage"
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {backend.name} search index"))
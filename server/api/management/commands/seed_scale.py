@@ -0,0 +1,295 @@
+# server/api/management/commands/seed_scale.py
+import io
+import random
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.models import (
+    Conversation, CustomerTestimonial, Message, ProductType, Project,
+    ProjectImage, StaffAgent, Tile, TileCategory, TileImage
+)
+from api.search import get_search_backend
+
+# Row counts at --scale 1; per-parent counts keep the shape at any scale
+COUNTS = {
+    'product_types': 6,
+    'categories_per_type': 8,
+    'tiles': 20000,
+    'images_per_tile': 2,
+    'projects': 2000,
+    'images_per_project': 3,
+    'tiles_per_project': 5,
+    'testimonials': 1000,
+    'staff': 10,
+    'customers': 5000,
+    'messages_per_conversation': 400,
+}
+
+PREFIX = 'seed-'
+BASE_TIME = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+PALETTE = ['#d9d4cc', '#8c8279', '#3d4a5c', '#b5651d', '#f2efe9', '#5b7f6a', '#a23b2a', '#222222']
+WORDS = (
+    'tile porcelain ceramic marble granite mosaic subway hexagon grout backsplash fireplace '
+    'kitchen bathroom shower floor wall matte glossy white grey blue install quote delivery '
+    'sample price size stock order measure pattern herringbone border trim sealer'
+).split()
+MATERIALS = ['Porcelain', 'Ceramic', 'Marble', 'Granite', 'Glass', 'Travertine']
+SIZES = ['2x2', '3x6', '4x4', '6x24', '12x12', '12x24', '24x48']
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """
+    Let bulk_create keep the created_at/updated_at values we generate
+    instead of stamping every row with now().
+    """
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a deterministic catalog and chat dataset for load testing. "
+        "--scale 1 is about 20k tiles, 5k customers and 2M messages."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=0.01)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--flush', action='store_true', help="Delete previously seeded rows first")
+
+    def handle(self, *args, **options):
+        self.scale = options['scale']
+        self.batch_size = options['batch_size']
+        self.rng = random.Random(options['seed'])
+
+        if options['flush']:
+            self.flush()
+        elif ProductType.objects.filter(slug__startswith=PREFIX).exists():
+            raise CommandError("Seed data already exists; pass --flush to replace it")
+
+        with explicit_timestamps(Tile, Project, User, Conversation, Message), transaction.atomic():
+            images = self.write_images()
+            categories = self.seed_categories()
+            tiles = self.seed_tiles(categories, images)
+            self.seed_projects(tiles, images)
+            staff, customers = self.seed_users()
+            conversation_ids = self.seed_conversations(staff, customers)
+
+        self.stdout.write("Rebuilding conversation summaries and search index")
+        for start in range(0, len(conversation_ids), 1000):
+            with transaction.atomic():
+                Conversation.rebuild_summaries(conversation_ids[start:start + 1000])
+        get_search_backend().rebuild()
+
+        self.stdout.write(self.style.SUCCESS(f"Seeded dataset at scale {self.scale}"))
+
+    def count(self, name):
+        return max(1, int(COUNTS[name] * self.scale))
+
+    def timestamp(self, max_days=365):
+        return BASE_TIME + timedelta(seconds=self.rng.randrange(max_days * 86400))
+
+    def sentence(self, words=8):
+        return ' '.join(self.rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+    def flush(self):
+        with transaction.atomic():
+            CustomerTestimonial.objects.filter(project__slug__startswith=PREFIX).delete()
+            Project.objects.filter(slug__startswith=PREFIX).delete()
+            ProductType.objects.filter(slug__startswith=PREFIX).delete()
+            # Seeded conversations cascade from their min_user
+            User.objects.filter(username__startswith=PREFIX).delete()
+        self.stdout.write("Removed previous seed data")
+
+    def write_images(self):
+        """
+        A few tiny PNGs shared by every seeded image row.
+        """
+        from PIL import Image
+
+        names = []
+        for index, color in enumerate(PALETTE):
+            name = f'{PREFIX}images/{index}.png'
+            if not default_storage.exists(name):
+                buffer = io.BytesIO()
+                Image.new('RGB', (64, 64), color).save(buffer, format='PNG')
+                buffer.seek(0)
+                name = default_storage.save(name, buffer)
+            names.append(name)
+        return names
+
+    def seed_categories(self):
+        product_types = ProductType.objects.bulk_create([
+            ProductType(name=f'Seed Type {n}', slug=f'{PREFIX}type-{n}', display_order=n)
+            for n in range(COUNTS['product_types'])
+        ])
+        return TileCategory.objects.bulk_create([
+            TileCategory(
+                name=f'Seed Category {product_type.display_order}-{n}',
+                slug=f'{PREFIX}category-{product_type.display_order}-{n}',
+                product_type=product_type,
+                order=n,
+            )
+            for product_type in product_types
+            for n in range(COUNTS['categories_per_type'])
+        ], batch_size=self.batch_size)
+
+    def seed_tiles(self, categories, images):
+        tiles = []
+        for n in range(self.count('tiles')):
+            category = self.rng.choice(categories)
+            created_at = self.timestamp()
+            tiles.append(Tile(
+                title=f'Seed Tile {n}',
+                slug=f'{PREFIX}tile-{n}',
+                sku=f'SEED-{n:07d}',
+                description=self.sentence(20),
+                category=category,
+                product_type_id=category.product_type_id,
+                price=Decimal(self.rng.randrange(200, 20000)) / 100,
+                size=self.rng.choice(SIZES),
+                material=self.rng.choice(MATERIALS),
+                in_stock=self.rng.random() > 0.1,
+                created_at=created_at,
+                updated_at=created_at,
+            ))
+        tiles = Tile.objects.bulk_create(tiles, batch_size=self.batch_size)
+
+        TileImage.objects.bulk_create([
+            TileImage(
+                tile=tile,
+                image=self.rng.choice(images),
+                thumbnail=self.rng.choice(images),
+                is_primary=index == 0,
+            )
+            for tile in tiles
+            for index in range(COUNTS['images_per_tile'])
+        ], batch_size=self.batch_size)
+        self.stdout.write(f"Created {len(tiles)} tiles")
+        return tiles
+
+    def seed_projects(self, tiles, images):
+        projects = []
+        for n in range(self.count('projects')):
+            created_at = self.timestamp()
+            projects.append(Project(
+                title=f'Seed Project {n}',
+                slug=f'{PREFIX}project-{n}',
+                description=self.sentence(30),
+                client=f'Client {n}',
+                location=self.rng.choice(['Miami', 'Orlando', 'Tampa', 'Naples']),
+                completed_date=created_at.date(),
+                product_type_id=self.rng.choice(tiles).product_type_id,
+                created_at=created_at,
+                updated_at=created_at,
+            ))
+        projects = Project.objects.bulk_create(projects, batch_size=self.batch_size)
+
+        Project.tiles_used.through.objects.bulk_create([
+            Project.tiles_used.through(project_id=project.id, tile_id=tile.id)
+            for project in projects
+            for tile in self.rng.sample(tiles, min(len(tiles), COUNTS['tiles_per_project']))
+        ], batch_size=self.batch_size)
+        ProjectImage.objects.bulk_create([
+            ProjectImage(project=project, image=self.rng.choice(images), is_primary=index == 0)
+            for project in projects
+            for index in range(COUNTS['images_per_project'])
+        ], batch_size=self.batch_size)
+        CustomerTestimonial.objects.bulk_create([
+            CustomerTestimonial(
+                customer_name=f'Seed Customer {n}',
+                testimonial=self.sentence(25),
+                project=self.rng.choice(projects),
+                rating=self.rng.choice([3, 4, 5, 5, 5]),
+                approved=self.rng.random() > 0.2,
+            )
+            for n in range(self.count('testimonials'))
+        ], batch_size=self.batch_size)
+        self.stdout.write(f"Created {len(projects)} projects")
+
+    def seed_users(self):
+        password = make_password('seed-password')
+        joined = BASE_TIME - timedelta(days=30)
+        staff = User.objects.bulk_create([
+            User(username=f'{PREFIX}staff-{n}', email=f'staff{n}@seed.invalid', password=password,
+                 is_staff=True, date_joined=joined)
+            for n in range(COUNTS['staff'])
+        ])
+        # bulk_create skips the post_save signal that enrolls staff
+        StaffAgent.objects.bulk_create([StaffAgent(user=user) for user in staff])
+        customers = User.objects.bulk_create([
+            User(username=f'{PREFIX}customer-{n}', email=f'customer{n}@seed.invalid', password=password,
+                 date_joined=joined)
+            for n in range(self.count('customers'))
+        ], batch_size=self.batch_size)
+        self.stdout.write(f"Created {len(staff)} staff and {len(customers)} customers")
+        return staff, customers
+
+    def seed_conversations(self, staff, customers):
+        conversations = []
+        for customer in customers:
+            agent = self.rng.choice(staff)
+            low, high = sorted([customer.id, agent.id])
+            conversations.append(Conversation(
+                min_user_id=low, max_user_id=high, created_at=BASE_TIME, updated_at=BASE_TIME
+            ))
+        conversations = Conversation.objects.bulk_create(conversations, batch_size=self.batch_size)
+
+        Through = Conversation.participants.through
+        Through.objects.bulk_create([
+            Through(conversation_id=conversation.id, user_id=user_id)
+            for conversation in conversations
+            for user_id in (conversation.min_user_id, conversation.max_user_id)
+        ], batch_size=self.batch_size)
+
+        per_conversation = COUNTS['messages_per_conversation']
+        pending = []
+        total = 0
+        for conversation in conversations:
+            users = [conversation.min_user_id, conversation.max_user_id]
+            sent_at = self.timestamp(max_days=300)
+            unread_from = per_conversation - self.rng.randrange(4)
+            for n in range(per_conversation):
+                sender_id = self.rng.choice(users)
+                sent_at += timedelta(seconds=self.rng.randrange(30, 6 * 3600))
+                read = n < unread_from
+                pending.append(Message(
+                    conversation_id=conversation.id,
+                    sender_id=sender_id,
+                    receiver_id=users[1] if sender_id == users[0] else users[0],
+                    content=self.sentence(self.rng.randrange(3, 25)),
+                    is_read=read,
+                    status='read' if read else 'delivered',
+                    created_at=sent_at,
+                    updated_at=sent_at,
+                ))
+            conversation.updated_at = sent_at
+            if len(pending) >= self.batch_size:
+                Message.objects.bulk_create(pending, batch_size=self.batch_size)
+                total += len(pending)
+                pending = []
+                self.stdout.write(f"Created {total} messages")
+        Message.objects.bulk_create(pending, batch_size=self.batch_size)
+        total += len(pending)
+        Conversation.objects.bulk_update(conversations, ['updated_at'], batch_size=self.batch_size)
+        self.stdout.write(f"Created {len(conversations)} conversations and {total} messages")
+        return [conversation.id for conversation in conversations]
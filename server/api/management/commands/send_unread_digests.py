@@ -0,0 +1,16 @@
+# server/api/management/commands/send_unread_digests.py
+from django.core.management.base import BaseCommand
+
+from api.digests import send_unread_digests
+
+
+class Command(BaseCommand):
+    help = "Email each user one digest of their unread chat messages; run periodically (e.g. from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age-minutes', type=int, default=None)
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        sent = send_unread_digests(options['min_age_minutes'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Sent {sent} digests"))
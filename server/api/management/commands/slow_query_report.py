@@ -0,0 +1,51 @@
+# server/api/management/commands/slow_query_report.py
+import os
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.slow_queries import aggregate, load_entries, log_path
+
+
+class Command(BaseCommand):
+    help = "Summarize the slow query log by statement fingerprint, worst offenders first"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help="Slow query log to read (default: SLOW_QUERY_LOG['FILE'])")
+        parser.add_argument('--hours', type=float, help="Only entries from the last N hours")
+        parser.add_argument('--order', choices=['total', 'count', 'max'], default='total')
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--plans', type=int, default=2, help="Worst distinct plans shown per fingerprint")
+
+    def handle(self, *args, **options):
+        path = options['file'] or log_path()
+        if not os.path.exists(path):
+            raise CommandError(f"No slow query log at {path}")
+
+        since = None
+        if options['hours']:
+            since = (timezone.now() - timedelta(hours=options['hours'])).isoformat()
+        entries = load_entries(path, since)
+        if not entries:
+            self.stdout.write("No slow queries logged")
+            return
+
+        order_key = {'total': 'total_ms', 'count': 'count', 'max': 'max_ms'}[options['order']]
+        report = sorted(aggregate(entries, options['plans']), key=lambda group: group[order_key], reverse=True)
+
+        self.stdout.write(f"{len(entries)} slow queries, {len(report)} distinct statements\n")
+        for group in report[:options['limit']]:
+            self.stdout.write(self.style.WARNING(
+                f"[{group['fingerprint']}] total {group['total_ms']:.1f} ms, "
+                f"{group['count']}x, worst {group['max_ms']:.1f} ms"
+            ))
+            self.stdout.write(f"  {group['sql']}")
+            self.stdout.write(f"  worst params: {group['worst_params']}")
+            for (view, site), count in group['sources'][:5]:
+                self.stdout.write(f"  {count:5d}x  {view}  {site}")
+            for plan in group['plans']:
+                self.stdout.write("  plan:")
+                for line in plan.splitlines():
+                    self.stdout.write(f"    {line}")
+            self.stdout.write("")
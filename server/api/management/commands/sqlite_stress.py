@@ -0,0 +1,160 @@
+# server/api/management/commands/sqlite_stress.py
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+from django.db.utils import load_backend
+from django.test.utils import override_settings
+from prometheus_client import REGISTRY
+
+from api.sqlite_tuning import is_lock_error
+
+ALIAS = 'sqlite_stress'
+
+SCHEMA = [
+    "CREATE TABLE conversation (id INTEGER PRIMARY KEY, last_message_at REAL, messages INTEGER NOT NULL)",
+    "CREATE TABLE message (id INTEGER PRIMARY KEY AUTOINCREMENT, conversation_id INTEGER NOT NULL, "
+    "sender INTEGER NOT NULL, body TEXT NOT NULL, created_at REAL NOT NULL)",
+    "CREATE TABLE presence (user_id INTEGER PRIMARY KEY, last_seen REAL NOT NULL)",
+]
+
+
+def send_message(worker, n):
+    """The shape of a chat send: read the conversation, insert, update it, in one transaction."""
+    conversation_id = n % 10
+    with transaction.atomic(using=ALIAS):
+        with connections[ALIAS].cursor() as cursor:
+            cursor.execute("SELECT messages FROM conversation WHERE id = %s", [conversation_id])
+            cursor.fetchone()
+            cursor.execute(
+                "INSERT INTO message (conversation_id, sender, body, created_at) VALUES (%s, %s, %s, %s)",
+                [conversation_id, worker, f'message {n} from {worker}', time.time()],
+            )
+            cursor.execute(
+                "UPDATE conversation SET messages = messages + 1, last_message_at = %s WHERE id = %s",
+                [time.time(), conversation_id],
+            )
+
+
+def touch_presence(worker, n):
+    """The shape of the auth/presence bookkeeping: one write outside a transaction."""
+    with connections[ALIAS].cursor() as cursor:
+        cursor.execute(
+            "INSERT OR REPLACE INTO presence (user_id, last_seen) VALUES (%s, %s)", [worker, time.time()]
+        )
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent chat-send and presence writes against a scratch SQLite file "
+        "and report throughput, latency and lock errors"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--writes', type=int, default=100, help="Writes per thread")
+        parser.add_argument('--rate', type=float, default=200, help="Target writes/s over all threads, 0 for unthrottled")
+        parser.add_argument('--untuned', action='store_true', help="Run without SQLITE_TUNING, for comparison")
+
+    def handle(self, *args, **options):
+        tuning = {**getattr(settings, 'SQLITE_TUNING', {}), 'ENABLED': not options['untuned']}
+        directory = tempfile.mkdtemp(prefix='sqlite-stress-')
+        # Always SQLite, whatever the configured databases are.
+        # configure_settings() fills in the other keys; it wants a 'default'.
+        self.settings_dict = connections.configure_settings({
+            'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(directory, 'stress.sqlite3')},
+        })['default']
+        try:
+            # Lock waits would flood the slow query log with scratch statements
+            with override_settings(SQLITE_TUNING=tuning, SLOW_QUERY_LOG={'THRESHOLD_MS': None}):
+                self.create_schema()
+                results = self.run_workers(options)
+        finally:
+            for name in os.listdir(directory):
+                os.remove(os.path.join(directory, name))
+            os.rmdir(directory)
+        self.report(options, *results)
+
+    def open_connection(self):
+        """
+        Give this thread its own connection to the scratch file. It is not
+        added to settings.DATABASES, so it never shows up in connections.all().
+        """
+        backend = load_backend(self.settings_dict['ENGINE'])
+        connections[ALIAS] = backend.DatabaseWrapper(self.settings_dict, ALIAS)
+
+    def close_connection(self):
+        connections[ALIAS].close()
+        del connections[ALIAS]
+
+    def create_schema(self):
+        self.open_connection()
+        try:
+            with connections[ALIAS].cursor() as cursor:
+                for statement in SCHEMA:
+                    cursor.execute(statement)
+                for conversation_id in range(10):
+                    cursor.execute("INSERT INTO conversation VALUES (%s, NULL, 0)", [conversation_id])
+        finally:
+            self.close_connection()
+
+    def run_workers(self, options):
+        threads, writes, rate = options['threads'], options['writes'], options['rate']
+        interval = threads / rate if rate else 0
+        latencies, errors = [], []
+        results_lock = threading.Lock()
+        retries_before = REGISTRY.get_sample_value('tolatiles_sqlite_write_retries_total') or 0
+
+        def work(worker):
+            started = time.perf_counter() + worker * interval / threads
+            self.open_connection()
+            try:
+                for n in range(writes):
+                    delay = started + n * interval - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    write = send_message if n % 2 == 0 else touch_presence
+                    start = time.perf_counter()
+                    try:
+                        write(worker, n)
+                    except OperationalError as e:
+                        with results_lock:
+                            errors.append(e)
+                        continue
+                    with results_lock:
+                        latencies.append(time.perf_counter() - start)
+            finally:
+                self.close_connection()
+
+        started = time.perf_counter()
+        workers = [threading.Thread(target=work, args=(worker,)) for worker in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        retries = (REGISTRY.get_sample_value('tolatiles_sqlite_write_retries_total') or 0) - retries_before
+        return latencies, errors, int(retries), elapsed
+
+    def report(self, options, latencies, errors, retries, elapsed):
+        lock_errors = sum(1 for error in errors if is_lock_error(error))
+        mode = 'untuned' if options['untuned'] else 'tuned'
+        target = f"target {options['rate']:g}" if options['rate'] else 'unthrottled'
+        self.stdout.write(
+            f"SQLite stress ({mode}): {options['threads']} threads, {len(latencies)} writes in "
+            f"{elapsed:.2f} s ({len(latencies) / elapsed:.0f} writes/s, {target})"
+        )
+        self.stdout.write(f"lock errors: {lock_errors}, other errors: {len(errors) - lock_errors}, retries: {retries}")
+        if latencies:
+            latencies_ms = [latency * 1000 for latency in latencies]
+            p95 = statistics.quantiles(latencies_ms, n=20)[-1] if len(latencies_ms) > 1 else latencies_ms[0]
+            self.stdout.write(
+                f"latency ms: p50 {statistics.median(latencies_ms):.1f}, p95 {p95:.1f}, max {max(latencies_ms):.1f}"
+            )
+        if errors:
+            raise CommandError(f"{len(errors)} of {len(errors) + len(latencies)} writes failed, first: {errors[0]}")
@@ -0,0 +1,133 @@
+# server/api/metrics.py
+import hmac
+import os
+
+from django.conf import settings
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.http import HttpResponse, JsonResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+
+from .models import Message
+
+# Each gunicorn worker writes its samples to files in this directory and
+# /metrics merges them (see gunicorn.conf.py). Unset, metrics are per process.
+MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+PROMETHEUS_DEFAULTS = {
+    'ENABLED': True,
+    'TOKEN': None,
+    # Serve /metrics without a token or staff login
+    'PUBLIC': False,
+}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100, 250)
+
+REQUESTS = Counter(
+    'tolatiles_http_requests_total', 'HTTP requests by view, method and status',
+    ['view', 'method', 'status'],
+)
+REQUEST_LATENCY = Histogram(
+    'tolatiles_http_request_duration_seconds', 'Request latency by view',
+    ['view'], buckets=LATENCY_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    'tolatiles_db_queries_per_request', 'SQL queries run per request, by view',
+    ['view'], buckets=QUERY_COUNT_BUCKETS,
+)
+DB_DURATION = Histogram(
+    'tolatiles_db_duration_seconds', 'Time spent in SQL per request, by view',
+    ['view'], buckets=LATENCY_BUCKETS,
+)
+CACHE_LOOKUPS = Counter(
+    'tolatiles_cache_lookups_total', 'Cache reads made while serving requests, by result',
+    ['result'],
+)
+UPLOAD_BYTES = Counter(
+    'tolatiles_upload_bytes_total', 'Bytes received in multipart upload requests',
+)
+CHAT_MESSAGES = Counter(
+    'tolatiles_chat_messages_sent_total', 'Chat messages created',
+)
+PUSH_CONNECTIONS = Gauge(
+    'tolatiles_chat_push_connections', 'Open chat event streams',
+    multiprocess_mode='livesum',
+)
+WORKER_IN_FLIGHT = Gauge(
+    'tolatiles_worker_in_flight_requests', 'Requests being handled, per worker process',
+    multiprocess_mode='liveall',
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    'tolatiles_admission_in_flight', 'Admitted requests in flight, by route class',
+    ['route_class'], multiprocess_mode='livesum',
+)
+ADMISSION_SHED = Counter(
+    'tolatiles_admission_shed_total', 'Requests shed by admission control, by route class',
+    ['route_class'],
+)
+SQLITE_WRITE_RETRIES = Counter(
+    'tolatiles_sqlite_write_retries_total', 'SQLite writes retried after finding the database locked',
+)
+
+
+def prometheus_setting(name):
+    return getattr(settings, 'PROMETHEUS_METRICS', {}).get(name, PROMETHEUS_DEFAULTS[name])
+
+
+def metrics_enabled():
+    return prometheus_setting('ENABLED')
+
+
+def has_scrape_token(request):
+    token = prometheus_setting('TOKEN')
+    if not token:
+        return False
+    supplied = request.META.get('HTTP_AUTHORIZATION', '').removeprefix('Bearer ')
+    return hmac.compare_digest(supplied.encode(), token.encode())
+
+
+def observe_request(request, response, metrics, duration):
+    """
+    Record one finished request. ``metrics`` is its RequestMetrics.
+    """
+    match = request.resolver_match
+    view = (match.view_name or match._func_path) if match else 'unmatched'
+    REQUESTS.labels(view, request.method, str(response.status_code)).inc()
+    REQUEST_LATENCY.labels(view).observe(duration)
+    DB_QUERIES.labels(view).observe(metrics.queries)
+    DB_DURATION.labels(view).observe(metrics.db_time)
+    if metrics.cache_hits:
+        CACHE_LOOKUPS.labels('hit').inc(metrics.cache_hits)
+    if metrics.cache_misses:
+        CACHE_LOOKUPS.labels('miss').inc(metrics.cache_misses)
+    if request.content_type == 'multipart/form-data':
+        content_length = request.META.get('CONTENT_LENGTH')
+        if content_length and content_length.isdigit():
+            UPLOAD_BYTES.inc(int(content_length))
+
+
+@receiver(post_save, sender=Message)
+def count_chat_message(sender, instance, created, **kwargs):
+    if created:
+        CHAT_MESSAGES.inc()
+
+
+def metrics_view(request):
+    """
+    Prometheus exposition of this service, merged across workers when
+    PROMETHEUS_MULTIPROC_DIR is set. Served to staff users and to
+    scrapers sending ``Authorization: Bearer <PROMETHEUS_METRICS['TOKEN']>``;
+    anyone else gets a 403 unless PROMETHEUS_METRICS['PUBLIC'] is on.
+    """
+    if not (prometheus_setting('PUBLIC') or request.user.is_staff or has_scrape_token(request)):
+        return JsonResponse({'error': 'Metrics require a scrape token or a staff login'}, status=403)
+
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
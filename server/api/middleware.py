@@ -1,13 +1,27 @@
 # server/api/middleware.py
 from django.utils.deprecation import MiddlewareMixin
-from rest_framework.authtoken.models import Token
 from django.contrib.auth import login
 from django.http import JsonResponse
 from django.contrib.auth.models import User
 from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from .authentication import get_token_user
+from .db_routers import replica_aliases, replica_setting, request_routing
+from .instrumentation import RequestMetrics, current_metrics, metrics_setting
+from .profiling import requested_mode, run_profiled
+from .metrics import (
+    ADMISSION_IN_FLIGHT, ADMISSION_SHED, WORKER_IN_FLIGHT, metrics_enabled, observe_request
+)
+from contextlib import ExitStack
+import json
 import logging
+import random
+import threading
+import time
 
 logger = logging.getLogger(__name__)
+request_logger = logging.getLogger('api.requests')
 
 class FileUploadMiddleware(MiddlewareMixin):
     
@@ -39,6 +53,11 @@ class CrossDomainAuthMiddleware(MiddlewareMixin):
     and authenticates the user if a valid token is found.
     This allows frontend apps to use a token from the REST API
     to access the admin interface.
+    
+    Token requests are stateless: request.user is set without touching
+    the session. Only paths under TOKEN_AUTH_SESSION_PATHS (the admin by
+    default) are upgraded to a session login, since the admin relies on
+    the session cookie for subsequent requests.
     """
     
     def process_request(self, request):
@@ -55,18 +74,310 @@ class CrossDomainAuthMiddleware(MiddlewareMixin):
         if auth_header.startswith('Token '):
             token_key = auth_header.split(' ')[1]
             
-            try:
-                # Look up the token
-                token = Token.objects.get(key=token_key)
-                
-                # Get the user associated with this token
-                user = token.user
-                
+            # Look up the token through the shared token cache
+            user = get_token_user(request, token_key)
+            
+            if user is not None:
                 # Authenticate the user for this request
                 request.user = user
-                login(request, user)
-            except Token.DoesNotExist:
-                # Token not found, continue with unauthenticated request
-                pass
                 
-        return None
\ No newline at end of file
+                # Upgrade to a session only where one is needed
+                session_paths = getattr(settings, 'TOKEN_AUTH_SESSION_PATHS', ('/admin/',))
+                if request.path.startswith(tuple(session_paths)):
+                    login(request, user)
+                
+        return None
+
+
+class RouteClassLimiter:
+    """
+    Concurrency cap for one route class within this worker process.
+    
+    Requests over the cap wait up to ``queue_timeout`` seconds for a
+    slot, with at most ``max_queue`` waiting at once; anything beyond
+    that is shed immediately.
+    """
+    
+    def __init__(self, name, max_concurrency, max_queue, queue_timeout, retry_after=1):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.shed = 0
+    
+    def acquire(self):
+        acquired = self.semaphore.acquire(blocking=False)
+        
+        if not acquired:
+            with self.lock:
+                if self.queued >= self.max_queue:
+                    self.shed += 1
+                    ADMISSION_SHED.labels(self.name).inc()
+                    return False
+                self.queued += 1
+            try:
+                acquired = self.semaphore.acquire(timeout=self.queue_timeout)
+            finally:
+                with self.lock:
+                    self.queued -= 1
+        
+        with self.lock:
+            if acquired:
+                self.in_flight += 1
+                self.admitted += 1
+            else:
+                self.shed += 1
+        if acquired:
+            ADMISSION_IN_FLIGHT.labels(self.name).inc()
+        else:
+            ADMISSION_SHED.labels(self.name).inc()
+        return acquired
+    
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
+        ADMISSION_IN_FLIGHT.labels(self.name).dec()
+        self.semaphore.release()
+    
+    def snapshot(self):
+        with self.lock:
+            return {
+                'max_concurrency': self.max_concurrency,
+                'in_flight': self.in_flight,
+                'queue_depth': self.queued,
+                'admitted': self.admitted,
+                'shed': self.shed,
+            }
+
+
+# Limiters of the active AdmissionControlMiddleware, by route class
+admission_limiters = {}
+
+
+class AdmissionControlMiddleware:
+    """
+    Load shedding per route class (catalog, upload, chat, admin).
+    
+    Caps in-flight requests per class so slow uploads or large list
+    requests cannot occupy every worker thread. Requests that cannot get
+    a slot before their queue deadline get a fast 503 with Retry-After.
+    Limits come from settings.ADMISSION_CONTROL; classes missing from it
+    are not limited.
+    
+    The caps are semaphores in this process, shared by its threads only.
+    Under sync gunicorn workers each process handles one request at a
+    time, so nothing is ever shed; run gthread workers (``--threads``) or
+    an ASGI server for the caps to apply.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.limiters = {
+            name: RouteClassLimiter(
+                name,
+                config['MAX_CONCURRENCY'],
+                config.get('MAX_QUEUE', 0),
+                config.get('QUEUE_TIMEOUT', 0),
+                config.get('RETRY_AFTER', 1),
+            )
+            for name, config in getattr(settings, 'ADMISSION_CONTROL', {}).items()
+        }
+        admission_limiters.clear()
+        admission_limiters.update(self.limiters)
+    
+    def classify(self, request):
+        path = request.path
+        if path.startswith('/admin/'):
+            return 'admin'
+        if path.startswith('/api/chat/'):
+            return 'chat'
+        if request.content_type and 'multipart/form-data' in request.content_type:
+            return 'upload'
+        if path.startswith('/api/') and request.method in ('GET', 'HEAD'):
+            return 'catalog'
+        return None
+    
+    def __call__(self, request):
+        limiter = self.limiters.get(self.classify(request))
+        if limiter is None:
+            return self.get_response(request)
+        
+        if not limiter.acquire():
+            logger.warning(f"Shedding {request.method} {request.path} ({limiter.name} over capacity)")
+            response = JsonResponse({
+                'error': 'Server is busy, please retry shortly',
+            }, status=503)
+            response['Retry-After'] = str(limiter.retry_after)
+            return response
+        
+        try:
+            return self.get_response(request)
+        finally:
+            limiter.release()
+
+
+class RequestMetricsMiddleware:
+    """
+    Per-request query count, DB time, serializer time, render time and
+    cache hits/misses.
+    
+    Queries are timed with connection.execute_wrapper, so this works with
+    DEBUG off. Serializer time is the view's time outside SQL until its
+    response comes back from DRF's finalize_response; cache reads are
+    counted by the api.cache_backends classes. Every request feeds the
+    Prometheus metrics in api.metrics (unless PROMETHEUS_METRICS['ENABLED']
+    is off). A REQUEST_METRICS['SAMPLE_RATE'] share also logs one JSON line
+    on the 'api.requests' logger (WARNING above SLOW_REQUEST_MS, INFO
+    otherwise) and, for staff or with REQUEST_METRICS['EXPOSE_HEADER'],
+    gets a Server-Timing header.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        sample_rate = metrics_setting('SAMPLE_RATE')
+        sampled = bool(sample_rate) and random.random() < sample_rate
+        exported = metrics_enabled()
+        if not sampled and not exported:
+            return self.get_response(request)
+        
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        WORKER_IN_FLIGHT.inc()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            WORKER_IN_FLIGHT.dec()
+            current_metrics.reset(token)
+        
+        total = metrics.elapsed()
+        if exported:
+            observe_request(request, response, metrics, total)
+        if not sampled:
+            return response
+        
+        if metrics_setting('SERVER_TIMING') and self.expose_timings(request):
+            response['Server-Timing'] = metrics.server_timing(total)
+        
+        match = request.resolver_match
+        line = {
+            'method': request.method,
+            'path': request.path,
+            'view': (match.view_name or match._func_path) if match else None,
+            'status': response.status_code,
+            **metrics.as_dict(total),
+        }
+        slow = total * 1000 >= metrics_setting('SLOW_REQUEST_MS')
+        request_logger.log(logging.WARNING if slow else logging.INFO, json.dumps(line), extra={'metrics': line})
+        return response
+    
+    def expose_timings(self, request):
+        if metrics_setting('EXPOSE_HEADER'):
+            return True
+        user = getattr(request, 'user', None)
+        return user is not None and user.is_staff
+    
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Lets the slow query log say which view a statement came from
+        metrics = current_metrics.get()
+        if metrics is not None:
+            match = request.resolver_match
+            metrics.view = match.view_name or match._func_path
+            metrics.start_view()
+    
+    def process_template_response(self, request, response):
+        # DRF responses render right after this hook returns
+        metrics = current_metrics.get()
+        if metrics is not None and hasattr(response, 'add_post_render_callback'):
+            metrics.finish_view()
+            started = time.perf_counter()
+            
+            def rendered(response):
+                metrics.render_time += time.perf_counter() - started
+            response.add_post_render_callback(rendered)
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profile one request on demand. Staff add ``?__profile=1`` (cProfile)
+    or ``?__profile=sample`` (stack sampling), or an X-Profile header, to
+    any request; the profile and its SQL are saved to disk and listed at
+    /admin/profiles/. The response carries the profile's id in
+    X-Profile-Id. Requests from anyone else are not affected.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        mode = requested_mode(request)
+        user = getattr(request, 'user', None)
+        if mode is None or not (user and user.is_staff):
+            return self.get_response(request)
+        
+        response, profile_id = run_profiled(mode, self.get_response, request)
+        response['X-Profile-Id'] = profile_id
+        logger.info(f"Saved {mode} profile {profile_id} for {request.method} {request.path}")
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Let safe API requests read from DATABASE_REPLICAS. A request that
+    writes pins its client to the primary for PIN_SECONDS, through a
+    cookie and, for signed-in users, a cache entry, so the next reads
+    see the write even if they arrive from another device or before the
+    replica caught up.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        state = {'use_replica': self.may_use_replica(request), 'wrote': False}
+        token = request_routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            request_routing.reset(token)
+        
+        if state['wrote']:
+            self.pin(request, response)
+        return response
+    
+    def may_use_replica(self, request):
+        if not replica_aliases() or request.method not in ('GET', 'HEAD'):
+            return False
+        if not request.path.startswith('/api/'):
+            return False
+        try:
+            pinned_until = float(request.COOKIES.get(replica_setting('COOKIE'), 0))
+        except ValueError:
+            pinned_until = 0
+        if pinned_until > time.time():
+            return False
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated and cache.get(f'db-pin:{user.pk}'):
+            return False
+        return True
+    
+    def pin(self, request, response):
+        seconds = replica_setting('PIN_SECONDS')
+        response.set_cookie(
+            replica_setting('COOKIE'), str(int(time.time() + seconds) + 1),
+            max_age=seconds, httponly=True, samesite='Lax',
+        )
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            cache.set(f'db-pin:{user.pk}', True, seconds)
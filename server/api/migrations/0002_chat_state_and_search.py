@@ -0,0 +1,189 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class VendorRunSQL(migrations.RunSQL):
+    """RunSQL that only runs on databases of one ``vendor``."""
+
+    def __init__(self, vendor, *args, **kwargs):
+        self.vendor = vendor
+        super().__init__(*args, **kwargs)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if self.applies_to(schema_editor.connection):
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if self.applies_to(schema_editor.connection):
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+    def applies_to(self, connection):
+        if connection.vendor != self.vendor:
+            return False
+        if self.vendor == 'sqlite':
+            # Without FTS5, chat search falls back to unindexed icontains
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA compile_options")
+                return any(row[0] == 'ENABLE_FTS5' for row in cursor.fetchall())
+        return True
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMessage',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('content', models.TextField(blank=True, null=True)),
+                ('attachment', models.FileField(blank=True, null=True, upload_to='chat_attachments/')),
+                ('is_read', models.BooleanField(default=False)),
+                ('is_admin_message', models.BooleanField(default=False)),
+                ('status', models.CharField(choices=[('sent', 'Sent'), ('delivered', 'Delivered'), ('read', 'Read'), ('failed', 'Failed')], default='sent', max_length=10)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ParticipantState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('read_at', models.DateTimeField(blank=True, null=True)),
+                ('notified_message_id', models.BigIntegerField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StaffAgent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_available', models.BooleanField(default=True)),
+                ('open_threads', models.PositiveIntegerField(default=0)),
+                ('last_assigned_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SupportAssignment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_open', models.BooleanField(default=True)),
+                ('assigned_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.message'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='max_user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='min_user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'id'], name='api_message_convers_66f1d8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['sender', 'updated_at', 'id'], name='api_message_sender__6d51e2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['receiver', 'updated_at', 'id'], name='api_message_receive_1e466a_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.UniqueConstraint(fields=('min_user', 'max_user'), name='unique_direct_conversation'),
+        ),
+        migrations.AddField(
+            model_name='archivedmessage',
+            name='conversation',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_messages', to='api.conversation'),
+        ),
+        migrations.AddField(
+            model_name='archivedmessage',
+            name='receiver',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedmessage',
+            name='sender',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='participantstate',
+            name='conversation',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participant_states', to='api.conversation'),
+        ),
+        migrations.AddField(
+            model_name='participantstate',
+            name='last_read_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.message'),
+        ),
+        migrations.AddField(
+            model_name='participantstate',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversation_states', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='staffagent',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='agent', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='supportassignment',
+            name='agent',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assignments', to='api.staffagent'),
+        ),
+        migrations.AddField(
+            model_name='supportassignment',
+            name='customer',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='support_assignment', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archivedmessage',
+            index=models.Index(fields=['conversation', 'id'], name='api_archive_convers_03fc14_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='participantstate',
+            constraint=models.UniqueConstraint(fields=('user', 'conversation'), name='unique_participant_state'),
+        ),
+        migrations.AddIndex(
+            model_name='staffagent',
+            index=models.Index(fields=['is_available', 'open_threads', 'last_assigned_at'], name='api_staffag_is_avai_ceff39_idx'),
+        ),
+        # Chat search index (api.search); fill it with rebuild_search_index
+        VendorRunSQL(
+            'sqlite',
+            "CREATE VIRTUAL TABLE IF NOT EXISTS api_message_fts USING fts5("
+            "content, conversation_id UNINDEXED, tokenize='unicode61 remove_diacritics 2')",
+            "DROP TABLE IF EXISTS api_message_fts",
+        ),
+        VendorRunSQL(
+            'postgresql',
+            [
+                "CREATE TABLE IF NOT EXISTS api_message_search ("
+                "message_id bigint PRIMARY KEY, conversation_id bigint NOT NULL, document tsvector NOT NULL)",
+                "CREATE INDEX IF NOT EXISTS api_message_search_document ON api_message_search USING gin (document)",
+            ],
+            "DROP TABLE IF EXISTS api_message_search",
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_chat_state_and_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='participantstate',
+            index=models.Index(fields=['conversation', 'read_at'], name='api_partici_convers_84c70d_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def enroll_staff_agents(apps, schema_editor):
+    # New and promoted staff are enrolled by api.routing from here on
+    User = apps.get_model('auth', 'User')
+    StaffAgent = apps.get_model('api', 'StaffAgent')
+    StaffAgent.objects.bulk_create(
+        [StaffAgent(user=user) for user in User.objects.filter(is_staff=True, is_active=True).order_by('pk')],
+        ignore_conflicts=True
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_participantstate_read_at_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(enroll_staff_agents, migrations.RunPython.noop),
+    ]
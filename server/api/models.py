@@ -1,9 +1,11 @@
 # server/api/models.py
 from django.db import models
 from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Count, Max, OuterRef, Subquery, IntegerField
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
 from django.utils.text import slugify
-from django.db.models.signals import post_save
-from django.dispatch import receiver
 import uuid
 
 
@@ -27,39 +29,367 @@ class UserProfile(models.Model):
         if self.profile_image:
             return self.profile_image.url
         return None
-
-# Create UserProfile automatically when a User is created
-@receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
-    if created:
-        UserProfile.objects.create(user=instance)
-
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    try:
-        instance.profile.save()
-    except UserProfile.DoesNotExist:
-        UserProfile.objects.create(user=instance)
+    
+    @classmethod
+    def save_for_user(cls, user, values):
+        """
+        Persist profile ``values`` for ``user``, writing only changed fields.
+        
+        Profiles are created lazily on first write rather than on every
+        User save, so logins and password changes never touch this table.
+        """
+        try:
+            profile = user.profile
+        except cls.DoesNotExist:
+            return cls.objects.create(user=user, **values)
+        
+        changed = [name for name, value in values.items() if getattr(profile, name) != value]
+        if changed:
+            for name in changed:
+                setattr(profile, name, values[name])
+            profile.save(update_fields=changed + ['updated_at'])
+        return profile
 
 # Chat Models
 class Conversation(models.Model):
     participants = models.ManyToManyField(User, related_name='conversations')
+    # Canonical (lower id, higher id) participant pair of a 1:1 conversation
+    min_user = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE, null=True, blank=True)
+    max_user = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE, null=True, blank=True)
+    # Denormalized pointer maintained by record_message()
+    last_message = models.ForeignKey(
+        'Message', related_name='+', on_delete=models.SET_NULL, null=True, blank=True
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-updated_at']
+        constraints = [
+            models.UniqueConstraint(fields=['min_user', 'max_user'], name='unique_direct_conversation'),
+        ]
     
     def __str__(self):
         return f"Conversation {self.id} between {', '.join([user.username for user in self.participants.all()])}"
     
-    @property
-    def last_message(self):
-        return self.messages.order_by('-created_at').first()
+    @classmethod
+    def create_between(cls, *users, **fields):
+        """
+        Create a conversation for ``users`` along with their participant state rows.
+        """
+        users = list({user.pk: user for user in users}.values())
+        conversation = cls.objects.create(**fields)
+        conversation.participants.add(*users)
+        ParticipantState.objects.bulk_create(
+            [ParticipantState(conversation=conversation, user=user) for user in users]
+        )
+        return conversation
+    
+    @classmethod
+    def get_or_create_direct(cls, user, other_user):
+        """
+        Return ``(conversation, created)`` for the 1:1 conversation between
+        two users, looked up with a single probe of the unique pair index.
+        
+        Concurrent first messages race on the unique constraint, and the
+        loser picks up the winner's conversation.
+        """
+        min_user_id, max_user_id = sorted([user.pk, other_user.pk])
+        conversation = cls.objects.filter(min_user_id=min_user_id, max_user_id=max_user_id).first()
+        if conversation is not None:
+            return conversation, False
+        
+        try:
+            with transaction.atomic():
+                # Claim a conversation created before pair keys existed
+                legacy = cls.objects.filter(min_user__isnull=True, participants=user) \
+                                    .filter(participants=other_user).first()
+                if legacy is not None:
+                    legacy.min_user_id, legacy.max_user_id = min_user_id, max_user_id
+                    legacy.save(update_fields=['min_user', 'max_user'])
+                    return legacy, False
+                
+                conversation = cls.create_between(
+                    user, other_user, min_user_id=min_user_id, max_user_id=max_user_id
+                )
+                return conversation, True
+        except IntegrityError:
+            return cls.objects.get(min_user_id=min_user_id, max_user_id=max_user_id), False
+    
+    @classmethod
+    def rebuild_summaries(cls, conversation_ids):
+        """
+        Recompute last_message and participant states from the messages table.
+        
+        Existing read watermarks are kept; a watermark never moves back.
+        """
+        last_messages = dict(
+            Message.objects.filter(conversation_id__in=conversation_ids)
+            .values('conversation_id')
+            .annotate(last_id=Max('id'))
+            .values_list('conversation_id', 'last_id')
+        )
+        conversations = list(cls.objects.filter(id__in=conversation_ids))
+        for conversation in conversations:
+            conversation.last_message_id = last_messages.get(conversation.id)
+        cls.objects.bulk_update(conversations, ['last_message'])
+        
+        watermarks = {}
+        for conversation_id, user_id, last_read_id in ParticipantState.objects.filter(
+            conversation_id__in=conversation_ids, last_read_message__isnull=False
+        ).values_list('conversation_id', 'user_id', 'last_read_message_id'):
+            watermarks[(conversation_id, user_id)] = last_read_id
+        for conversation_id, user_id, last_read_id in Message.objects.filter(
+            conversation_id__in=conversation_ids, is_read=True
+        ).values('conversation_id', 'receiver_id').annotate(last_read=Max('id')) \
+         .values_list('conversation_id', 'receiver_id', 'last_read'):
+            key = (conversation_id, user_id)
+            watermarks[key] = max(watermarks.get(key, 0), last_read_id)
+        
+        unread = {}
+        for conversation_id, user_id, message_id in Message.objects.filter(
+            conversation_id__in=conversation_ids, is_read=False
+        ).values_list('conversation_id', 'receiver_id', 'id'):
+            key = (conversation_id, user_id)
+            if message_id > watermarks.get(key, 0):
+                unread[key] = unread.get(key, 0) + 1
+        participants = cls.participants.through.objects.filter(conversation_id__in=conversation_ids)
+        
+        ParticipantState.objects.filter(conversation_id__in=conversation_ids).delete()
+        ParticipantState.objects.bulk_create([
+            ParticipantState(
+                conversation_id=link.conversation_id,
+                user_id=link.user_id,
+                unread_count=unread.get((link.conversation_id, link.user_id), 0),
+                last_read_message_id=watermarks.get((link.conversation_id, link.user_id)),
+            )
+            for link in participants
+        ])
+    
+    def record_message(self, message):
+        """
+        Point last_message at ``message`` and bump the receiver's unread count.
+        
+        Must run in the transaction that created ``message``.
+        """
+        now = timezone.now()
+        Conversation.objects.filter(pk=self.pk).update(last_message=message, updated_at=now)
+        self.last_message = message
+        self.updated_at = now
+        
+        updated = ParticipantState.objects.filter(
+            conversation=self, user_id=message.receiver_id
+        ).update(unread_count=F('unread_count') + 1)
+        if not updated:
+            # Conversation predates participant state; count from scratch
+            ParticipantState.objects.create(
+                conversation=self,
+                user_id=message.receiver_id,
+                unread_count=self.messages.filter(receiver_id=message.receiver_id, is_read=False).count()
+            )
+    
+    def mark_read_up_to(self, user, up_to_message_id):
+        """
+        Advance ``user``'s read watermark to ``up_to_message_id``, an id of
+        a message in this conversation. Every message to ``user`` at or
+        below the watermark counts as read without its row being touched.
+        
+        A single UPDATE, with the remaining unread count recomputed in a
+        subquery. Returns False if the watermark was already there.
+        """
+        unread_count = Message.objects.filter(
+            conversation=self, receiver=user, is_read=False, id__gt=up_to_message_id
+        ).order_by().values('conversation').annotate(count=Count('id')).values('count')
+        updated = ParticipantState.objects.filter(conversation=self, user=user).filter(
+            Q(last_read_message__isnull=True) | Q(last_read_message_id__lt=up_to_message_id)
+        ).update(
+            last_read_message_id=up_to_message_id,
+            unread_count=Coalesce(Subquery(unread_count, output_field=IntegerField()), 0),
+            read_at=timezone.now(),
+        )
+        return bool(updated)
+    
+    def messages_marked_read(self, user, message_ids):
+        """
+        Update ``user``'s summary after the rows ``message_ids`` (messages
+        to ``user`` in this conversation) were flipped to ``is_read``.
+        
+        The watermark only advances over the contiguous prefix that is now
+        read, i.e. up to the first message still unread; messages the
+        client did not mark stay unread. When it cannot move, the unread
+        count drops by the flipped messages above the watermark.
+        """
+        watermark = ParticipantState.objects.filter(conversation=self, user=user) \
+                        .values_list('last_read_message_id', flat=True).first()
+        still_unread = Message.objects.filter(conversation=self, receiver=user, is_read=False)
+        if watermark is not None:
+            still_unread = still_unread.filter(id__gt=watermark)
+            message_ids = [message_id for message_id in message_ids if message_id > watermark]
+        first_unread = still_unread.order_by('id').values_list('id', flat=True).first()
+        
+        read_prefix = Message.objects.filter(conversation=self)
+        if first_unread is not None:
+            read_prefix = read_prefix.filter(id__lt=first_unread)
+        up_to_message_id = read_prefix.order_by('-id').values_list('id', flat=True).first()
+        if up_to_message_id is not None and self.mark_read_up_to(user, up_to_message_id):
+            return
+        if message_ids:
+            ParticipantState.objects.filter(conversation=self, user=user).update(
+                unread_count=Greatest(F('unread_count') - len(message_ids), 0)
+            )
+
+class ParticipantState(models.Model):
+    """
+    Per-participant conversation summary so inbox lists need no COUNT queries.
+    """
+    conversation = models.ForeignKey(Conversation, related_name='participant_states', on_delete=models.CASCADE)
+    user = models.ForeignKey(User, related_name='conversation_states', on_delete=models.CASCADE)
+    unread_count = models.PositiveIntegerField(default=0)
+    # Read watermark: messages to this user up to here are read
+    last_read_message = models.ForeignKey(
+        'Message', related_name='+', on_delete=models.SET_NULL, null=True, blank=True
+    )
+    read_at = models.DateTimeField(null=True, blank=True)
+    # Highest message id already covered by an unread-message digest email
+    notified_message_id = models.BigIntegerField(null=True, blank=True)
     
-    @property
-    def unread_count(self):
-        return self.messages.filter(is_read=False).count()
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'conversation'], name='unique_participant_state'),
+        ]
+        indexes = [
+            # Watermarks moved since a sync cursor
+            models.Index(fields=['conversation', 'read_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} in conversation {self.conversation_id}"
+
+class StaffAgent(models.Model):
+    """
+    Routing state for a staff member answering customer chats.
+    """
+    user = models.OneToOneField(User, related_name='agent', on_delete=models.CASCADE)
+    is_available = models.BooleanField(default=True)
+    open_threads = models.PositiveIntegerField(default=0)
+    last_assigned_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        indexes = [
+            # Least-loaded available agent is the first entry of this index
+            models.Index(fields=['is_available', 'open_threads', 'last_assigned_at']),
+        ]
+    
+    def __str__(self):
+        return f"Agent {self.user.username}"
+    
+    @classmethod
+    def least_loaded(cls):
+        """
+        Available agent with the fewest open threads, falling back to any
+        agent when nobody is available. Staff users get their agent row
+        when saved (api.routing).
+        
+        The chosen row is locked until the caller's transaction ends, and
+        agents locked by concurrent picks are skipped while others remain,
+        so simultaneous new threads spread out instead of all landing on
+        the same agent. Call inside ``transaction.atomic()``.
+        """
+        agents = cls.objects.select_related('user').filter(user__is_active=True, user__is_staff=True) \
+                    .order_by('open_threads', F('last_assigned_at').asc(nulls_first=True), 'pk')
+        for candidates in (agents.filter(is_available=True), agents):
+            locked = candidates.select_for_update(of=('self',))
+            agent = locked.select_for_update(skip_locked=True, of=('self',)).first() or locked.first()
+            if agent is not None:
+                return agent
+        return None
+    
+    def take_thread(self):
+        now = timezone.now()
+        StaffAgent.objects.filter(pk=self.pk).update(open_threads=F('open_threads') + 1, last_assigned_at=now)
+        self.last_assigned_at = now
+    
+    def release_thread(self):
+        StaffAgent.objects.filter(pk=self.pk).update(open_threads=Greatest(F('open_threads') - 1, 0))
+
+class SupportAssignment(models.Model):
+    """
+    The staff agent currently (or last) handling a customer's chat.
+    """
+    customer = models.OneToOneField(User, related_name='support_assignment', on_delete=models.CASCADE)
+    agent = models.ForeignKey(StaffAgent, related_name='assignments', on_delete=models.CASCADE)
+    is_open = models.BooleanField(default=True)
+    assigned_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.customer.username} -> {self.agent.user.username}"
+    
+    @classmethod
+    def assign(cls, customer):
+        """
+        Return the staff User who should receive ``customer``'s message.
+        
+        An open thread stays with its agent. Otherwise the previous agent
+        is reused while available, and new or orphaned threads go to the
+        available agent with the fewest open threads (longest idle first).
+        Returns None when there are no staff users.
+        """
+        with transaction.atomic():
+            assignment = cls.objects.select_for_update().select_related('agent__user') \
+                            .filter(customer=customer).first()
+            if assignment is not None:
+                agent = assignment.agent
+                on_staff = agent.user.is_active and agent.user.is_staff
+                if assignment.is_open and on_staff:
+                    return agent.user
+                if agent.is_available and on_staff:
+                    # Sticky: reopen with the previous agent
+                    cls.objects.filter(pk=assignment.pk).update(is_open=True, assigned_at=timezone.now())
+                    agent.take_thread()
+                    return agent.user
+            
+            agent = StaffAgent.least_loaded()
+            if agent is None:
+                return None
+            
+            if assignment is None:
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(customer=customer, agent=agent)
+                except IntegrityError:
+                    # A concurrent assign for this customer got there first
+                    return cls.objects.select_related('agent__user').get(customer=customer).agent.user
+            else:
+                if assignment.is_open:
+                    assignment.agent.release_thread()
+                cls.objects.filter(pk=assignment.pk).update(agent=agent, is_open=True, assigned_at=timezone.now())
+            agent.take_thread()
+            return agent.user
+    
+    @classmethod
+    def close_for(cls, customer):
+        """
+        Mark ``customer``'s thread resolved and free up its agent.
+        """
+        with transaction.atomic():
+            assignment = cls.objects.select_for_update().select_related('agent') \
+                            .filter(customer=customer, is_open=True).first()
+            if assignment is None:
+                return False
+            cls.objects.filter(pk=assignment.pk).update(is_open=False)
+            assignment.agent.release_thread()
+            return True
+
+class MessageQuerySet(models.QuerySet):
+    def with_read_state(self):
+        """
+        Annotate ``receiver_last_read``, the receiver's read watermark,
+        so MessageSerializer can report messages under it as read.
+        """
+        watermark = ParticipantState.objects.filter(
+            conversation=OuterRef('conversation'), user=OuterRef('receiver')
+        ).values('last_read_message_id')[:1]
+        return self.annotate(receiver_last_read=Subquery(watermark))
 
 class Message(models.Model):
     STATUS_CHOICES = (
@@ -80,8 +410,17 @@ class Message(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = MessageQuerySet.as_manager()
+    
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # History paging within a conversation
+            models.Index(fields=['conversation', 'id']),
+            # Incremental sync by (updated_at, id) cursor
+            models.Index(fields=['sender', 'updated_at', 'id']),
+            models.Index(fields=['receiver', 'updated_at', 'id']),
+        ]
     
     def __str__(self):
         return f"Message from {self.sender.username} to {self.receiver.username}"
@@ -92,6 +431,79 @@ class Message(models.Model):
             return self.attachment.url
         return None
     
+class ArchivedMessage(models.Model):
+    """
+    Cold copy of a Message moved out of the hot table by the
+    archive_messages command. Keeps the original id so history paging
+    can continue from Message into the archive.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='archived_messages')
+    sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    receiver = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    content = models.TextField(blank=True, null=True)
+    attachment = models.FileField(upload_to='chat_attachments/', blank=True, null=True)
+    is_read = models.BooleanField(default=False)
+    is_admin_message = models.BooleanField(default=False)
+    status = models.CharField(max_length=10, choices=Message.STATUS_CHOICES, default='sent')
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    ARCHIVED_FIELDS = [
+        'id', 'conversation_id', 'sender_id', 'receiver_id', 'content', 'attachment',
+        'is_read', 'is_admin_message', 'status', 'created_at', 'updated_at',
+    ]
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['conversation', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"Archived message {self.id} in conversation {self.conversation_id}"
+    
+    @property
+    def attachment_url(self):
+        if self.attachment:
+            return self.attachment.url
+        return None
+    
+    @classmethod
+    def archive(cls, message_ids):
+        """
+        Copy the given messages into the archive and delete them from
+        Message, in one transaction. Returns the number moved.
+        
+        Only read messages are archived, so the copies are stored as read
+        even when they were read through the receiver's watermark.
+        """
+        with transaction.atomic():
+            rows = list(Message.objects.filter(id__in=message_ids).values(*cls.ARCHIVED_FIELDS))
+            for row in rows:
+                row.update(is_read=True, status='read')
+            cls.objects.bulk_create([cls(**row) for row in rows], ignore_conflicts=True)
+            Message.objects.filter(id__in=[row['id'] for row in rows]).delete()
+        return len(rows)
+    
+def count_subquery(queryset, field):
+    """
+    Correlated COUNT of ``queryset`` rows whose ``field`` is the outer row,
+    so list endpoints can annotate counts instead of querying per row.
+    """
+    counts = queryset.filter(**{field: OuterRef('pk')}).order_by() \
+                     .values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+class ProductTypeQuerySet(models.QuerySet):
+    def for_listing(self):
+        """Annotate the counts ProductTypeSerializer renders."""
+        return self.annotate(
+            tiles_total=count_subquery(Tile.objects.all(), 'product_type'),
+            categories_total=count_subquery(TileCategory.objects.all(), 'product_type'),
+        )
+
 class ProductType(models.Model):
     name = models.CharField(max_length=100)  # Backsplash, Fireplace, etc.
     slug = models.SlugField(max_length=120, unique=True, blank=True)
@@ -104,6 +516,8 @@ class ProductType(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ProductTypeQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Product Type'
         verbose_name_plural = 'Product Types'
@@ -123,6 +537,13 @@ class ProductType(models.Model):
             return self.image.url
         return None
 
+class TileCategoryQuerySet(models.QuerySet):
+    def for_listing(self):
+        """Load what TileCategorySerializer renders in this query."""
+        return self.select_related('product_type').annotate(
+            tiles_total=count_subquery(Tile.objects.all(), 'category')
+        )
+
 class TileCategory(models.Model):
     name = models.CharField(max_length=100)
     slug = models.SlugField(max_length=120, unique=True, blank=True)
@@ -134,6 +555,8 @@ class TileCategory(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = TileCategoryQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Tile Category'
         verbose_name_plural = 'Tile Categories'
@@ -154,6 +577,11 @@ class TileCategory(models.Model):
             return self.image.url
         return None
 
+class TileQuerySet(models.QuerySet):
+    def for_listing(self):
+        """Load what TileSerializer renders in a fixed number of queries."""
+        return self.select_related('category', 'product_type').prefetch_related('images')
+
 class Tile(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=220, unique=True, blank=True)
@@ -169,6 +597,8 @@ class Tile(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = TileQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Tile'
         verbose_name_plural = 'Tiles'
@@ -243,6 +673,20 @@ class TeamMember(models.Model):
             return self.image.url
         return None
 
+class ProjectQuerySet(models.QuerySet):
+    def for_listing(self):
+        """Load what ProjectSerializer renders in a fixed number of queries."""
+        return self.select_related('product_type').prefetch_related('images').annotate(
+            testimonials_total=count_subquery(CustomerTestimonial.objects.all(), 'project')
+        )
+    
+    def for_detail(self):
+        """``for_listing`` plus the tiles and testimonials ProjectDetailSerializer nests."""
+        return self.for_listing().prefetch_related(
+            models.Prefetch('tiles_used', queryset=Tile.objects.for_listing()),
+            'testimonials',
+        )
+
 class Project(models.Model):
     PROGRESS_CHOICES = (
         ('planning', 'Planning'),
@@ -265,6 +709,8 @@ class Project(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ProjectQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Project'
         verbose_name_plural = 'Projects'
@@ -0,0 +1,68 @@
+# server/api/postgres.py
+import logging
+
+from django.db import DatabaseError, connection, transaction
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
+
+from .models import Project, Tile
+
+logger = logging.getLogger(__name__)
+
+# Columns searched with icontains (TileViewSet/ProjectViewSet ``search``).
+# Django compares UPPER(column::text), so the indexes are on that expression.
+TRIGRAM_INDEXES = {
+    Tile: ('title', 'description', 'material', 'sku'),
+    Project: ('title', 'description', 'client', 'location'),
+}
+
+
+def is_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def enable_extension(name):
+    """
+    Create extension ``name`` if the server ships it and we are allowed
+    to; True when it is installed afterwards.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = %s", [name])
+        if cursor.fetchone() is None:
+            return False
+        try:
+            with transaction.atomic():
+                cursor.execute(f'CREATE EXTENSION IF NOT EXISTS {name}')
+        except DatabaseError as e:
+            logger.warning(f"Could not create PostgreSQL extension {name}: {e}")
+            return False
+    return True
+
+
+def ensure_trigram_indexes():
+    """
+    GIN trigram indexes so ``icontains`` searches stop scanning the
+    catalog tables. Returns the names of the indexes, empty when pg_trgm
+    is not available.
+    """
+    if not enable_extension('pg_trgm'):
+        logger.info("pg_trgm not available; catalog searches stay unindexed")
+        return []
+    names = []
+    with connection.cursor() as cursor:
+        for model, columns in TRIGRAM_INDEXES.items():
+            table = model._meta.db_table
+            for column in columns:
+                name = f'{table}_{column}_trgm'
+                cursor.execute(
+                    f'CREATE INDEX IF NOT EXISTS {name} ON {table} '
+                    f'USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+                )
+                names.append(name)
+    return names
+
+
+@receiver(post_migrate)
+def create_postgres_indexes(sender, app_config=None, **kwargs):
+    if app_config is not None and app_config.name == 'api' and is_postgres():
+        ensure_trigram_indexes()
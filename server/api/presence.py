@@ -0,0 +1,140 @@
+# server/api/presence.py
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .events import publish_to_users
+from .models import Conversation
+
+PRESENCE_DEFAULTS = {
+    'ONLINE_TTL': 45,
+    'LAST_SEEN_TTL': 7 * 24 * 3600,
+    'TYPING_TTL': 6,
+}
+
+
+def _presence_setting(name):
+    return getattr(settings, 'CHAT_PRESENCE', {}).get(name, PRESENCE_DEFAULTS[name])
+
+
+def online_key(user_id):
+    return f'presence:online:{user_id}'
+
+
+def last_seen_key(user_id):
+    return f'presence:seen:{user_id}'
+
+
+def streams_key(user_id):
+    return f'presence:streams:{user_id}'
+
+
+def typing_key(conversation_id, user_id):
+    return f'presence:typing:{conversation_id}:{user_id}'
+
+
+def chat_partner_ids(user_id):
+    """
+    Ids of users who share a conversation with ``user_id``.
+    """
+    return list(
+        Conversation.participants.through.objects
+        .filter(conversation__participants=user_id)
+        .exclude(user_id=user_id)
+        .values_list('user_id', flat=True)
+        .distinct()
+    )
+
+
+def touch(user_id):
+    """
+    Mark ``user_id`` online for another ONLINE_TTL seconds. Returns True
+    if they were offline.
+    """
+    now = time.time()
+    came_online = cache.add(online_key(user_id), now, _presence_setting('ONLINE_TTL'))
+    if not came_online:
+        cache.set(online_key(user_id), now, _presence_setting('ONLINE_TTL'))
+    cache.set(last_seen_key(user_id), now, _presence_setting('LAST_SEEN_TTL'))
+    # A stream count left behind by a dead worker lapses with presence
+    cache.touch(streams_key(user_id), _presence_setting('ONLINE_TTL'))
+    return came_online
+
+
+def announce_online(user_id):
+    """
+    ``touch`` and, if the user just came online, tell their chat partners.
+    """
+    if touch(user_id):
+        publish_to_users(chat_partner_ids(user_id), 'presence', {
+            'user': user_id,
+            'online': True,
+            'last_seen': time.time(),
+        })
+
+
+def stream_opened(user_id):
+    """
+    Count one more open chat stream for ``user_id`` and ``announce_online``.
+    """
+    key = streams_key(user_id)
+    cache.add(key, 0, _presence_setting('ONLINE_TTL'))
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Expired between add() and incr()
+        cache.set(key, 1, _presence_setting('ONLINE_TTL'))
+    announce_online(user_id)
+
+
+def stream_closed(user_id):
+    """
+    Count one chat stream of ``user_id`` as closed. When it was their
+    last, they go offline at once and their chat partners are told.
+    """
+    try:
+        remaining = cache.decr(streams_key(user_id))
+    except ValueError:
+        remaining = 0
+    if remaining > 0:
+        return
+    now = time.time()
+    cache.delete_many([streams_key(user_id), online_key(user_id)])
+    cache.set(last_seen_key(user_id), now, _presence_setting('LAST_SEEN_TTL'))
+    publish_to_users(chat_partner_ids(user_id), 'presence', {
+        'user': user_id,
+        'online': False,
+        'last_seen': now,
+    })
+
+
+def get_presence(user_ids):
+    """
+    Map each of ``user_ids`` to ``{'online', 'last_seen'}`` with one
+    cache round trip. ``last_seen`` is a Unix timestamp or None.
+    """
+    keys = [key for user_id in user_ids for key in (online_key(user_id), last_seen_key(user_id))]
+    found = cache.get_many(keys)
+    return {
+        user_id: {
+            'online': online_key(user_id) in found,
+            'last_seen': found.get(last_seen_key(user_id)),
+        }
+        for user_id in user_ids
+    }
+
+
+def set_typing(conversation_id, user_id, is_typing):
+    """
+    Record whether ``user_id`` is typing in a conversation. The flag
+    expires after TYPING_TTL seconds unless refreshed. Returns True if the
+    state changed, so repeated keystrokes do not fan out repeated events.
+    """
+    key = typing_key(conversation_id, user_id)
+    if is_typing:
+        if cache.add(key, True, _presence_setting('TYPING_TTL')):
+            return True
+        cache.touch(key, _presence_setting('TYPING_TTL'))
+        return False
+    return bool(cache.delete(key))
@@ -0,0 +1,231 @@
+# server/api/profiling.py
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import traceback
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+PROFILING_DEFAULTS = {
+    'DIR': 'profiles',
+    'KEEP': 200,
+    'QUERY_PARAM': '__profile',
+    'HEADER': 'HTTP_X_PROFILE',
+    'SAMPLE_INTERVAL': 0.005,
+    'STATS_LINES': 60,
+}
+
+PROFILE_ID = re.compile(r'^[0-9]{8}T[0-9]{12}-[0-9a-f]{8}$')
+
+
+def _profiling_setting(name):
+    return getattr(settings, 'REQUEST_PROFILING', {}).get(name, PROFILING_DEFAULTS[name])
+
+
+def profile_dir():
+    return os.path.join(settings.BASE_DIR, _profiling_setting('DIR'))
+
+
+def requested_mode(request):
+    """
+    'cprofile', 'sample' or None, from ``?__profile=`` or X-Profile.
+    """
+    value = request.GET.get(_profiling_setting('QUERY_PARAM')) or request.META.get(_profiling_setting('HEADER'))
+    if not value or value in ('0', 'false'):
+        return None
+    return 'sample' if value == 'sample' else 'cprofile'
+
+
+class QueryRecorder:
+    """
+    ``connection.execute_wrapper`` hook keeping every statement with its
+    parameters and duration, independent of DEBUG.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'params': repr(params)[:500],
+                'ms': round((time.perf_counter() - start) * 1000, 3),
+            })
+
+
+class SamplingProfiler:
+    """
+    Samples the profiled thread's stack every ``interval`` seconds from a
+    helper thread. Far cheaper than cProfile on slow requests; reports
+    how often each stack was seen.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+
+    def _run(self, thread_id):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                continue
+            stack = ';'.join(
+                f'{os.path.basename(entry.filename)}:{entry.name}:{entry.lineno}'
+                for entry in traceback.extract_stack(frame)
+            )
+            self.stacks[stack] += 1
+            self.samples += 1
+
+    def __enter__(self):
+        self._thread = threading.Thread(
+            target=self._run, args=(threading.get_ident(),), daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def report(self, limit):
+        """The frames most often found on top of the stack."""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        lines = [f"{self.samples} samples every {self.interval * 1000:g} ms", '', 'Hottest frames:']
+        lines += [f'{count:6d}  {frame}' for frame, count in leaves.most_common(limit)]
+        return '\n'.join(lines)
+
+    def folded(self):
+        """Collapsed stacks, the input format of flamegraph.pl and speedscope."""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+def run_profiled(mode, get_response, request):
+    """
+    Handle ``request`` under the profiler and the SQL recorder. Returns
+    the response and the saved profile's id.
+    """
+    recorder = QueryRecorder()
+    started = time.perf_counter()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        if mode == 'sample':
+            profiler = stack.enter_context(SamplingProfiler(_profiling_setting('SAMPLE_INTERVAL')))
+            response = get_response(request)
+        else:
+            profiler = cProfile.Profile()
+            response = profiler.runcall(get_response, request)
+    duration = time.perf_counter() - started
+
+    match = request.resolver_match
+    profile_id = save_profile(mode, profiler, recorder.queries, {
+        'method': request.method,
+        'path': request.get_full_path(),
+        'view': (match.view_name or match._func_path) if match else None,
+        'status': response.status_code,
+        'user': request.user.get_username(),
+        'duration_ms': round(duration * 1000, 1),
+    })
+    return response, profile_id
+
+
+def save_profile(mode, profiler, queries, details):
+    """
+    Write ``<id>.json`` (request details, SQL and a text report) and the
+    raw profile, ``<id>.prof`` for pstats/snakeviz or ``<id>.folded``.
+    """
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    profile_id = f"{timezone.now():%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+    limit = _profiling_setting('STATS_LINES')
+
+    if mode == 'sample':
+        report = profiler.report(limit)
+        with open(os.path.join(directory, f'{profile_id}.folded'), 'w') as folded:
+            folded.write(profiler.folded())
+    else:
+        profiler.dump_stats(os.path.join(directory, f'{profile_id}.prof'))
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).strip_dirs().sort_stats('cumulative').print_stats(limit)
+        report = output.getvalue()
+
+    with open(os.path.join(directory, f'{profile_id}.json'), 'w') as profile_file:
+        json.dump({
+            'id': profile_id,
+            'mode': mode,
+            'created_at': timezone.now().isoformat(),
+            **details,
+            'query_count': len(queries),
+            'db_ms': round(sum(query['ms'] for query in queries), 3),
+            'queries': queries,
+            'report': report,
+        }, profile_file)
+
+    prune_profiles(directory, _profiling_setting('KEEP'))
+    return profile_id
+
+
+def prune_profiles(directory, keep):
+    ids = sorted(name[:-5] for name in os.listdir(directory) if name.endswith('.json'))
+    for profile_id in ids[:max(len(ids) - keep, 0)]:
+        for suffix in ('.json', '.prof', '.folded'):
+            try:
+                os.remove(os.path.join(directory, profile_id + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles(limit=100):
+    """Summaries of the newest profiles, newest first."""
+    directory = profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    ids = sorted((name[:-5] for name in os.listdir(directory) if name.endswith('.json')), reverse=True)
+    profiles = []
+    for profile_id in ids[:limit]:
+        profile = load_profile(profile_id)
+        if profile is not None:
+            profile.pop('queries')
+            profile.pop('report')
+            profiles.append(profile)
+    return profiles
+
+
+def load_profile(profile_id):
+    if not PROFILE_ID.match(profile_id):
+        return None
+    try:
+        with open(os.path.join(profile_dir(), f'{profile_id}.json')) as profile_file:
+            return json.load(profile_file)
+    except (OSError, ValueError):
+        return None
+
+
+def raw_profile_path(profile_id):
+    """Path of the .prof or .folded file for ``profile_id``, if it exists."""
+    if not PROFILE_ID.match(profile_id):
+        return None
+    for suffix in ('.prof', '.folded'):
+        path = os.path.join(profile_dir(), profile_id + suffix)
+        if os.path.exists(path):
+            return path
+    return None
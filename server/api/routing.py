@@ -0,0 +1,18 @@
+# server/api/routing.py
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import StaffAgent
+
+
+@receiver(post_save, sender=User)
+def enroll_staff_agent(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Give active staff users the StaffAgent row that chat routing picks
+    from. Existing staff were enrolled by migration 0004.
+    """
+    if update_fields is not None and not {'is_staff', 'is_active'} & set(update_fields):
+        return
+    if instance.is_staff and instance.is_active:
+        StaffAgent.objects.bulk_create([StaffAgent(user=instance)], ignore_conflicts=True)
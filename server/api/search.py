@@ -0,0 +1,254 @@
+# server/api/search.py
+import logging
+import re
+
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils.html import escape
+
+from .models import ArchivedMessage, Message
+
+logger = logging.getLogger(__name__)
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def parse_terms(query, max_terms=8):
+    return TERM_RE.findall(query.lower())[:max_terms]
+
+
+def highlight(content, terms):
+    """
+    HTML-escape ``content`` and wrap words starting with any of ``terms``
+    in ``<mark>``.
+    """
+    content = escape(content or '')
+    if not terms:
+        return content
+    pattern = re.compile(r'\b(' + '|'.join(re.escape(term) for term in terms) + r')\w*', re.IGNORECASE)
+    return pattern.sub(lambda match: f'<mark>{match.group(0)}</mark>', content)
+
+
+class BasicSearchBackend:
+    """
+    Unindexed fallback: every term must appear in the content (icontains).
+    Searches hot messages only.
+    """
+    name = 'basic'
+
+    def ensure_index(self):
+        pass
+
+    def index_message(self, message):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def move_conversations(self, conversation_ids, into):
+        """Re-key indexed messages of ``conversation_ids`` to conversation ``into``."""
+        pass
+
+    def search_ids(self, terms, conversation_ids=None, before=None, limit=50):
+        messages = Message.objects.all()
+        if conversation_ids is not None:
+            messages = messages.filter(conversation_id__in=conversation_ids)
+        if before is not None:
+            messages = messages.filter(id__lt=before)
+        for term in terms:
+            messages = messages.filter(content__icontains=term)
+        return list(messages.order_by('-id').values_list('id', flat=True)[:limit])
+
+
+class SQLiteFTSBackend(BasicSearchBackend):
+    """
+    SQLite FTS5 index of message content keyed by message id.
+
+    Rows are written as messages are saved and are kept when a message
+    moves to ArchivedMessage, so archived history stays searchable.
+    Deleted messages leave stale rows until ``rebuild_search_index``;
+    results are always re-read from the message tables.
+    """
+    name = 'sqlite-fts5'
+    table = 'api_message_fts'
+
+    def ensure_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+                "content, conversation_id UNINDEXED, tokenize='unicode61 remove_diacritics 2')"
+            )
+
+    def index_message(self, message):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [message.id])
+            if message.content:
+                cursor.execute(
+                    f"INSERT INTO {self.table} (rowid, content, conversation_id) VALUES (%s, %s, %s)",
+                    [message.id, message.content, message.conversation_id]
+                )
+
+    def rebuild(self):
+        self.ensure_index()
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            for model in (ArchivedMessage, Message):
+                cursor.execute(
+                    f"INSERT INTO {self.table} (rowid, content, conversation_id) "
+                    f"SELECT id, content, conversation_id FROM {model._meta.db_table} "
+                    "WHERE content IS NOT NULL AND content != ''"
+                )
+
+    def move_conversations(self, conversation_ids, into):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {self.table} SET conversation_id = %s "
+                f"WHERE conversation_id IN ({', '.join(['%s'] * len(conversation_ids))})",
+                [into, *conversation_ids]
+            )
+
+    def search_ids(self, terms, conversation_ids=None, before=None, limit=50):
+        # Quote every term so user input cannot inject FTS5 syntax; each
+        # term matches as a prefix and all terms must match
+        match = ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+        sql = f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s"
+        params = [match]
+        if before is not None:
+            sql += " AND rowid < %s"
+            params.append(before)
+        if conversation_ids is not None:
+            if not conversation_ids:
+                return []
+            sql += f" AND conversation_id IN ({', '.join(['%s'] * len(conversation_ids))})"
+            params.extend(conversation_ids)
+        sql += " ORDER BY rowid DESC LIMIT %s"
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresSearchBackend(BasicSearchBackend):
+    """
+    PostgreSQL full text index of message content: one ``tsvector`` row
+    per message id under a GIN index. Same lifecycle as the FTS5 index.
+    The 'simple' configuration lowercases without stemming, like the
+    SQLite tokenizer.
+    """
+    name = 'postgres-tsvector'
+    table = 'api_message_search'
+
+    def ensure_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "message_id bigint PRIMARY KEY, conversation_id bigint NOT NULL, document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table}_document ON {self.table} USING gin (document)"
+            )
+
+    def index_message(self, message):
+        with connection.cursor() as cursor:
+            if not message.content:
+                cursor.execute(f"DELETE FROM {self.table} WHERE message_id = %s", [message.id])
+                return
+            cursor.execute(
+                f"INSERT INTO {self.table} (message_id, conversation_id, document) "
+                "VALUES (%s, %s, to_tsvector('simple', %s)) ON CONFLICT (message_id) DO UPDATE "
+                "SET conversation_id = EXCLUDED.conversation_id, document = EXCLUDED.document",
+                [message.id, message.conversation_id, message.content]
+            )
+
+    def rebuild(self):
+        self.ensure_index()
+        with connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {self.table}")
+            for model in (ArchivedMessage, Message):
+                cursor.execute(
+                    f"INSERT INTO {self.table} (message_id, conversation_id, document) "
+                    f"SELECT id, conversation_id, to_tsvector('simple', content) FROM {model._meta.db_table} "
+                    "WHERE content IS NOT NULL AND content != '' ON CONFLICT (message_id) DO NOTHING"
+                )
+
+    def move_conversations(self, conversation_ids, into):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {self.table} SET conversation_id = %s WHERE conversation_id = ANY(%s)",
+                [into, list(conversation_ids)]
+            )
+
+    def search_ids(self, terms, conversation_ids=None, before=None, limit=50):
+        # Terms are \w+ words; quoted, each matches as a prefix and all must match
+        query = ' & '.join(f"'{term}':*" for term in terms)
+        sql = f"SELECT message_id FROM {self.table} WHERE document @@ to_tsquery('simple', %s)"
+        params = [query]
+        if before is not None:
+            sql += " AND message_id < %s"
+            params.append(before)
+        if conversation_ids is not None:
+            if not conversation_ids:
+                return []
+            sql += " AND conversation_id = ANY(%s)"
+            params.append(list(conversation_ids))
+        sql += " ORDER BY message_id DESC LIMIT %s"
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+
+_backend = None
+
+
+def sqlite_has_fts5():
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return any(row[0] == 'ENABLE_FTS5' for row in cursor.fetchall())
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        if connection.vendor == 'sqlite' and sqlite_has_fts5():
+            _backend = SQLiteFTSBackend()
+        elif connection.vendor == 'postgresql':
+            _backend = PostgresSearchBackend()
+        else:
+            _backend = BasicSearchBackend()
+    return _backend
+
+
+def search_messages(query, conversation_ids=None, before=None, limit=50):
+    """
+    Return ``(messages, terms)``: messages whose content matches every
+    word of ``query``, newest first, hot and archived alike.
+
+    ``conversation_ids`` is a list of conversation ids to search in, or
+    None for all conversations.
+    """
+    terms = parse_terms(query)
+    if not terms:
+        return [], terms
+
+    ids = get_search_backend().search_ids(terms, conversation_ids, before, limit)
+    found = {
+        message.id: message
+        for model in (Message, ArchivedMessage)
+        for message in model.objects.filter(id__in=ids).select_related('sender__profile', 'receiver')
+    }
+    return [found[message_id] for message_id in ids if message_id in found], terms
+
+
+@receiver(post_save, sender=Message)
+def index_saved_message(sender, instance, created, update_fields=None, **kwargs):
+    if not created and update_fields is not None and 'content' not in update_fields:
+        return
+    try:
+        with transaction.atomic():
+            get_search_backend().index_message(instance)
+    except Exception:
+        # Search is best effort; never fail a chat message over it
+        logger.exception(f"Failed to index message {instance.id}")
+
@@ -40,42 +40,37 @@ class UserProfileSerializer(serializers.ModelSerializer):
         return None
 
 class UserSerializer(serializers.ModelSerializer):
-    profile = UserProfileSerializer(read_only=True)
+    profile = serializers.SerializerMethodField()
     
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'is_staff', 'profile']
         read_only_fields = ['id', 'is_staff']
     
+    def get_profile(self, obj):
+        # Profiles are created lazily; render defaults until the first write
+        profile = getattr(obj, 'profile', None) or UserProfile(user=obj)
+        return UserProfileSerializer(profile, context=self.context).data
+    
     def update(self, instance, validated_data):
-        # Update User model fields
-        instance.username = validated_data.get('username', instance.username)
-        instance.email = validated_data.get('email', instance.email)
-        instance.first_name = validated_data.get('first_name', instance.first_name)
-        instance.last_name = validated_data.get('last_name', instance.last_name)
-        instance.save()
+        # Update User model fields, writing only the ones that changed
+        changed = [
+            field for field in ['username', 'email', 'first_name', 'last_name']
+            if field in validated_data and getattr(instance, field) != validated_data[field]
+        ]
+        if changed:
+            for field in changed:
+                setattr(instance, field, validated_data[field])
+            instance.save(update_fields=changed)
         
         # Update UserProfile fields
         profile_data = self.context.get('profile_data')
         if profile_data:
-            profile = instance.profile
-            
-            if 'bio' in profile_data:
-                profile.bio = profile_data.get('bio')
-            
-            if 'phone' in profile_data:
-                profile.phone = profile_data.get('phone')
-            
-            if 'address' in profile_data:
-                profile.address = profile_data.get('address')
-            
-            if 'profile_image' in profile_data:
-                profile.profile_image = profile_data.get('profile_image')
-            
-            if 'preferences' in profile_data:
-                profile.preferences = profile_data.get('preferences')
-            
-            profile.save()
+            UserProfile.save_for_user(instance, {
+                key: profile_data[key]
+                for key in ['bio', 'phone', 'address', 'profile_image', 'preferences']
+                if key in profile_data
+            })
         
         return instance
 
@@ -107,6 +102,15 @@ class MessageSerializer(serializers.ModelSerializer):
         if obj.attachment:
             return self.context['request'].build_absolute_uri(obj.attachment.url)
         return None
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Annotated by Message.objects.with_read_state()
+        watermark = getattr(instance, 'receiver_last_read', None)
+        if watermark is not None and instance.id <= watermark:
+            data['is_read'] = True
+            data['status'] = 'read'
+        return data
 
 class ConversationSerializer(serializers.ModelSerializer):
     last_message = serializers.SerializerMethodField()
@@ -118,14 +122,21 @@ class ConversationSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at', 'last_message', 'unread_count']
     
     def get_last_message(self, obj):
-        last_message = obj.messages.order_by('-created_at').first()
-        if last_message:
-            return MessageSerializer(last_message, context=self.context).data
+        if obj.last_message:
+            if hasattr(obj, 'last_message_receiver_last_read'):
+                obj.last_message.receiver_last_read = obj.last_message_receiver_last_read
+            return MessageSerializer(obj.last_message, context=self.context).data
         return None
     
     def get_unread_count(self, obj):
+        # Annotated by ConversationViewSet.get_queryset
+        unread_count = getattr(obj, 'user_unread_count', None)
+        if unread_count is not None:
+            return unread_count
+        
         user = self.context.get('request').user
-        return obj.messages.filter(receiver=user, is_read=False).count() if user else 0
+        state = obj.participant_states.filter(user=user).first() if user else None
+        return state.unread_count if state else 0
 
 # Registration Serializer
 class RegisterSerializer(serializers.ModelSerializer):
@@ -148,12 +159,13 @@ class RegisterSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         validated_data.pop('password_confirm')
-        user = User.objects.create(
+        user = User(
             username=validated_data['username'],
             email=validated_data['email'],
             first_name=validated_data.get('first_name', ''),
             last_name=validated_data.get('last_name', '')
         )
+        # Hash before the first save so registration is a single INSERT
         user.set_password(validated_data['password'])
         user.save()
         return user
@@ -190,7 +202,38 @@ class MarkMessagesReadSerializer(serializers.Serializer):
         required=True
     )
 
+class MarkConversationReadSerializer(serializers.Serializer):
+    conversation = serializers.IntegerField(required=True)
+    up_to_message_id = serializers.IntegerField(required=True)
+
+class TypingSerializer(serializers.Serializer):
+    conversation = serializers.IntegerField(required=True)
+    is_typing = serializers.BooleanField(default=True)
+
+
+
+def annotated_count(obj, annotation, relation):
+    """
+    ``annotation`` set by a ``for_listing()`` queryset, or a COUNT of
+    ``relation`` for instances loaded without it.
+    """
+    total = getattr(obj, annotation, None)
+    if total is not None:
+        return total
+    return getattr(obj, relation).count()
+
+def primary_image_of(obj):
+    """
+    The primary image, else the first one, from ``obj.images``. Reads the
+    prefetched list when there is one.
+    """
+    images = list(obj.images.all())
+    return next((image for image in images if image.is_primary), images[0] if images else None)
 
+def images_count_of(obj):
+    if 'images' in getattr(obj, '_prefetched_objects_cache', {}):
+        return len(obj.images.all())
+    return obj.images.count()
 
 class ProductTypeSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
@@ -212,10 +255,10 @@ class ProductTypeSerializer(serializers.ModelSerializer):
         return None
     
     def get_tiles_count(self, obj):
-        return obj.tiles.count()
+        return annotated_count(obj, 'tiles_total', 'tiles')
     
     def get_categories_count(self, obj):
-        return obj.categories.count()
+        return annotated_count(obj, 'categories_total', 'categories')
 
 class ProductTypeDetailSerializer(ProductTypeSerializer):
     """Serializer for detailed product type view with associated categories and tiles"""
@@ -225,7 +268,7 @@ class ProductTypeDetailSerializer(ProductTypeSerializer):
         fields = ProductTypeSerializer.Meta.fields + ['categories']
     
     def get_categories(self, obj):
-        categories = obj.categories.all()
+        categories = TileCategory.objects.for_listing().filter(product_type=obj)
         return TileCategorySerializer(categories, many=True, context=self.context).data
 
 class TeamMemberSerializer(serializers.ModelSerializer):
@@ -305,7 +348,7 @@ class TileCategorySerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'slug', 'created_at', 'updated_at', 'tiles_count', 'image_url', 'product_type_name']
     
     def get_tiles_count(self, obj):
-        return obj.tiles.count()
+        return annotated_count(obj, 'tiles_total', 'tiles')
     
     def get_image_url(self, obj):
         if obj.image:
@@ -325,7 +368,7 @@ class TileCategoryDetailSerializer(TileCategorySerializer):
         fields = TileCategorySerializer.Meta.fields + ['tiles']
     
     def get_tiles(self, obj):
-        tiles = obj.tiles.all()
+        tiles = Tile.objects.for_listing().filter(category=obj)
         return TileSerializer(tiles, many=True, context=self.context).data
 
 class TileSerializer(serializers.ModelSerializer):
@@ -352,16 +395,14 @@ class TileSerializer(serializers.ModelSerializer):
         return obj.product_type.name if obj.product_type else None
     
     def get_primary_image(self, obj):
-        primary_image = obj.images.filter(is_primary=True).first()
-        if not primary_image:
-            primary_image = obj.images.first()
+        primary_image = primary_image_of(obj)
         
         if primary_image and primary_image.image:
             return self.context['request'].build_absolute_uri(primary_image.image.url)
         return None
     
     def get_images_count(self, obj):
-        return obj.images.count()
+        return images_count_of(obj)
 
 class TileDetailSerializer(TileSerializer):
     """Serializer for detailed tile view with all images"""
@@ -404,9 +445,7 @@ class ProjectSerializer(serializers.ModelSerializer):
                             'product_type_name', 'testimonials_count']
     
     def get_primary_image(self, obj):
-        primary_image = obj.images.filter(is_primary=True).first()
-        if not primary_image:
-            primary_image = obj.images.first()
+        primary_image = primary_image_of(obj)
         
         if primary_image and primary_image.image:
             return self.context['request'].build_absolute_uri(primary_image.image.url)
@@ -416,13 +455,13 @@ class ProjectSerializer(serializers.ModelSerializer):
         return obj.get_status_display()
     
     def get_images_count(self, obj):
-        return obj.images.count()
+        return images_count_of(obj)
     
     def get_product_type_name(self, obj):
         return obj.product_type.name if obj.product_type else None
     
     def get_testimonials_count(self, obj):
-        return obj.testimonials.count()
+        return annotated_count(obj, 'testimonials_total', 'testimonials')
 
 class ProjectDetailSerializer(ProjectSerializer):
     """Serializer for detailed project view with images and associated tiles"""
@@ -0,0 +1,212 @@
+# server/api/slow_queries.py
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .instrumentation import current_metrics
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_DEFAULTS = {
+    'THRESHOLD_MS': 100,
+    'EXPLAIN': True,
+    'FILE': 'slow_queries.jsonl',
+    'STACK_DEPTH': 5,
+}
+
+# Wrappers that sit between a query and the code that caused it
+INSTRUMENTATION_MODULES = {'slow_queries.py', 'instrumentation.py', 'middleware.py', 'profiling.py'}
+
+
+def _slow_query_setting(name):
+    return getattr(settings, 'SLOW_QUERY_LOG', {}).get(name, SLOW_QUERY_DEFAULTS[name])
+
+
+def log_path():
+    return os.path.join(settings.BASE_DIR, _slow_query_setting('FILE'))
+
+
+def normalize_sql(sql):
+    """
+    ``sql`` with literals and placeholders replaced by ``?`` and IN lists
+    collapsed, so one statement run with different values or list
+    lengths normalizes the same.
+    """
+    sql = re.sub(r"'(?:[^']|'')*'|%s|\b\d+(?:\.\d+)?\b", '?', sql)
+    sql = re.sub(r"\(\?(?:,\s*\?)*\)", '(...)', sql)
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+def fingerprint(sql):
+    return hashlib.sha1(normalize_sql(sql).encode()).hexdigest()[:12]
+
+
+def call_site():
+    """
+    The innermost frames of project code that led to the query, as
+    ``file:line Qualified.name``, innermost first. Empty when the query
+    ran from DRF itself, e.g. a list view's queryset being evaluated.
+    """
+    base_dir = str(settings.BASE_DIR)
+    frames = []
+    frame = sys._getframe(2)
+    while frame is not None and len(frames) < _slow_query_setting('STACK_DEPTH'):
+        filename = frame.f_code.co_filename
+        if filename.startswith(base_dir) and 'site-packages' not in filename \
+                and os.path.basename(filename) not in INSTRUMENTATION_MODULES:
+            frames.append(
+                f"{os.path.relpath(filename, base_dir)}:{frame.f_lineno} {frame.f_code.co_qualname}"
+            )
+        frame = frame.f_back
+    return frames
+
+
+def explain(connection, sql, params):
+    """
+    The backend's plan for ``sql``, or None when it cannot be explained.
+
+    Runs on a bare backend cursor, so the EXPLAIN skips the execute
+    wrappers (and is neither logged nor counted as a request query).
+    """
+    cursor = connection.create_cursor()
+    # A failed statement aborts the whole transaction on PostgreSQL
+    savepoint = connection.in_atomic_block
+    try:
+        if savepoint:
+            cursor.execute('SAVEPOINT slow_query_explain')
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+        rows = cursor.fetchall()
+    except Exception as e:
+        logger.debug(f"Could not explain slow query: {e}")
+        if savepoint:
+            cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+        return None
+    finally:
+        if savepoint:
+            cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+        cursor.close()
+    if connection.vendor == 'sqlite':
+        # (id, parent, notused, detail)
+        return '\n'.join(str(row[-1]) for row in rows)
+    return '\n'.join(' '.join(str(column) for column in row) for row in rows)
+
+
+def record(entry):
+    with open(log_path(), 'a') as log_file:
+        log_file.write(json.dumps(entry, default=str) + '\n')
+
+
+def log_slow_queries(execute, sql, params, many, context):
+    """
+    ``execute_wrapper`` installed on every connection: statements slower
+    than SLOW_QUERY_LOG['THRESHOLD_MS'] are logged with their fingerprint,
+    call site, parameters and, for single SELECTs, the EXPLAIN plan.
+    """
+    threshold = _slow_query_setting('THRESHOLD_MS')
+    if threshold is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration_ms = (time.perf_counter() - start) * 1000
+    if duration_ms < threshold:
+        return result
+
+    connection = context['connection']
+    plan = None
+    if _slow_query_setting('EXPLAIN') and not many and sql.lstrip()[:6].upper() == 'SELECT':
+        plan = explain(connection, sql, params)
+    metrics = current_metrics.get()
+    entry = {
+        'at': timezone.now().isoformat(),
+        'alias': connection.alias,
+        'fingerprint': fingerprint(sql),
+        'sql': sql,
+        'params': repr(params)[:1000],
+        'ms': round(duration_ms, 3),
+        'view': getattr(metrics, 'view', None),
+        'call_site': call_site(),
+        'plan': plan,
+    }
+    logger.warning(f"Slow query ({entry['ms']} ms, {entry['fingerprint']}) from {entry['view']}: {sql[:200]}")
+    try:
+        record(entry)
+    except OSError as e:
+        logger.error(f"Could not write slow query log: {e}")
+    return result
+
+
+def install_on(connection):
+    if log_slow_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(log_slow_queries)
+
+
+@receiver(connection_created)
+def watch_new_connection(sender, connection, **kwargs):
+    install_on(connection)
+
+
+def install():
+    """Watch connections opened before this module was imported."""
+    for connection in connections.all(initialized_only=True):
+        install_on(connection)
+
+
+def load_entries(path, since=None):
+    entries = []
+    with open(path) as log_file:
+        for line in log_file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if since is None or entry['at'] >= since:
+                entries.append(entry)
+    return entries
+
+
+def aggregate(entries, worst_plans=2):
+    """
+    Group slow query entries by fingerprint: count, total and worst
+    time, the views and call sites they came from and the plans of the
+    slowest runs.
+    """
+    groups = defaultdict(list)
+    for entry in entries:
+        groups[entry['fingerprint']].append(entry)
+
+    report = []
+    for key, runs in groups.items():
+        runs.sort(key=lambda run: run['ms'], reverse=True)
+        plans = []
+        for run in runs:
+            if run.get('plan') and run['plan'] not in plans:
+                plans.append(run['plan'])
+            if len(plans) == worst_plans:
+                break
+        sites = defaultdict(int)
+        for run in runs:
+            site = run['call_site'][0] if run.get('call_site') else '?'
+            sites[(run.get('view') or '-', site)] += 1
+        report.append({
+            'fingerprint': key,
+            'sql': normalize_sql(runs[0]['sql']),
+            'count': len(runs),
+            'total_ms': round(sum(run['ms'] for run in runs), 3),
+            'max_ms': runs[0]['ms'],
+            'worst_params': runs[0]['params'],
+            'sources': sorted(sites.items(), key=lambda item: item[1], reverse=True),
+            'plans': plans,
+        })
+    return report
@@ -0,0 +1,123 @@
+# server/api/sqlite_tuning.py
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import OperationalError, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .metrics import SQLITE_WRITE_RETRIES
+
+logger = logging.getLogger(__name__)
+
+SQLITE_DEFAULTS = {
+    'ENABLED': False,
+    'JOURNAL_MODE': 'WAL',
+    'SYNCHRONOUS': 'NORMAL',
+    'BUSY_TIMEOUT_MS': 5000,
+    # Used instead of BUSY_TIMEOUT_MS when writes are serialized: the
+    # write lock is held while SQLite waits, so keep it short and let the
+    # retry backoff do the waiting
+    'SERIALIZED_BUSY_TIMEOUT_MS': 100,
+    'MMAP_SIZE': 256 * 1024 * 1024,
+    # Negative sizes are in KiB
+    'CACHE_SIZE': -64 * 1024,
+    'SERIALIZE_WRITES': True,
+    # Longest wait for the write lock before an attempt counts as locked
+    'LOCK_TIMEOUT_MS': 1000,
+    'WRITE_RETRIES': 5,
+    'RETRY_BACKOFF_MS': 20,
+}
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+# One write at a time per database file within this process
+_write_locks = defaultdict(threading.Lock)
+
+
+def sqlite_setting(name):
+    return getattr(settings, 'SQLITE_TUNING', {}).get(name, SQLITE_DEFAULTS[name])
+
+
+def is_lock_error(error):
+    message = str(error)
+    return 'database is locked' in message or 'database is busy' in message
+
+
+def apply_pragmas(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(f"PRAGMA journal_mode={sqlite_setting('JOURNAL_MODE')}")
+        cursor.execute(f"PRAGMA synchronous={sqlite_setting('SYNCHRONOUS')}")
+        busy_timeout = sqlite_setting('SERIALIZED_BUSY_TIMEOUT_MS' if sqlite_setting('SERIALIZE_WRITES') else 'BUSY_TIMEOUT_MS')
+        cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout)}")
+        cursor.execute(f"PRAGMA mmap_size={int(sqlite_setting('MMAP_SIZE'))}")
+        cursor.execute(f"PRAGMA cache_size={int(sqlite_setting('CACHE_SIZE'))}")
+
+
+def serialized_writes(execute, sql, params, many, context):
+    """
+    ``execute_wrapper`` putting the statements that take SQLite's write
+    lock (``BEGIN IMMEDIATE`` and writes outside a transaction) behind a
+    per-process lock, so threads queue here instead of in SQLite's busy
+    handler. Those statements hold no locks when they fail, so a
+    ``database is locked`` error, or waiting LOCK_TIMEOUT_MS for the lock,
+    is retried with jittered exponential backoff. Statements inside a
+    transaction already own the write lock and run as they are.
+    """
+    connection = context['connection']
+    keyword = sql.lstrip()[:7].upper()
+    autocommit_write = not connection.in_atomic_block and keyword.startswith(WRITE_STATEMENTS)
+    if not (autocommit_write or keyword.startswith('BEGIN')):
+        return execute(sql, params, many, context)
+
+    lock = _write_locks[connection.settings_dict['NAME']]
+    lock_timeout = sqlite_setting('LOCK_TIMEOUT_MS') / 1000
+    retries = sqlite_setting('WRITE_RETRIES')
+    backoff = sqlite_setting('RETRY_BACKOFF_MS') / 1000
+    for attempt in range(retries + 1):
+        try:
+            if not lock.acquire(timeout=lock_timeout):
+                raise OperationalError(f"database is locked: no write lock after {lock_timeout * 1000:.0f} ms")
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                lock.release()
+        except OperationalError as e:
+            if not is_lock_error(e) or attempt == retries:
+                raise
+            SQLITE_WRITE_RETRIES.inc()
+            delay = backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+            logger.info(f"SQLite write lock busy on {connection.alias}, retry {attempt + 1} in {delay * 1000:.0f} ms")
+            time.sleep(delay)
+
+
+def tune(connection):
+    """
+    Production settings for one SQLite connection: the pragmas above,
+    transactions that take the write lock up front (a deferred one that
+    reads first cannot wait for the lock and fails straight away) and
+    the serialized write path.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    apply_pragmas(connection)
+    connection.transaction_mode = 'IMMEDIATE'
+    if sqlite_setting('SERIALIZE_WRITES') and serialized_writes not in connection.execute_wrappers:
+        connection.execute_wrappers.append(serialized_writes)
+
+
+@receiver(connection_created)
+def tune_new_connection(sender, connection, **kwargs):
+    if sqlite_setting('ENABLED'):
+        tune(connection)
+
+
+def install():
+    """Tune connections opened before this module was imported."""
+    if sqlite_setting('ENABLED'):
+        for connection in connections.all(initialized_only=True):
+            tune(connection)
@@ -1,3 +1,1334 @@
-from django.test import TestCase
+from asgiref.sync import sync_to_async
+from collections import Counter
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.core.cache import cache
+from django.core import mail
+from django.db import OperationalError, connection, connections
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+from django.utils import timezone
+from datetime import timedelta
+from io import StringIO
+import json
+import os
+import tempfile
+import time
+from unittest import mock, skipUnless
+from prometheus_client import REGISTRY
 
-# Create your tests here.
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from .authentication import TokenCache, get_token_user, token_cache
+from .benchmark import compare_runs, load_history
+from .events import get_backend
+from .postgres import enable_extension, ensure_trigram_indexes
+from .middleware import admission_limiters
+from .presence import get_presence, stream_closed, stream_opened, touch
+from .profiling import load_profile
+from .search import get_search_backend
+from .slow_queries import normalize_sql
+from .sqlite_tuning import _write_locks, is_lock_error, serialized_writes
+from .models import (
+    ProductType, TileCategory, Tile, UserProfile, Conversation, Message, ParticipantState,
+    StaffAgent, SupportAssignment, ArchivedMessage, TileImage, Project, ProjectImage,
+    CustomerTestimonial, TeamMember
+)
+from .serializers import RegisterSerializer
+from .views_realtime import event_stream
+
+
+def write_queries(captured):
+    return [
+        q['sql'] for q in captured
+        if not q['sql'].lstrip().upper().startswith(('SELECT', 'SAVEPOINT', 'RELEASE'))
+    ]
+
+
+def profile_writes(captured):
+    return [q for q in write_queries(captured) if 'api_userprofile' in q]
+
+
+class TokenAuthMiddlewareTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('customer', password='pass-12345')
+        self.token = Token.objects.create(user=self.user)
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {self.token.key}'}
+
+        product_type = ProductType.objects.create(name='Backsplash')
+        category = TileCategory.objects.create(name='Subway', product_type=product_type)
+        Tile.objects.create(title='White Subway', category=category)
+
+    def test_token_get_does_not_write(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/tiles/', **self.auth)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(write_queries(ctx.captured_queries), [])
+        self.assertFalse(Session.objects.exists())
+        self.assertNotIn('sessionid', response.cookies)
+
+    def test_token_request_authenticates_user(self):
+        response = self.client.get('/api/auth/user/', **self.auth)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['username'], 'customer')
+
+    def test_admin_path_upgrades_to_session(self):
+        self.client.get('/admin/', **self.auth)
+
+        self.assertTrue(Session.objects.exists())
+
+
+class TokenCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        token_cache.local.clear()
+        self.user = User.objects.create_user('customer', password='pass-12345')
+        self.key = Token.objects.create(user=self.user).key
+
+    def lookup(self):
+        return get_token_user(RequestFactory().get('/'), self.key)
+
+    def token_queries(self, captured):
+        return [q for q in captured if 'authtoken_token' in q['sql']]
+
+    def test_miss_queries_the_token_and_hits_only_the_user_row(self):
+        with self.assertNumQueries(1) as captured:
+            self.assertEqual(self.lookup(), self.user)
+        self.assertEqual(len(self.token_queries(captured.captured_queries)), 1)
+
+        with self.assertNumQueries(1) as captured:
+            self.assertEqual(self.lookup(), self.user)
+        self.assertEqual(self.token_queries(captured.captured_queries), [])
+
+        # A worker with a cold LRU is served by the shared cache
+        token_cache.local.clear()
+        with self.assertNumQueries(1) as captured:
+            self.assertEqual(self.lookup(), self.user)
+        self.assertEqual(self.token_queries(captured.captured_queries), [])
+
+    def test_deleting_the_token_invalidates_it(self):
+        self.lookup()
+        Token.objects.get(key=self.key).delete()
+        self.assertIsNone(self.lookup())
+
+    def test_changing_the_password_invalidates_the_entry(self):
+        self.lookup()
+        self.user.set_password('new-pass-12345')
+        self.user.save()
+        self.assertIsNone(token_cache.local.get(self.key))
+        self.assertIsNone(cache.get(TokenCache.key_prefix + self.key))
+
+    def test_saving_the_user_refreshes_cached_flags(self):
+        self.lookup()
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(self.lookup())
+
+    def test_revocation_reaches_other_processes_lrus(self):
+        # Another worker: its own LRU over the same shared cache
+        other = TokenCache()
+        self.lookup()
+        self.assertEqual(other.get(self.key)['user_id'], self.user.pk)
+        cache.delete(TokenCache.key_prefix + self.key)
+        self.assertIsNotNone(other.get(self.key))
+
+        Token.objects.get(key=self.key).delete()
+        self.assertIsNone(other.get(self.key))
+
+    def test_deactivation_reaches_other_processes_lrus(self):
+        other = TokenCache()
+        self.lookup()
+        self.assertTrue(other.get(self.key)['is_active'])
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(other.get(self.key))
+
+    def test_middleware_and_drf_share_one_lookup(self):
+        connection.queries_log.clear()
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/api/auth/user/', HTTP_AUTHORIZATION=f'Token {self.key}')
+        self.assertEqual(response.status_code, 200)
+        # One token/user join, not one per authentication layer
+        lookups = [q for q in captured.captured_queries if '"auth_user"' in q['sql']]
+        self.assertEqual(len(lookups), 1)
+        self.assertEqual(len(self.token_queries(lookups)), 1)
+
+
+class UserProfileWriteTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user('staff', password='pass-12345', is_staff=True)
+        Token.objects.create(user=self.staff)
+
+    # Password hashing alone can pass the slow-request threshold
+    @override_settings(REQUEST_METRICS={'SLOW_REQUEST_MS': 60000})
+    def test_api_login_queries(self):
+        # user lookup, token lookup, profile read
+        with self.assertNumQueries(3):
+            response = self.client.post('/api/auth/login/', {
+                'username': 'staff', 'password': 'pass-12345'
+            })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data['user']['profile']['id'])
+
+    def test_session_login_does_not_write_profile(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertTrue(self.client.login(username='staff', password='pass-12345'))
+
+        self.assertEqual(profile_writes(ctx.captured_queries), [])
+
+    def test_registration_queries(self):
+        serializer = RegisterSerializer(data={
+            'username': 'customer',
+            'email': 'customer@example.com',
+            'password': 'pass-12345',
+            'password_confirm': 'pass-12345',
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+
+        # single INSERT, no profile row
+        with self.assertNumQueries(1):
+            user = serializer.save()
+
+        self.assertTrue(user.check_password('pass-12345'))
+        self.assertFalse(UserProfile.objects.filter(user=user).exists())
+
+    def test_profile_saves_only_changed_fields(self):
+        self.client.force_login(self.staff)
+        self.client.patch('/api/auth/profile/', {'bio': 'Tile setter'}, content_type='application/json')
+        profile = UserProfile.objects.get(user=self.staff)
+        self.assertEqual(profile.bio, 'Tile setter')
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.patch('/api/auth/profile/', {'bio': 'Tile setter'}, content_type='application/json')
+            self.client.patch('/api/auth/profile/', {'first_name': 'Ana'}, content_type='application/json')
+
+        self.assertEqual(profile_writes(ctx.captured_queries), [])
+        self.assertEqual(User.objects.get(pk=self.staff.pk).first_name, 'Ana')
+
+
+class ClientRateThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def subscribe(self, n, **extra):
+        return self.client.post('/api/newsletter/subscribe/', {'email': f'reader{n}@example.com'}, **extra)
+
+    def test_subscribe_is_throttled_per_client(self):
+        # 10/hour for the 'subscribe' scope
+        for n in range(10):
+            self.assertEqual(self.subscribe(n).status_code, 201)
+
+        response = self.subscribe(10)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+        # Another client IP has its own budget
+        self.assertEqual(self.subscribe(11, REMOTE_ADDR='10.0.0.2').status_code, 201)
+
+    def login(self, username, **extra):
+        return self.client.post('/api/auth/login/', {'username': username, 'password': 'wrong'}, **extra)
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_spoofed_forwarded_for_does_not_reset_the_login_limit(self):
+        # 10/min for the 'login' scope
+        with self.assertLogs('api.views_auth', 'WARNING'):
+            for n in range(10):
+                self.assertEqual(self.login(f'user{n}', HTTP_X_FORWARDED_FOR=f'203.0.113.{n}').status_code, 401)
+        self.assertEqual(self.login('user10', HTTP_X_FORWARDED_FOR='203.0.113.10').status_code, 429)
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_login_is_throttled_per_username_across_clients(self):
+        # 30/hour for the 'login_username' scope
+        with self.assertLogs('api.views_auth', 'WARNING'):
+            for n in range(30):
+                self.assertEqual(self.login('Staff', REMOTE_ADDR=f'10.0.{n}.1').status_code, 401)
+            self.assertEqual(self.login('staff', REMOTE_ADDR='10.0.99.1').status_code, 429)
+            self.assertEqual(self.login('someone-else', REMOTE_ADDR='10.0.99.1').status_code, 401)
+
+    def test_catalog_reads_are_not_throttled(self):
+        for _ in range(20):
+            self.assertEqual(self.client.get('/api/tiles/').status_code, 200)
+
+
+@override_settings(ADMISSION_CONTROL={
+    'catalog': {'MAX_CONCURRENCY': 1, 'MAX_QUEUE': 0, 'RETRY_AFTER': 3},
+})
+class AdmissionControlTests(TestCase):
+    def test_over_capacity_request_is_shed(self):
+        self.assertEqual(self.client.get('/api/tiles/').status_code, 200)
+
+        limiter = admission_limiters['catalog']
+        self.assertTrue(limiter.acquire())
+        try:
+            with self.assertLogs('api.middleware', 'WARNING'):
+                response = self.client.get('/api/tiles/')
+        finally:
+            limiter.release()
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '3')
+        self.assertEqual(limiter.snapshot()['shed'], 1)
+        self.assertEqual(limiter.snapshot()['in_flight'], 0)
+
+        # Unclassified requests are never shed
+        self.assertTrue(limiter.acquire())
+        try:
+            response = self.client.post(
+                '/api/newsletter/unsubscribe/', {'email': 'nobody@example.com'},
+                content_type='application/json'
+            )
+        finally:
+            limiter.release()
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(CHAT_EVENTS={'KEEPALIVE': 0.1})
+class ChatStreamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.customer = User.objects.create_user('customer', password='pass-12345')
+        self.staff = User.objects.create_user('staff', password='pass-12345', is_staff=True)
+        self.customer_token = Token.objects.create(user=self.customer)
+        self.staff_token = Token.objects.create(user=self.staff)
+
+    async def test_stream_pushes_new_messages(self):
+        response = await self.async_client.get('/api/chat/stream/', {'token': self.staff_token.key})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+        self.assertEqual(get_backend().subscriber_count(), 1)
+
+        def send():
+            # Events go out on commit; run in the thread owning the test transaction
+            with self.captureOnCommitCallbacks(execute=True):
+                return self.client.post(
+                    '/api/chat/send/', {'receiver_id': self.staff.id, 'content': 'Hello'},
+                    content_type='application/json',
+                    HTTP_AUTHORIZATION=f'Token {self.customer_token.key}',
+                )
+
+        sent = await sync_to_async(send)()
+        self.assertEqual(sent.status_code, 201)
+
+        chunk = await anext(stream)
+        self.assertTrue(chunk.startswith(b'event: message.created\n'))
+        self.assertIn(b'"content": "Hello"', chunk)
+
+        # The stream marks the message delivered once the event is written
+        self.assertEqual(await anext(stream), b': keepalive\n\n')
+        message = await Message.objects.aget(id=sent.data['id'])
+        self.assertEqual(message.status, 'delivered')
+
+        await stream.aclose()
+
+    async def test_closing_the_last_stream_takes_the_user_offline(self):
+        with mock.patch('api.presence.publish_to_users') as publish:
+            stream = event_stream(self.staff)
+            self.assertEqual(await anext(stream), 'retry: 3000\n\n')
+            self.assertEqual(await anext(stream), ': keepalive\n\n')
+            self.assertTrue((await sync_to_async(get_presence)([self.staff.id]))[self.staff.id]['online'])
+            await stream.aclose()
+
+        self.assertFalse((await sync_to_async(get_presence)([self.staff.id]))[self.staff.id]['online'])
+        self.assertEqual([call.args[2]['online'] for call in publish.call_args_list], [True, False])
+
+    async def test_stream_requires_authentication(self):
+        response = await self.async_client.get('/api/chat/stream/')
+        self.assertEqual(response.status_code, 401)
+
+
+class ChatSyncTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.customer = User.objects.create_user('customer', password='pass-12345')
+        self.staff = User.objects.create_user('staff', password='pass-12345', is_staff=True)
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.customer, self.staff)
+        self.client.force_login(self.customer)
+
+    def send(self, sender, receiver, content):
+        return Message.objects.create(
+            conversation=self.conversation, sender=sender, receiver=receiver, content=content
+        )
+
+    def test_sync_returns_changes_after_cursor(self):
+        self.send(self.customer, self.staff, 'old')
+        cursor = self.client.get('/api/chat/messages/sync/').data['cursor']
+
+        reply = self.send(self.staff, self.customer, 'new')
+        response = self.client.get('/api/chat/messages/sync/', {'cursor': cursor})
+        self.assertEqual([m['content'] for m in response.data['messages']], ['new'])
+        cursor = response.data['cursor']
+
+        # Status changes move a message past the cursor again
+        self.client.post('/api/chat/mark-read/', {'message_ids': [reply.id]}, content_type='application/json')
+        with self.assertNumQueries(4):  # session, user, messages, read watermarks
+            response = self.client.get('/api/chat/messages/sync/', {'cursor': cursor})
+        self.assertEqual([(m['id'], m['status']) for m in response.data['messages']], [(reply.id, 'read')])
+
+        response = self.client.get('/api/chat/messages/sync/', {'cursor': response.data['cursor']})
+        self.assertEqual(response.data['messages'], [])
+
+    def test_sync_pages_read_watermarks(self):
+        self.send(self.customer, self.staff, 'old')
+        cursor = self.client.get('/api/chat/messages/sync/').data['cursor']
+        now = timezone.now()
+        for n in range(3):
+            conversation = Conversation.objects.create()
+            conversation.participants.add(self.customer, self.staff)
+            ParticipantState.objects.create(
+                conversation=conversation, user=self.staff, read_at=now + timedelta(seconds=n)
+            )
+
+        seen = []
+        for expected_more in (True, False):
+            response = self.client.get('/api/chat/messages/sync/', {'cursor': cursor, 'limit': 2})
+            self.assertEqual(response.data['has_more'], expected_more)
+            seen += [state['conversation'] for state in response.data['read_states']]
+            cursor = response.data['cursor']
+        self.assertEqual(seen, list(Conversation.objects.exclude(id=self.conversation.id).order_by('id').values_list('id', flat=True)))
+        response = self.client.get('/api/chat/messages/sync/', {'cursor': cursor})
+        self.assertEqual(response.data['read_states'], [])
+
+    def test_sync_rejects_malformed_cursor(self):
+        response = self.client.get('/api/chat/messages/sync/', {'cursor': 'nope'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_history_pages_backwards(self):
+        sent = [self.send(self.customer, self.staff, str(n)) for n in range(5)]
+
+        response = self.client.get('/api/chat/messages/history/', {'conversation': self.conversation.id, 'limit': 2})
+        self.assertEqual([m['content'] for m in response.data['messages']], ['3', '4'])
+        self.assertTrue(response.data['has_more'])
+
+        response = self.client.get('/api/chat/messages/history/', {
+            'conversation': self.conversation.id, 'limit': 2, 'before': response.data['before']
+        })
+        self.assertEqual([m['content'] for m in response.data['messages']], ['1', '2'])
+
+        response = self.client.get('/api/chat/messages/history/', {
+            'conversation': self.conversation.id, 'before': sent[1].id
+        })
+        self.assertEqual([m['content'] for m in response.data['messages']], ['0'])
+        self.assertFalse(response.data['has_more'])
+
+    def test_history_reads_through_archive(self):
+        sent = [self.send(self.customer, self.staff, str(n)) for n in range(5)]
+        Message.objects.exclude(id=sent[4].id).update(is_read=True)
+        Conversation.rebuild_summaries([self.conversation.id])
+        long_ago = timezone.now() - timedelta(days=365)
+        Message.objects.update(created_at=long_ago)
+        Conversation.objects.update(updated_at=long_ago)
+
+        call_command('archive_messages', stdout=StringIO())
+
+        # Unread messages and summary pointers stay in the hot table
+        self.assertEqual(
+            sorted(Message.objects.values_list('content', flat=True)), ['3', '4']
+        )
+        self.assertEqual(ArchivedMessage.objects.count(), 3)
+
+        response = self.client.get('/api/chat/messages/history/', {'conversation': self.conversation.id, 'limit': 2})
+        self.assertEqual([m['content'] for m in response.data['messages']], ['3', '4'])
+        response = self.client.get('/api/chat/messages/history/', {
+            'conversation': self.conversation.id, 'limit': 2, 'before': response.data['before']
+        })
+        self.assertEqual([m['content'] for m in response.data['messages']], ['1', '2'])
+        response = self.client.get('/api/chat/messages/history/', {
+            'conversation': self.conversation.id, 'limit': 2, 'before': response.data['before']
+        })
+        self.assertEqual([m['content'] for m in response.data['messages']], ['0'])
+        self.assertFalse(response.data['has_more'])
+
+
+class ConversationSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user('staff', password='pass-12345', is_staff=True)
+        self.customers = [User.objects.create_user(f'customer{n}', password='pass-12345') for n in range(3)]
+
+    def send(self, sender, receiver, content):
+        self.client.force_login(sender)
+        return self.client.post(
+            '/api/chat/send/', {'receiver_id': receiver.id, 'content': content},
+            content_type='application/json'
+        )
+
+    def test_inbox_query_count_does_not_grow(self):
+        for customer in self.customers:
+            self.send(customer, self.staff, f'Hi from {customer.username}')
+            self.send(customer, self.staff, 'Are you there?')
+
+        self.client.force_login(self.staff)
+        # session, user, conversations, participants prefetch
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/chat/conversations/')
+
+        self.assertEqual(len(response.data), 3)
+        for conversation in response.data:
+            self.assertEqual(conversation['unread_count'], 2)
+            self.assertEqual(conversation['last_message']['content'], 'Are you there?')
+
+    def test_mark_read_updates_summary(self):
+        first = self.send(self.customers[0], self.staff, 'one').data
+        second = self.send(self.customers[0], self.staff, 'two').data
+
+        self.client.force_login(self.staff)
+        self.client.post('/api/chat/mark-read/', {'message_ids': [first['id'], second['id']]},
+                         content_type='application/json')
+        # Repeating the call must not drive the count negative
+        self.client.post('/api/chat/mark-read/', {'message_ids': [first['id']]},
+                         content_type='application/json')
+
+        state = ParticipantState.objects.get(conversation_id=first['conversation'], user=self.staff)
+        self.assertEqual(state.unread_count, 0)
+        self.assertEqual(state.last_read_message_id, second['id'])
+
+    def test_marking_a_later_message_leaves_earlier_ones_unread(self):
+        sent = [self.send(self.customers[0], self.staff, str(n)).data for n in range(3)]
+        conversation_id = sent[0]['conversation']
+
+        self.client.force_login(self.staff)
+        self.client.post('/api/chat/mark-read/', {'message_ids': [sent[1]['id']]},
+                         content_type='application/json')
+
+        state = ParticipantState.objects.get(conversation_id=conversation_id, user=self.staff)
+        self.assertEqual(state.unread_count, 2)
+        self.assertIsNone(state.last_read_message_id)
+        response = self.client.get('/api/chat/messages/history/', {'conversation': conversation_id})
+        self.assertEqual([m['is_read'] for m in response.data['messages']], [False, True, False])
+
+        # Reading the first one closes the gap: the watermark covers both
+        self.client.post('/api/chat/mark-read/', {'message_ids': [sent[0]['id']]},
+                         content_type='application/json')
+        state.refresh_from_db()
+        self.assertEqual(state.unread_count, 1)
+        self.assertEqual(state.last_read_message_id, sent[1]['id'])
+
+    def test_generic_message_writes_are_not_routed(self):
+        sent = self.send(self.customers[0], self.staff, 'Hi').data
+        self.client.force_login(self.customers[0])
+        data = {'conversation': sent['conversation'], 'receiver': self.staff.id, 'content': 'Sneaky'}
+
+        self.assertEqual(self.client.post('/api/chat/messages/', data, content_type='application/json').status_code, 405)
+        detail = f"/api/chat/messages/{sent['id']}/"
+        self.assertEqual(self.client.patch(detail, {'content': 'Edited'}, content_type='application/json').status_code, 405)
+        self.assertEqual(self.client.delete(detail).status_code, 405)
+        self.assertEqual(self.client.get(detail).status_code, 200)
+
+        conversation = Conversation.objects.get(id=sent['conversation'])
+        self.assertEqual(conversation.last_message.content, 'Hi')
+        self.assertEqual(ParticipantState.objects.get(conversation=conversation, user=self.staff).unread_count, 1)
+
+    def test_mark_read_up_to_moves_watermark(self):
+        customer = self.customers[0]
+        sent = [self.send(customer, self.staff, str(n)).data for n in range(3)]
+        conversation_id = sent[0]['conversation']
+        self.client.force_login(customer)
+        cursor = self.client.get('/api/chat/messages/sync/').data['cursor']
+
+        self.client.force_login(self.staff)
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.post('/api/chat/mark-read/', {
+                'conversation': conversation_id, 'up_to_message_id': sent[1]['id']
+            }, content_type='application/json')
+        self.assertTrue(response.data['updated'])
+        # One write however many messages are covered; message rows untouched
+        writes = [q for q in write_queries(captured) if 'django_session' not in q]
+        self.assertEqual(len(writes), 1)
+        self.assertIn('api_participantstate', writes[0])
+
+        state = ParticipantState.objects.get(conversation_id=conversation_id, user=self.staff)
+        self.assertEqual(state.unread_count, 1)
+        self.assertEqual(state.last_read_message_id, sent[1]['id'])
+
+        response = self.client.get('/api/chat/messages/history/', {'conversation': conversation_id})
+        self.assertEqual([m['is_read'] for m in response.data['messages']], [True, True, False])
+
+        # The sender learns about the watermark through sync
+        self.client.force_login(customer)
+        response = self.client.get('/api/chat/messages/sync/', {'cursor': cursor})
+        self.assertEqual(
+            [(r['user'], r['last_read_message']) for r in response.data['read_states']],
+            [(self.staff.id, sent[1]['id'])]
+        )
+        response = self.client.get('/api/chat/messages/sync/', {'cursor': response.data['cursor']})
+        self.assertEqual(response.data['read_states'], [])
+
+        # Ids past the end clamp to the newest message; moving back is a no-op
+        self.client.force_login(self.staff)
+        response = self.client.post('/api/chat/mark-read/', {
+            'conversation': conversation_id, 'up_to_message_id': sent[2]['id'] + 100
+        }, content_type='application/json')
+        self.assertEqual(response.data['up_to_message_id'], sent[2]['id'])
+        response = self.client.post('/api/chat/mark-read/', {
+            'conversation': conversation_id, 'up_to_message_id': sent[0]['id']
+        }, content_type='application/json')
+        self.assertFalse(response.data['updated'])
+        state.refresh_from_db()
+        self.assertEqual(state.unread_count, 0)
+
+
+class ChatSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user('staff', is_staff=True)
+        self.alice = User.objects.create_user('alice')
+        self.bob = User.objects.create_user('bob')
+        self.alice_chat = Conversation.create_between(self.alice, self.staff)
+        self.bob_chat = Conversation.create_between(self.bob, self.staff)
+
+    def send(self, conversation, sender, receiver, content):
+        return Message.objects.create(conversation=conversation, sender=sender, receiver=receiver, content=content)
+
+    def search(self, user, **params):
+        self.client.force_login(user)
+        return self.client.get('/api/chat/messages/search/', params)
+
+    def test_search_is_scoped_and_highlighted(self):
+        self.send(self.alice_chat, self.alice, self.staff, 'Is the <b>marble</b> tile in stock?')
+        self.send(self.bob_chat, self.bob, self.staff, 'Marbled porcelain please')
+        self.send(self.bob_chat, self.bob, self.staff, 'Granite only')
+
+        response = self.search(self.alice, q='marble')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(
+            response.data['results'][0]['highlight'],
+            'Is the &lt;b&gt;<mark>marble</mark>&lt;/b&gt; tile in stock?'
+        )
+
+        response = self.search(self.staff, q='MARBLE')
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(self.search(self.bob, q='marble tile').data['results'], [])
+
+    def test_search_pages_and_finds_archived_messages(self):
+        sent = [self.send(self.alice_chat, self.alice, self.staff, f'grout question {n}') for n in range(3)]
+        ArchivedMessage.archive([sent[0].id])
+
+        response = self.search(self.staff, q='grout', limit=2)
+        self.assertEqual([m['id'] for m in response.data['results']], [sent[2].id, sent[1].id])
+        self.assertTrue(response.data['has_more'])
+
+        response = self.search(self.staff, q='grout', limit=2, before=response.data['before'])
+        self.assertEqual([m['id'] for m in response.data['results']], [sent[0].id])
+        self.assertFalse(response.data['has_more'])
+
+
+class PresenceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user('staff', is_staff=True)
+        self.alice = User.objects.create_user('alice')
+        self.bob = User.objects.create_user('bob')
+        self.conversation = Conversation.create_between(self.alice, self.staff)
+
+    def test_typing_publishes_changes_without_writes(self):
+        self.client.force_login(self.alice)
+        with mock.patch('api.views.publish_to_users') as publish, \
+                CaptureQueriesContext(connection) as captured:
+            for is_typing in (True, True, False):
+                response = self.client.post('/api/chat/typing/', {
+                    'conversation': self.conversation.id, 'is_typing': is_typing
+                }, content_type='application/json')
+                self.assertEqual(response.status_code, 200)
+
+        self.assertEqual([q for q in write_queries(captured) if 'django_session' not in q], [])
+        # The repeated keystroke only refreshes the indicator
+        self.assertEqual(
+            [(set(call.args[0]), call.args[2]['is_typing']) for call in publish.call_args_list],
+            [({self.staff.id}, True), ({self.staff.id}, False)]
+        )
+
+        self.client.force_login(self.bob)
+        response = self.client.post('/api/chat/typing/', {'conversation': self.conversation.id},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_offline_is_published_when_the_last_stream_closes(self):
+        with mock.patch('api.presence.publish_to_users') as publish:
+            stream_opened(self.alice.id)
+            stream_opened(self.alice.id)
+            stream_closed(self.alice.id)
+            self.assertTrue(get_presence([self.alice.id])[self.alice.id]['online'])
+            stream_closed(self.alice.id)
+
+        self.assertFalse(get_presence([self.alice.id])[self.alice.id]['online'])
+        self.assertEqual(
+            [(call.args[0], call.args[2]['online']) for call in publish.call_args_list],
+            [([self.staff.id], True), ([self.staff.id], False)]
+        )
+
+    def test_presence_batch(self):
+        touch(self.alice.id)
+        self.client.force_login(self.staff)
+        response = self.client.get('/api/chat/presence/', {'users': f'{self.alice.id},{self.bob.id}'})
+        self.assertTrue(response.data[str(self.alice.id)]['online'])
+        self.assertIsNotNone(response.data[str(self.alice.id)]['last_seen'])
+        self.assertEqual(response.data[str(self.bob.id)], {'online': False, 'last_seen': None})
+
+        # Non-staff only see people they chat with
+        self.client.force_login(self.bob)
+        response = self.client.get('/api/chat/presence/', {'users': str(self.alice.id)})
+        self.assertEqual(response.data, {})
+
+
+class UnreadDigestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user('staff', first_name='Ana', is_staff=True)
+        self.customers = [
+            User.objects.create_user(f'customer{n}', email=f'customer{n}@example.com') for n in range(2)
+        ]
+        self.conversations = [Conversation.create_between(customer, self.staff) for customer in self.customers]
+
+    def reply(self, conversation, customer, content, minutes_ago=60):
+        message = Message.objects.create(
+            conversation=conversation, sender=self.staff, receiver=customer, content=content
+        )
+        conversation.record_message(message)
+        Message.objects.filter(id=message.id).update(created_at=timezone.now() - timedelta(minutes=minutes_ago))
+        return message
+
+    def test_one_digest_per_user_sent_once(self):
+        self.reply(self.conversations[0], self.customers[0], 'Your tiles shipped')
+        self.reply(self.conversations[0], self.customers[0], 'Tracking number attached')
+        self.reply(self.conversations[1], self.customers[1], 'Just now', minutes_ago=0)
+
+        call_command('send_unread_digests', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['customer0@example.com'])
+        self.assertIn('2 unread messages', mail.outbox[0].subject)
+        self.assertIn('Ana: "Tracking number attached" (+1 more)', mail.outbox[0].body)
+
+        # Already covered, or read through the watermark: nothing new to send
+        call_command('send_unread_digests', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+
+        message = self.reply(self.conversations[1], self.customers[1], 'Older reply')
+        self.conversations[1].mark_read_up_to(self.customers[1], message.id)
+        call_command('send_unread_digests', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_online_users_are_skipped(self):
+        self.reply(self.conversations[0], self.customers[0], 'Hello')
+        touch(self.customers[0].id)
+        call_command('send_unread_digests', stdout=StringIO())
+        self.assertEqual(mail.outbox, [])
+
+
+class SeedScaleTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+
+    def snapshot(self):
+        return (
+            list(Tile.objects.order_by('sku').values_list('sku', 'price', 'category__slug')),
+            list(Message.objects.order_by('created_at', 'content').values_list('content', 'created_at', 'is_read')),
+        )
+
+    def test_seed_is_deterministic(self):
+        with override_settings(MEDIA_ROOT=self.media.name):
+            call_command('seed_scale', scale=0.001, stdout=StringIO())
+            first = self.snapshot()
+            call_command('seed_scale', scale=0.001, flush=True, stdout=StringIO())
+            self.assertEqual(self.snapshot(), first)
+
+        self.assertEqual(Tile.objects.count(), 20)
+        self.assertEqual(Message.objects.count(), 5 * 400)
+        conversation = Conversation.objects.select_related('last_message').first()
+        self.assertEqual(conversation.updated_at, conversation.last_message.created_at)
+        self.assertEqual(
+            ParticipantState.objects.filter(conversation=conversation).count(), 2
+        )
+
+
+class BenchmarkTests(TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+        with override_settings(MEDIA_ROOT=self.workdir.name):
+            call_command('seed_scale', scale=0.001, stdout=StringIO())
+
+    def test_client_run_is_recorded_and_compared(self):
+        history = f'{self.workdir.name}/history.json'
+        for label in ('before', 'after'):
+            call_command(
+                'benchmark', requests=3, warmup=0, only=['tile_detail', 'send_message', 'image_upload'],
+                history=history, label=label, stdout=StringIO()
+            )
+
+        before, after = load_history(history)
+        self.assertEqual(set(after['results']), {'tile_detail', 'send_message', 'image_upload'})
+        for result in after['results'].values():
+            self.assertEqual(result['errors'], 0)
+            self.assertGreater(result['queries'], 0)
+        # Writes are rolled back between runs
+        self.assertEqual(after['results']['send_message']['queries'], before['results']['send_message']['queries'])
+
+        after['results']['tile_detail']['queries'] += 1
+        self.assertEqual(
+            compare_runs(before, after, threshold=100),
+            [f"tile_detail queries: {before['results']['tile_detail']['queries']} -> "
+             f"{after['results']['tile_detail']['queries']}"]
+        )
+
+
+class QueryCountTests(TestCase):
+    """
+    Every endpoint must run the same number of queries whether the data
+    behind it has SMALL or LARGE rows, and no more than its budget.
+    """
+    SMALL, LARGE = 10, 200
+    BUDGETS = {
+        'tile_list': 2,             # tiles with category/type, images
+        'tile_detail': 2,
+        'category_list': 1,
+        'category_detail': 3,       # category, tiles, tile images
+        'product_type_list': 1,
+        'product_type_detail': 2,   # product type, categories
+        'project_list': 2,          # projects, images
+        'project_detail': 5,        # project, images, tiles, tile images, testimonials
+        'testimonial_list': 1,
+        'team_list': 1,
+        'inbox': 4,                 # session, user, conversations, participants
+        'history': 5,               # session, user, membership, messages, archive
+        'sync': 3,                  # session, user, messages
+        'message_list': 3,          # session, user, messages with sender/receiver
+    }
+
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user('staff', password='pass-12345', is_staff=True)
+        self.product_type = ProductType.objects.create(name='Backsplash')
+        self.category = TileCategory.objects.create(name='Subway', product_type=self.product_type)
+        self.project = Project.objects.create(
+            title='Kitchen', description='Kitchen', client='Client', location='Miami',
+            completed_date=timezone.now().date(), product_type=self.product_type
+        )
+        customer = User.objects.create_user('customer-0')
+        self.conversation, _ = Conversation.get_or_create_direct(self.staff, customer)
+
+    def grow(self, size):
+        """
+        Top every collection the endpoints read up to ``size`` rows.
+        """
+        start = Tile.objects.count()
+        tiles = Tile.objects.bulk_create([
+            Tile(title=f'Tile {n}', slug=f'tile-{n}', sku=f'SKU-{n}',
+                 category=self.category, product_type=self.product_type)
+            for n in range(start, size)
+        ])
+        TileImage.objects.bulk_create([
+            TileImage(tile=tile, image=f'tiles/{tile.slug}-{index}.png', is_primary=index == 0)
+            for tile in tiles for index in range(2)
+        ])
+        self.project.tiles_used.add(*tiles)
+
+        start = TileCategory.objects.count()
+        TileCategory.objects.bulk_create([
+            TileCategory(name=f'Category {n}', slug=f'category-{n}', product_type=self.product_type)
+            for n in range(start, size)
+        ])
+        start = ProductType.objects.count()
+        ProductType.objects.bulk_create([
+            ProductType(name=f'Type {n}', slug=f'type-{n}') for n in range(start, size)
+        ])
+
+        start = Project.objects.count()
+        projects = Project.objects.bulk_create([
+            Project(title=f'Project {n}', slug=f'project-{n}', description='', client='', location='',
+                    completed_date=timezone.now().date(), product_type=self.product_type)
+            for n in range(start, size)
+        ])
+        ProjectImage.objects.bulk_create([
+            ProjectImage(project=project, image=f'projects/{project.slug}.png', is_primary=True)
+            for project in projects + [self.project] * (start == 1)
+        ])
+        start = CustomerTestimonial.objects.count()
+        CustomerTestimonial.objects.bulk_create([
+            CustomerTestimonial(customer_name=f'Customer {n}', testimonial='Great', project=self.project,
+                                approved=True)
+            for n in range(start, size)
+        ])
+        start = TeamMember.objects.count()
+        TeamMember.objects.bulk_create([
+            TeamMember(name=f'Member {n}', position='Installer', bio='', image=f'team/{n}.png')
+            for n in range(start, size)
+        ])
+
+        start = Conversation.objects.count()
+        for n in range(start, size):
+            customer = User.objects.create_user(f'customer-{n}')
+            conversation, _ = Conversation.get_or_create_direct(self.staff, customer)
+            Message.objects.create(conversation=conversation, sender=customer, receiver=self.staff, content='Hi')
+        start = self.conversation.messages.count()
+        Message.objects.bulk_create([
+            Message(conversation=self.conversation, sender=self.staff,
+                    receiver=self.conversation.participants.exclude(id=self.staff.id).get(), content=str(n))
+            for n in range(start, size)
+        ])
+        Conversation.rebuild_summaries(Conversation.objects.values_list('id', flat=True))
+
+    def endpoints(self):
+        tile = Tile.objects.order_by('id').first()
+        return {
+            'tile_list': ('/api/tiles/', None),
+            'tile_detail': (f'/api/tiles/{tile.slug}/', None),
+            'category_list': ('/api/categories/', None),
+            'category_detail': (f'/api/categories/{self.category.slug}/', None),
+            'product_type_list': ('/api/product-types/', None),
+            'product_type_detail': (f'/api/product-types/{self.product_type.slug}/', None),
+            'project_list': ('/api/projects/', None),
+            'project_detail': (f'/api/projects/{self.project.slug}/', None),
+            'testimonial_list': ('/api/testimonials/', None),
+            'team_list': ('/api/team/', None),
+            'inbox': ('/api/chat/conversations/', self.staff),
+            'history': (f'/api/chat/messages/history/?conversation={self.conversation.id}', self.staff),
+            'sync': ('/api/chat/messages/sync/', self.staff),
+            'message_list': (f'/api/chat/messages/?conversation={self.conversation.id}', self.staff),
+        }
+
+    def capture(self):
+        captured = {}
+        for name, (url, user) in self.endpoints().items():
+            self.client.logout()
+            if user is not None:
+                self.client.force_login(user)
+            connection.queries_log.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, f"{name}: {url}")
+            captured[name] = [query['sql'] for query in queries]
+        return captured
+
+    def describe(self, name, small, large):
+        shapes = Counter(normalize_sql(sql) for sql in large)
+        grown = [
+            (count, shape) for shape, count in shapes.most_common()
+            if count > Counter(normalize_sql(sql) for sql in small)[shape]
+        ] or [shapes.most_common(1)[0][::-1]]
+        count, shape = grown[0]
+        return (
+            f"{name}: {len(small)} queries at {self.SMALL} rows, {len(large)} at {self.LARGE} "
+            f"(budget {self.BUDGETS[name]}); repeated {count}x: {shape}"
+        )
+
+    def test_query_counts_do_not_grow_with_rows(self):
+        self.grow(self.SMALL)
+        small = self.capture()
+        self.grow(self.LARGE)
+        large = self.capture()
+
+        self.assertEqual(set(small), set(self.BUDGETS))
+        for name in self.BUDGETS:
+            with self.subTest(endpoint=name):
+                if len(small[name]) != len(large[name]) or len(large[name]) > self.BUDGETS[name]:
+                    self.fail(self.describe(name, small[name], large[name]))
+
+
+@override_settings(REQUEST_METRICS={'SAMPLE_RATE': 1.0, 'SLOW_REQUEST_MS': 60000})
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        product_type = ProductType.objects.create(name='Backsplash')
+        category = TileCategory.objects.create(name='Subway', product_type=product_type)
+        Tile.objects.create(title='White Subway', category=category)
+
+    def test_sampled_request_reports_timings(self):
+        user = User.objects.create_user('staff', password='pass-12345', is_staff=True)
+        token = Token.objects.create(user=user)
+
+        with self.assertLogs('api.requests', 'INFO') as logs, \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/tiles/', HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['view'], 'tile-list')
+        self.assertEqual(line['status'], 200)
+        self.assertEqual(line['queries'], len(queries))
+        # The token missed the shared cache and was loaded from the database
+        self.assertGreaterEqual(line['cache_misses'], 1)
+        self.assertGreater(line['serializer_ms'] + line['render_ms'], 0)
+        self.assertIn(f'desc="{len(queries)} queries"', response['Server-Timing'])
+        self.assertIn('serializer;dur=', response['Server-Timing'])
+
+    def test_server_timing_is_for_staff_unless_exposed(self):
+        with self.assertLogs('api.requests', 'INFO'):
+            response = self.client.get('/api/tiles/')
+        self.assertNotIn('Server-Timing', response)
+
+        with override_settings(REQUEST_METRICS={'SLOW_REQUEST_MS': 60000, 'EXPOSE_HEADER': True}), \
+                self.assertLogs('api.requests', 'INFO'):
+            response = self.client.get('/api/tiles/')
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+    def test_unsampled_request_has_no_header(self):
+        with override_settings(REQUEST_METRICS={'SAMPLE_RATE': 0}):
+            response = self.client.get('/api/tiles/')
+        self.assertNotIn('Server-Timing', response)
+
+
+class PrometheusMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        product_type = ProductType.objects.create(name='Backsplash')
+        TileCategory.objects.create(name='Subway', product_type=product_type)
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_requests_and_chat_messages_are_counted(self):
+        labels = {'view': 'tile-list', 'method': 'GET', 'status': '200'}
+        requests_before = self.sample('tolatiles_http_requests_total', **labels)
+        queries_before = self.sample('tolatiles_db_queries_per_request_count', view='tile-list')
+        messages_before = self.sample('tolatiles_chat_messages_sent_total')
+
+        self.client.get('/api/tiles/')
+        customer = User.objects.create_user('customer')
+        staff = User.objects.create_user('staff', is_staff=True)
+        conversation, _ = Conversation.get_or_create_direct(customer, staff)
+        Message.objects.create(conversation=conversation, sender=customer, receiver=staff, content='Hi')
+
+        self.assertEqual(self.sample('tolatiles_http_requests_total', **labels), requests_before + 1)
+        self.assertEqual(self.sample('tolatiles_db_queries_per_request_count', view='tile-list'), queries_before + 1)
+        self.assertEqual(self.sample('tolatiles_chat_messages_sent_total'), messages_before + 1)
+
+        self.client.force_login(staff)
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'tolatiles_http_request_duration_seconds_bucket', response.content)
+
+    def test_scrapes_need_the_token_staff_or_public(self):
+        with override_settings(PROMETHEUS_METRICS={'TOKEN': 'scrape-secret'}):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+            response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-secret')
+            self.assertEqual(response.status_code, 200)
+
+        # No token configured still fails closed
+        with override_settings(PROMETHEUS_METRICS={}):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with override_settings(PROMETHEUS_METRICS={'PUBLIC': True}):
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        self.profiles = tempfile.TemporaryDirectory()
+        self.addCleanup(self.profiles.cleanup)
+        settings_override = override_settings(REQUEST_PROFILING={'DIR': self.profiles.name, 'KEEP': 2})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.staff = User.objects.create_user('staff', password='pass-12345', is_staff=True)
+        product_type = ProductType.objects.create(name='Backsplash')
+        category = TileCategory.objects.create(name='Subway', product_type=product_type)
+        Tile.objects.create(title='White Subway', category=category)
+
+    def test_staff_profile_is_saved_and_listed(self):
+        self.client.force_login(self.staff)
+        response = self.client.get('/api/tiles/', {'__profile': '1'})
+        profile = load_profile(response['X-Profile-Id'])
+
+        self.assertEqual(profile['view'], 'tile-list')
+        self.assertEqual(profile['query_count'], len(profile['queries']))
+        self.assertTrue(any('api_tile' in query['sql'] for query in profile['queries']))
+        self.assertIn('cumulative', profile['report'])
+
+        self.assertContains(self.client.get('/admin/profiles/'), profile['id'])
+        self.assertContains(self.client.get(f"/admin/profiles/{profile['id']}/"), 'api_tile')
+        self.assertEqual(self.client.get(f"/admin/profiles/{profile['id']}/download/").status_code, 200)
+
+    def test_sampling_mode_and_pruning(self):
+        self.client.force_login(self.staff)
+        ids = [
+            self.client.get('/api/tiles/', HTTP_X_PROFILE='sample')['X-Profile-Id']
+            for _ in range(3)
+        ]
+        self.assertEqual(load_profile(ids[-1])['mode'], 'sample')
+        # Only the newest KEEP profiles survive
+        self.assertIsNone(load_profile(ids[0]))
+
+    def test_other_users_are_not_profiled(self):
+        response = self.client.get('/api/tiles/', {'__profile': '1'})
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(self.client.get('/admin/profiles/').status_code, 302)
+
+
+class SlowQueryLogTests(TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+        self.log = os.path.join(self.workdir.name, 'slow.jsonl')
+        product_type = ProductType.objects.create(name='Backsplash')
+        category = TileCategory.objects.create(name='Subway', product_type=product_type)
+        Tile.objects.create(title='White Subway', category=category)
+
+    def test_slow_queries_are_explained_and_reported(self):
+        with override_settings(SLOW_QUERY_LOG={'THRESHOLD_MS': 0, 'FILE': self.log}), \
+                self.assertLogs('api.slow_queries', 'WARNING'):
+            self.client.get('/api/tiles/', {'search': 'white'})
+            self.client.get('/api/tiles/', {'search': 'grey'})
+            self.client.get('/api/tiles/white-subway/')
+
+        out = StringIO()
+        call_command('slow_query_report', file=self.log, order='count', stdout=out)
+        report = out.getvalue()
+        # Both searches share one fingerprint
+        self.assertIn(' ms, 2x, worst ', report)
+        self.assertIn('  tile-list  ', report)
+        self.assertIn('LIKE', report)
+        self.assertIn('Seq Scan on api_tile' if connection.vendor == 'postgresql' else 'SCAN api_tile', report)
+        self.assertIn("'%white%'", report)
+        self.assertIn('tile-detail  api/views.py:', report)
+        self.assertIn('TileViewSet.get_object', report)
+
+    def test_normalize_sql_collapses_literals_and_in_lists(self):
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE a = 'x' AND b IN (%s, %s, %s) LIMIT 21"),
+            normalize_sql("SELECT *  FROM t WHERE a = 'y' AND b IN (%s) LIMIT 5"),
+        )
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TestCase):
+    """The test 'replica' is a separate, empty database: rows only exist on it when written there."""
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        ProductType.objects.create(name='Backsplash')
+        self.contact = {'name': 'Ana', 'email': 'ana@example.com', 'subject': 'Quote', 'message': 'Hello'}
+
+    def product_type_names(self, **headers):
+        response = self.client.get('/api/product-types/', **headers)
+        self.assertEqual(response.status_code, 200)
+        return [product_type['name'] for product_type in response.json()]
+
+    def test_reads_use_the_replica_until_the_client_writes(self):
+        self.assertEqual(self.product_type_names(), [])
+
+        response = self.client.post('/api/contacts/', self.contact, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('db_pin', response.cookies)
+        self.assertEqual(self.product_type_names(), ['Backsplash'])
+
+        self.client.cookies.clear()
+        self.assertEqual(self.product_type_names(), [])
+        # Writes always go to the primary
+        self.assertTrue(ProductType.objects.using('default').exists())
+
+    def test_signed_in_writers_are_pinned_on_every_client(self):
+        user = User.objects.create_user('pinned', password='pass12345')
+        token = Token.objects.create(user=user)
+        headers = {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+
+        self.client.post('/api/contacts/', self.contact, content_type='application/json', **headers)
+        self.client.cookies.clear()
+        self.assertEqual(self.product_type_names(**headers), ['Backsplash'])
+        self.assertEqual(self.product_type_names(), [])
+
+
+class SQLiteTuningTests(TestCase):
+    def test_tuned_connections_use_wal_and_immediate_transactions(self):
+        with tempfile.TemporaryDirectory() as directory:
+            settings_dict = connections.configure_settings({
+                'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(directory, 'tuned.sqlite3')},
+            })['default']
+            wrapper = SQLiteDatabaseWrapper(settings_dict, alias='tuned')
+            with override_settings(SQLITE_TUNING={'ENABLED': True, 'SERIALIZED_BUSY_TIMEOUT_MS': 123}):
+                wrapper.ensure_connection()
+            try:
+                with wrapper.cursor() as cursor:
+                    pragmas = {}
+                    for name in ('journal_mode', 'synchronous', 'busy_timeout'):
+                        cursor.execute(f'PRAGMA {name}')
+                        pragmas[name] = cursor.fetchone()[0]
+            finally:
+                wrapper.close()
+        self.assertEqual(pragmas, {'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 123})
+        self.assertEqual(wrapper.transaction_mode, 'IMMEDIATE')
+        self.assertIn(serialized_writes, wrapper.execute_wrappers)
+
+    def test_a_held_write_lock_times_out_instead_of_stalling(self):
+        connection = mock.Mock(in_atomic_block=False, settings_dict={'NAME': 'held.sqlite3'}, alias='held')
+        execute = mock.Mock()
+        lock = _write_locks['held.sqlite3']
+        lock.acquire()
+        self.addCleanup(lock.release)
+
+        started = time.perf_counter()
+        with override_settings(SQLITE_TUNING={'LOCK_TIMEOUT_MS': 10, 'WRITE_RETRIES': 2, 'RETRY_BACKOFF_MS': 1}), \
+                self.assertLogs('api.sqlite_tuning', 'INFO'), self.assertRaises(OperationalError) as raised:
+            serialized_writes(execute, 'INSERT INTO t VALUES (1)', [], False, {'connection': connection})
+        self.assertLess(time.perf_counter() - started, 1)
+        self.assertTrue(is_lock_error(raised.exception))
+        execute.assert_not_called()
+
+    def test_concurrent_writes_see_no_lock_errors(self):
+        out = StringIO()
+        call_command('sqlite_stress', threads=8, writes=40, rate=0, stdout=out)
+        self.assertIn('lock errors: 0, other errors: 0', out.getvalue())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'PostgreSQL features')
+class PostgresFeatureTests(TestCase):
+    def index_names(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT indexname FROM pg_indexes WHERE tablename = %s", [table])
+            return {row[0] for row in cursor.fetchall()}
+
+    def test_search_uses_tsvector_and_catalog_gets_trigram_indexes_when_available(self):
+        self.assertEqual(get_search_backend().name, 'postgres-tsvector')
+        self.assertIn('api_message_search_document', self.index_names('api_message_search'))
+
+        created = ensure_trigram_indexes()
+        if enable_extension('pg_trgm'):
+            self.assertIn('api_tile_title_trgm', self.index_names('api_tile'))
+            self.assertEqual(len(created), 8)
+        else:
+            self.assertEqual(created, [])
+
+
+class DirectConversationTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice')
+        self.bob = User.objects.create_user('bob')
+
+    def test_get_or_create_direct_is_symmetric(self):
+        conversation, created = Conversation.get_or_create_direct(self.alice, self.bob)
+        self.assertTrue(created)
+
+        with self.assertNumQueries(1):
+            same, created = Conversation.get_or_create_direct(self.bob, self.alice)
+        self.assertFalse(created)
+        self.assertEqual(same, conversation)
+        self.assertEqual(ParticipantState.objects.filter(conversation=conversation).count(), 2)
+
+    def test_legacy_conversation_is_claimed(self):
+        legacy = Conversation.objects.create()
+        legacy.participants.add(self.alice, self.bob)
+
+        conversation, created = Conversation.get_or_create_direct(self.alice, self.bob)
+        self.assertFalse(created)
+        self.assertEqual(conversation, legacy)
+        self.assertEqual((conversation.min_user_id, conversation.max_user_id), (self.alice.id, self.bob.id))
+
+    def test_merge_duplicate_conversations(self):
+        duplicates = []
+        for content in ['first', 'second']:
+            conversation = Conversation.objects.create()
+            conversation.participants.add(self.alice, self.bob)
+            Message.objects.create(conversation=conversation, sender=self.alice, receiver=self.bob, content=content)
+            duplicates.append(conversation)
+
+        call_command('merge_duplicate_conversations', stdout=StringIO())
+
+        conversation = Conversation.objects.get()
+        self.assertEqual(conversation, duplicates[0])
+        self.assertEqual(conversation.messages.count(), 2)
+        self.assertEqual(conversation.last_message.content, 'second')
+        self.assertEqual(ParticipantState.objects.get(conversation=conversation, user=self.bob).unread_count, 2)
+        self.assertEqual(Conversation.get_or_create_direct(self.bob, self.alice), (conversation, False))
+
+    def test_merge_keeps_archived_history_and_search(self):
+        duplicates = []
+        for content in ['granite quote', 'marble quote']:
+            conversation = Conversation.objects.create()
+            conversation.participants.add(self.alice, self.bob)
+            Message.objects.create(conversation=conversation, sender=self.alice, receiver=self.bob, content=content)
+            duplicates.append(conversation)
+        ArchivedMessage.archive(Message.objects.filter(conversation=duplicates[1]).values_list('id', flat=True))
+        ParticipantState.objects.create(
+            conversation=duplicates[1], user=self.bob, last_read_message=Message.objects.get(conversation=duplicates[0])
+        )
+
+        call_command('merge_duplicate_conversations', stdout=StringIO())
+
+        conversation = Conversation.objects.get()
+        self.assertEqual(
+            list(conversation.archived_messages.values_list('content', flat=True)), ['marble quote']
+        )
+        self.client.force_login(self.alice)
+        response = self.client.get('/api/chat/messages/search/', {'q': 'marble'})
+        self.assertEqual([result['content'] for result in response.data['results']], ['marble quote'])
+        state = ParticipantState.objects.get(conversation=conversation, user=self.bob)
+        self.assertEqual(state.last_read_message.content, 'granite quote')
+        self.assertEqual(state.unread_count, 0)
+
+
+class StaffRoutingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = [User.objects.create_user(f'staff{n}', is_staff=True) for n in range(2)]
+        self.customers = [User.objects.create_user(f'customer{n}') for n in range(3)]
+
+    def contact(self, customer, text='Hello'):
+        self.client.force_login(customer)
+        response = self.client.post('/api/chat/admin-contact/', {'message': text}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        return Message.objects.filter(sender=customer).latest('id').receiver
+
+    def test_new_threads_go_to_least_loaded_agent(self):
+        receivers = [self.contact(customer) for customer in self.customers]
+
+        self.assertEqual(receivers, [self.staff[0], self.staff[1], self.staff[0]])
+        self.assertEqual(
+            sorted(StaffAgent.objects.values_list('open_threads', flat=True)), [1, 2]
+        )
+
+    def test_threads_stick_to_previous_agent(self):
+        first = self.contact(self.customers[0])
+        self.assertEqual(self.contact(self.customers[0], 'Still there?'), first)
+        self.assertEqual(StaffAgent.objects.get(user=first).open_threads, 1)
+
+        # Resolved threads reopen with the same agent while available
+        conversation = Conversation.objects.get(min_user=first)
+        self.client.force_login(first)
+        self.client.post(f'/api/chat/conversations/{conversation.id}/resolve/')
+        self.assertEqual(StaffAgent.objects.get(user=first).open_threads, 0)
+        self.assertEqual(self.contact(self.customers[0], 'One more thing'), first)
+
+    def test_unavailable_agent_is_skipped(self):
+        first = self.contact(self.customers[0])
+        self.client.force_login(first)
+        self.client.post(f'/api/chat/conversations/{Conversation.objects.get().id}/resolve/')
+        self.client.post('/api/chat/conversations/availability/', {'is_available': False},
+                         content_type='application/json')
+
+        other = self.contact(self.customers[0], 'Hello again')
+        self.assertNotEqual(other, first)
+        self.assertEqual(SupportAssignment.objects.get(customer=self.customers[0]).agent.user, other)
+
+    def test_staff_are_enrolled_when_saved(self):
+        late = User.objects.create_user('late-staff')
+        self.assertFalse(StaffAgent.objects.filter(user=late).exists())
+        late.is_staff = True
+        late.save()
+
+        receivers = [self.contact(customer) for customer in self.customers]
+
+        self.assertIn(late, receivers)
+        self.assertEqual(StaffAgent.objects.filter(open_threads__gt=0).count(), 3)
+
+    def test_concurrent_assign_returns_the_winning_agent(self):
+        winner = StaffAgent.objects.get(user=self.staff[1])
+        least_loaded = StaffAgent.least_loaded
+
+        def racing_pick():
+            # Another request assigns the same customer meanwhile
+            SupportAssignment.objects.create(customer=self.customers[0], agent=winner)
+            return least_loaded()
+
+        with mock.patch.object(StaffAgent, 'least_loaded', side_effect=racing_pick):
+            self.assertEqual(SupportAssignment.assign(self.customers[0]), self.staff[1])
+        self.assertEqual(StaffAgent.objects.get(user=self.staff[0]).open_threads, 0)
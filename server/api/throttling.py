@@ -0,0 +1,120 @@
+# server/api/throttling.py
+import hashlib
+import math
+
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class ClientRateThrottle(SimpleRateThrottle):
+    """
+    Sliding-window throttle keyed by the authenticated user (token or
+    session) and by client IP for anonymous requests. The IP is
+    REMOTE_ADDR unless REST_FRAMEWORK['NUM_PROXIES'] says how many
+    trusted proxies append to X-Forwarded-For.
+
+    Each client gets one counter per fixed window in the shared cache,
+    bumped with an atomic ``incr``. The request count is estimated as the
+    current window's counter plus the previous window's counter weighted
+    by how much of it still overlaps the sliding window. A check costs
+    three cache round trips and never touches the database.
+
+    Rates are read per scope from REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'].
+    """
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    def get_rate(self):
+        # Read rates at instantiation so settings overrides take effect
+        self.THROTTLE_RATES = api_settings.DEFAULT_THROTTLE_RATES
+        return super().get_rate()
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = f'user-{request.user.pk}'
+        else:
+            ident = f'ip-{self.get_ident(request)}'
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        self.elapsed = self.now - window * self.duration
+        current_key = f'{self.key}:{window}'
+
+        # Counters outlive their window by one period so they can be
+        # weighted as the previous window
+        self.cache.add(current_key, 0, self.duration * 2)
+        try:
+            self.current = self.cache.incr(current_key)
+        except ValueError:
+            # Expired between add() and incr()
+            self.cache.set(current_key, 1, self.duration * 2)
+            self.current = 1
+        self.previous = self.cache.get(f'{self.key}:{window - 1}', 0)
+
+        weight = 1 - self.elapsed / self.duration
+        return self.current + self.previous * weight <= self.num_requests
+
+    def wait(self):
+        """
+        Seconds until the estimated count drops back under the limit.
+        """
+        remaining = self.duration - self.elapsed
+        if self.current <= self.num_requests and self.previous:
+            # The previous window decays enough before this one ends
+            overlap = (self.num_requests - self.current) / self.previous
+            return max(1, math.ceil(self.duration * (1 - overlap) - self.elapsed))
+        # This window has to become the previous one and decay in turn
+        decay = self.duration * (1 - self.num_requests / self.current)
+        return max(1, math.ceil(remaining + decay))
+
+
+class LoginRateThrottle(ClientRateThrottle):
+    scope = 'login'
+
+
+class LoginUsernameRateThrottle(ClientRateThrottle):
+    """
+    Login attempts per submitted username, whichever client sends them,
+    so rotating IPs does not buy more guesses at one account.
+    """
+    scope = 'login_username'
+
+    def get_cache_key(self, request, view):
+        username = request.data.get('username')
+        if not isinstance(username, str) or not username.strip():
+            return None
+        # Hashed: usernames may hold characters cache keys cannot
+        ident = hashlib.sha256(username.strip().lower().encode()).hexdigest()[:32]
+        return self.cache_format % {'scope': self.scope, 'ident': f'username-{ident}'}
+
+
+class RegisterRateThrottle(ClientRateThrottle):
+    scope = 'register'
+
+
+class ContactRateThrottle(ClientRateThrottle):
+    scope = 'contact'
+
+
+class SubscribeRateThrottle(ClientRateThrottle):
+    scope = 'subscribe'
+
+
+class TestimonialRateThrottle(ClientRateThrottle):
+    scope = 'testimonial'
+
+
+class ChatSendRateThrottle(ClientRateThrottle):
+    scope = 'chat_send'
+
+
+class ChatTypingRateThrottle(ClientRateThrottle):
+    scope = 'chat_typing'
@@ -6,6 +6,7 @@ from django.urls import path, include, re_path
 from rest_framework.routers import DefaultRouter
 from . import views
 from .views_auth import register_user, admin_login
+from .views_realtime import chat_stream
 
 router = DefaultRouter()
 router.register(r'categories', views.TileCategoryViewSet)
@@ -33,6 +34,9 @@ urlpatterns = [
     path('auth/change-password/', views.change_password, name='change_password'),
     
 
+    # Load shedding metrics
+    path('system/admission/', views.admission_metrics, name='admission_metrics'),
+    
     # User profile endpoints
     path('auth/profile/', views.update_user_profile, name='update_profile'),
     
@@ -40,6 +44,9 @@ urlpatterns = [
     path('chat/send/', views.MessageViewSet.as_view({'post': 'send_message'}), name='send_message'),
     path('chat/mark-read/', views.MessageViewSet.as_view({'post': 'mark_read'}), name='mark_read'),
     path('chat/admin-contact/', views.MessageViewSet.as_view({'post': 'admin_contact'}), name='admin_contact'),
+    path('chat/typing/', views.MessageViewSet.as_view({'post': 'typing'}), name='chat_typing'),
+    path('chat/presence/', views.MessageViewSet.as_view({'get': 'presence'}), name='chat_presence'),
+    path('chat/stream/', chat_stream, name='chat_stream'),
     
     # Subscriber endpoints
     path('newsletter/subscribe/', views.SubscriberViewSet.as_view({'post': 'subscribe'}), name='subscribe'),
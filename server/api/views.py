@@ -1,24 +1,28 @@
 # server/api/views.py
 from rest_framework import viewsets, permissions, status, filters
-from rest_framework.decorators import api_view, permission_classes, action
+from rest_framework.decorators import api_view, permission_classes, throttle_classes, action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.authtoken.models import Token
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
-from django.db.models import Q
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Q, OuterRef, Subquery
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from .models import (
-    UserProfile, Conversation, Message,
+    UserProfile, Conversation, ParticipantState, Message, ArchivedMessage, StaffAgent, SupportAssignment,
     TileCategory, TileImage, Project, ProjectImage, 
     Contact, Subscriber, Tile, ProductType, 
     TeamMember, CustomerTestimonial
 )
 from .serializers import (
     UserSerializer, UserProfileSerializer, MessageSerializer, ConversationSerializer,
-    RegisterSerializer, PasswordChangeSerializer, SendMessageSerializer, MarkMessagesReadSerializer,
+    RegisterSerializer, PasswordChangeSerializer, SendMessageSerializer, MarkMessagesReadSerializer, MarkConversationReadSerializer, TypingSerializer,
     TileCategorySerializer, TileCategoryDetailSerializer,
     TileImageSerializer, ProjectSerializer, ProjectDetailSerializer,
     ProjectImageSerializer, ContactSerializer, SubscriberSerializer, 
@@ -26,6 +30,15 @@ from .serializers import (
     ProductTypeDetailSerializer, TeamMemberSerializer,
     CustomerTestimonialSerializer
 )
+from .authentication import invalidate_user_tokens
+from .middleware import admission_limiters
+from .events import publish_to_users
+from .presence import chat_partner_ids, get_presence, set_typing
+from .search import search_messages, highlight
+from .throttling import (
+    LoginRateThrottle, LoginUsernameRateThrottle, RegisterRateThrottle, ContactRateThrottle,
+    SubscribeRateThrottle, TestimonialRateThrottle, ChatSendRateThrottle, ChatTypingRateThrottle
+)
 import logging
 
 # Set up logger
@@ -36,6 +49,7 @@ logger = logging.getLogger(__name__)
 
 @api_view(['POST'])
 @permission_classes([AllowAny])  # This is the critical part - we need to allow anyone to register
+@throttle_classes([RegisterRateThrottle])
 def register_view(request):
     """
     Register a new user without requiring authentication
@@ -140,7 +154,33 @@ def change_password(request):
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+# Load shedding metrics
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def admission_metrics(request):
+    """
+    In-flight, queue depth and shed counts per route class for this worker.
+    """
+    return Response({name: limiter.snapshot() for name, limiter in admission_limiters.items()})
+
 # Chat Views
+def encode_sync_cursor(message):
+    return f"{message.updated_at.isoformat()}_{message.id}"
+
+def decode_sync_cursor(cursor):
+    """
+    Parse an ``<updated_at>_<id>`` cursor, returning None if malformed.
+    """
+    updated_at, _, message_id = cursor.rpartition('_')
+    updated_at = parse_datetime(updated_at) if updated_at else None
+    if updated_at is None or not message_id.isdigit():
+        return None
+    return updated_at, int(message_id)
+
+def get_page_limit(request, default=100, maximum=500):
+    limit = request.query_params.get('limit', '')
+    return min(int(limit), maximum) if limit.isdigit() and int(limit) > 0 else default
+
 class ConversationViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing conversations
@@ -149,7 +189,22 @@ class ConversationViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return Conversation.objects.filter(participants=self.request.user)
+        user = self.request.user
+        # One query for the inbox (plus the participants prefetch): last
+        # message and unread count come from denormalized columns
+        unread_count = ParticipantState.objects.filter(
+            conversation=OuterRef('pk'), user=user
+        ).values('unread_count')[:1]
+        last_message_watermark = ParticipantState.objects.filter(
+            conversation=OuterRef('pk'), user=OuterRef('last_message__receiver')
+        ).values('last_read_message_id')[:1]
+        return Conversation.objects.filter(participants=user) \
+            .select_related('last_message__sender__profile', 'last_message__receiver') \
+            .prefetch_related('participants') \
+            .annotate(
+                user_unread_count=Subquery(unread_count),
+                last_message_receiver_last_read=Subquery(last_message_watermark),
+            )
     
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -173,41 +228,67 @@ class ConversationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Check if conversation exists
-        conversations = Conversation.objects.filter(participants=request.user) \
-                                  .filter(participants=other_user)
+        # Get or create the conversation by its participant pair
+        conversation, created = Conversation.get_or_create_direct(request.user, other_user)
         
-        if conversations.exists():
-            serializer = self.get_serializer(conversations.first())
+        serializer = self.get_serializer(conversation)
+        if not created:
             return Response(serializer.data)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['post'], permission_classes=[IsAdminUser])
+    def resolve(self, request, pk=None):
+        """
+        Close the customer's support thread and free up its staff agent
+        """
+        conversation = self.get_object()
+        customers = [user for user in conversation.participants.all() if not user.is_staff]
         
-        # Create new conversation
-        conversation = Conversation.objects.create()
-        conversation.participants.add(request.user, other_user)
+        closed = any([SupportAssignment.close_for(customer) for customer in customers])
+        return Response({'status': 'resolved' if closed else 'no open thread'})
+    
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def availability(self, request):
+        """
+        Set whether the current staff member takes new customer threads
+        """
+        is_available = request.data.get('is_available')
+        if not isinstance(is_available, bool):
+            return Response(
+                {'error': 'is_available must be true or false'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        serializer = self.get_serializer(conversation)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        agent, _ = StaffAgent.objects.get_or_create(user=request.user)
+        StaffAgent.objects.filter(pk=agent.pk).update(is_available=is_available)
+        
+        return Response({'is_available': is_available, 'open_threads': agent.open_threads})
 
-class MessageViewSet(viewsets.ModelViewSet):
+class MessageViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for managing messages
+    
+    Read-only apart from its actions: messages are written through
+    send_message and mark_read, which keep the conversation summaries
+    (last_message, unread counts) in step.
     """
     serializer_class = MessageSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
         user = self.request.user
+        messages = Message.objects.with_read_state().select_related('sender__profile', 'receiver')
         
         # Filter by conversation if provided
         conversation_id = self.request.query_params.get('conversation')
         if conversation_id:
-            return Message.objects.filter(
+            return messages.filter(
                 conversation__participants=user,
                 conversation_id=conversation_id
             )
         
         # Otherwise return all messages for user
-        return Message.objects.filter(
+        return messages.filter(
             Q(sender=user) | Q(receiver=user)
         )
     
@@ -215,6 +296,152 @@ class MessageViewSet(viewsets.ModelViewSet):
         context = super().get_serializer_context()
         return context
     
+    def get_throttles(self):
+        if self.action == 'send_message':
+            return [ChatSendRateThrottle()]
+        if self.action == 'typing':
+            return [ChatTypingRateThrottle()]
+        return super().get_throttles()
+    
+    @action(detail=False, methods=['get'])
+    def sync(self, request):
+        """
+        Messages created or changed (status, read) after ``cursor`` across
+        all of the user's conversations, oldest change first, plus the read
+        watermarks that moved since then.
+        
+        Without a cursor, returns no messages and the current cursor to
+        start syncing from.
+        """
+        user = request.user
+        messages = Message.objects.with_read_state().filter(Q(sender=user) | Q(receiver=user))
+        cursor = request.query_params.get('cursor')
+        
+        if not cursor:
+            head = messages.order_by('-updated_at', '-id').first()
+            return Response({
+                'messages': [],
+                'cursor': encode_sync_cursor(head) if head else None,
+                'has_more': False
+            })
+        
+        position = decode_sync_cursor(cursor)
+        if position is None:
+            return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+        updated_at, message_id = position
+        
+        limit = get_page_limit(request)
+        page = list(
+            messages.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=message_id))
+            .select_related('sender__profile', 'receiver')
+            .order_by('updated_at', 'id')[:limit + 1]
+        )
+        has_more = len(page) > limit
+        page = page[:limit]
+        next_cursor = encode_sync_cursor(page[-1]) if page else cursor
+        
+        read_states = list(
+            ParticipantState.objects.filter(conversation__participants=user, read_at__gt=updated_at)
+            .values('conversation', 'user', 'last_read_message', 'read_at')
+            .order_by('read_at')[:limit + 1]
+        )
+        if len(read_states) > limit:
+            # Resume after the last watermark sent, even if that repeats
+            # some of this page's messages
+            read_states = read_states[:limit]
+            latest = read_states[-1]['read_at']
+            if not has_more or latest < decode_sync_cursor(next_cursor)[0]:
+                next_cursor = f"{latest.isoformat()}_0"
+            has_more = True
+        elif read_states and not has_more:
+            # Move past the newest watermark so it is not sent again
+            latest = read_states[-1]['read_at']
+            if latest > decode_sync_cursor(next_cursor)[0]:
+                next_cursor = f"{latest.isoformat()}_0"
+        
+        return Response({
+            'messages': MessageSerializer(page, many=True, context={'request': request}).data,
+            'read_states': read_states,
+            'cursor': next_cursor,
+            'has_more': has_more
+        })
+    
+    @action(detail=False, methods=['get'])
+    def history(self, request):
+        """
+        Page backwards through a conversation, starting from the newest
+        message. Pass ``before`` (a message id) to get the next older page.
+        
+        Archived messages are merged in by id, so clients page through
+        ArchivedMessage without knowing it exists.
+        """
+        conversation_id = request.query_params.get('conversation')
+        if not conversation_id or not conversation_id.isdigit():
+            return Response({'error': 'conversation is required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not Conversation.objects.filter(id=conversation_id, participants=request.user).exists():
+            return Response({'error': 'Conversation not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        messages = Message.objects.filter(conversation_id=conversation_id)
+        archived = ArchivedMessage.objects.filter(conversation_id=conversation_id)
+        before = request.query_params.get('before')
+        if before and before.isdigit():
+            messages = messages.filter(id__lt=before)
+            archived = archived.filter(id__lt=before)
+        
+        limit = get_page_limit(request, default=50)
+        page = list(
+            messages.with_read_state().select_related('sender__profile', 'receiver')
+            .order_by('-id')[:limit + 1]
+        )
+        page += archived.select_related('sender__profile', 'receiver').order_by('-id')[:limit + 1]
+        page.sort(key=lambda message: message.id, reverse=True)
+        page = page[:limit + 1]
+        has_more = len(page) > limit
+        page = page[:limit]
+        page.reverse()
+        
+        return Response({
+            'messages': MessageSerializer(page, many=True, context={'request': request}).data,
+            'before': page[0].id if page and has_more else None,
+            'has_more': has_more
+        })
+    
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Full-text search over message content, newest first. Staff search
+        every conversation; other users only their own. Pass ``before``
+        (a message id) to get the next page.
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        conversation_ids = None
+        if not request.user.is_staff:
+            conversation_ids = list(
+                Conversation.objects.filter(participants=request.user).values_list('id', flat=True)
+            )
+        
+        before = request.query_params.get('before')
+        limit = get_page_limit(request, default=20, maximum=100)
+        page, terms = search_messages(
+            query, conversation_ids, int(before) if before and before.isdigit() else None, limit + 1
+        )
+        has_more = len(page) > limit
+        page = page[:limit]
+        
+        results = MessageSerializer(page, many=True, context={'request': request}).data
+        for result, message in zip(results, page):
+            result['highlight'] = highlight(message.content, terms)
+        
+        return Response({
+            'results': results,
+            'before': page[-1].id if page and has_more else None,
+            'has_more': has_more
+        })
+    
     @action(detail=False, methods=['post'])
     def send_message(self, request):
         """
@@ -235,30 +462,28 @@ class MessageViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_404_NOT_FOUND
                 )
             
-            # Get or create conversation
-            conversations = Conversation.objects.filter(participants=request.user) \
-                                      .filter(participants=receiver)
-            
-            if conversations.exists():
-                conversation = conversations.first()
-            else:
-                conversation = Conversation.objects.create()
-                conversation.participants.add(request.user, receiver)
+            with transaction.atomic():
+                # Get or create conversation
+                conversation, _ = Conversation.get_or_create_direct(request.user, receiver)
+                
+                # Create message
+                message = Message.objects.create(
+                    conversation=conversation,
+                    sender=request.user,
+                    receiver=receiver,
+                    content=content,
+                    attachment=attachment,
+                    is_admin_message=request.user.is_staff
+                )
+                
+                # Update last message, timestamp and unread count
+                conversation.record_message(message)
             
-            # Create message
-            message = Message.objects.create(
-                conversation=conversation,
-                sender=request.user,
-                receiver=receiver,
-                content=content,
-                attachment=attachment,
-                is_admin_message=request.user.is_staff
-            )
+            message_serializer = MessageSerializer(message, context={'request': request})
             
-            # Update conversation timestamp
-            conversation.save()  # This updates the updated_at field
+            # Push to both participants' open chat streams
+            publish_to_users([request.user.id, receiver.id], 'message.created', message_serializer.data)
             
-            message_serializer = MessageSerializer(message, context={'request': request})
             return Response(message_serializer.data, status=status.HTTP_201_CREATED)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -266,8 +491,12 @@ class MessageViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['post'])
     def mark_read(self, request):
         """
-        Mark messages as read
+        Mark messages as read, either by ``message_ids`` or everything in
+        ``conversation`` up to ``up_to_message_id``
         """
+        if 'up_to_message_id' in request.data:
+            return self.mark_read_up_to(request)
+        
         serializer = MarkMessagesReadSerializer(data=request.data)
         
         if serializer.is_valid():
@@ -279,7 +508,27 @@ class MessageViewSet(viewsets.ModelViewSet):
                 receiver=request.user
             )
             
-            count = messages.update(is_read=True, status='read')
+            with transaction.atomic():
+                unread = list(messages.filter(is_read=False).values_list('id', 'conversation_id', 'sender_id'))
+                # update() skips auto_now; bump updated_at so sync cursors see the change
+                count = messages.update(is_read=True, status='read', updated_at=timezone.now())
+                
+                # Keep per-participant unread counts and watermarks in step
+                by_conversation = {}
+                for message_id, conversation_id, sender_id in unread:
+                    by_conversation.setdefault(conversation_id, []).append(message_id)
+                for conversation_id, read_ids in by_conversation.items():
+                    Conversation(id=conversation_id).messages_marked_read(request.user, read_ids)
+            
+            # Send read receipts to each sender
+            by_sender = {}
+            for message_id, conversation_id, sender_id in unread:
+                by_sender.setdefault(sender_id, []).append({'id': message_id, 'conversation': conversation_id})
+            for sender_id, read_messages in by_sender.items():
+                publish_to_users([sender_id, request.user.id], 'message.read', {
+                    'reader': request.user.id,
+                    'messages': read_messages,
+                })
             
             return Response({
                 'status': 'success',
@@ -287,6 +536,91 @@ class MessageViewSet(viewsets.ModelViewSet):
             })
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    def mark_read_up_to(self, request):
+        """
+        Move the user's read watermark for a conversation. Costs one
+        UPDATE however many messages it covers; message rows are left
+        alone and read as ``is_read`` through the watermark.
+        """
+        serializer = MarkConversationReadSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        conversation = Conversation.objects.filter(
+            id=serializer.validated_data['conversation'], participants=request.user
+        ).first()
+        if conversation is None:
+            return Response({'error': 'Conversation not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        # Clamp to a message that exists in this conversation
+        up_to_message_id = Message.objects.filter(
+            conversation=conversation, id__lte=serializer.validated_data['up_to_message_id']
+        ).order_by('-id').values_list('id', flat=True).first()
+        
+        moved = False
+        if up_to_message_id is not None:
+            with transaction.atomic():
+                moved = conversation.mark_read_up_to(request.user, up_to_message_id)
+                if moved:
+                    publish_to_users(
+                        conversation.participants.values_list('id', flat=True), 'message.read', {
+                            'reader': request.user.id,
+                            'conversation': conversation.id,
+                            'up_to_message_id': up_to_message_id,
+                        }
+                    )
+        
+        return Response({
+            'status': 'success',
+            'up_to_message_id': up_to_message_id,
+            'updated': moved
+        })
+
+    @action(detail=False, methods=['post'])
+    def typing(self, request):
+        """
+        Start or stop the typing indicator in a conversation. Kept in the
+        cache only; other participants get a ``typing`` event when the
+        state changes.
+        """
+        serializer = TypingSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        conversation_id = serializer.validated_data['conversation']
+        is_typing = serializer.validated_data['is_typing']
+        participant_ids = set(
+            Conversation.participants.through.objects.filter(conversation_id=conversation_id)
+            .values_list('user_id', flat=True)
+        )
+        if request.user.id not in participant_ids:
+            return Response({'error': 'Conversation not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        if set_typing(conversation_id, request.user.id, is_typing):
+            publish_to_users(participant_ids - {request.user.id}, 'typing', {
+                'conversation': conversation_id,
+                'user': request.user.id,
+                'is_typing': is_typing,
+            })
+        
+        return Response({'status': 'success'})
+    
+    @action(detail=False, methods=['get'])
+    def presence(self, request):
+        """
+        Online state and last-seen time for ``users`` (comma-separated
+        ids) in one call. Non-staff users only see their chat partners.
+        """
+        user_ids = [
+            int(user_id) for user_id in request.query_params.get('users', '').split(',')
+            if user_id.strip().isdigit()
+        ][:200]
+        if not request.user.is_staff:
+            allowed = set(chat_partner_ids(request.user.id)) | {request.user.id}
+            user_ids = [user_id for user_id in user_ids if user_id in allowed]
+        
+        return Response({str(user_id): state for user_id, state in get_presence(user_ids).items()})
 
     @action(detail=False, methods=['post'])
     def admin_contact(self, request):
@@ -302,9 +636,9 @@ class MessageViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Find an admin user
+        # Route to a staff agent by stickiness and current load
         try:
-            admin = User.objects.filter(is_staff=True).first()
+            admin = SupportAssignment.assign(request.user)
             
             if not admin:
                 return Response(
@@ -312,28 +646,27 @@ class MessageViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_404_NOT_FOUND
                 )
             
-            # Get or create conversation
-            conversations = Conversation.objects.filter(participants=request.user) \
-                                      .filter(participants=admin)
-            
-            if conversations.exists():
-                conversation = conversations.first()
-            else:
-                conversation = Conversation.objects.create()
-                conversation.participants.add(request.user, admin)
+            with transaction.atomic():
+                # Get or create conversation
+                conversation, _ = Conversation.get_or_create_direct(request.user, admin)
+                
+                # Create message
+                message = Message.objects.create(
+                    conversation=conversation,
+                    sender=request.user,
+                    receiver=admin,
+                    content=message,
+                    attachment=attachment
+                )
+                
+                # Update last message, timestamp and unread count
+                conversation.record_message(message)
             
-            # Create message
-            message = Message.objects.create(
-                conversation=conversation,
-                sender=request.user,
-                receiver=admin,
-                content=message,
-                attachment=attachment
+            publish_to_users(
+                [request.user.id, admin.id], 'message.created',
+                MessageSerializer(message, context={'request': request}).data
             )
             
-            # Update conversation timestamp
-            conversation.save()
-            
             return Response({
                 'status': 'success',
                 'message': 'Message sent to admin'
@@ -358,6 +691,7 @@ class IsAdminOrReadOnly(permissions.BasePermission):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([LoginRateThrottle, LoginUsernameRateThrottle])
 def admin_login(request):
     """
     Handle user authentication and return token on success.
@@ -420,6 +754,7 @@ def admin_login(request):
         )
 
 @api_view(['POST'])
+@throttle_classes([RegisterRateThrottle])
 def register_view(request):
     """
     Register a new user
@@ -435,10 +770,8 @@ def register_view(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Create user but don't save yet
-        user = serializer.save()
-        user.set_password(password)
-        user.save()
+        # Hash the password up front so the user is created with one INSERT
+        user = serializer.save(password=make_password(password))
         
         # Generate token
         token, _ = Token.objects.get_or_create(user=user)
@@ -489,6 +822,9 @@ def change_password(request):
     user.set_password(new_password)
     user.save()
     
+    # Drop the cached token -> user entry so the next request re-validates
+    invalidate_user_tokens(user)
+    
     # Generate new token
     token, _ = Token.objects.get_or_create(user=user)
     
@@ -543,7 +879,7 @@ class ProductTypeViewSet(viewsets.ModelViewSet):
         return obj
     
     def get_queryset(self):
-        queryset = ProductType.objects.all()
+        queryset = ProductType.objects.for_listing()
         
         # Filter by active status if specified
         active = self.request.query_params.get('active')
@@ -605,8 +941,13 @@ class CustomerTestimonialViewSet(viewsets.ModelViewSet):
             permission_classes = [IsAdminUser]
         return [permission() for permission in permission_classes]
     
+    def get_throttles(self):
+        if self.action == 'create':
+            return [TestimonialRateThrottle()]
+        return super().get_throttles()
+    
     def get_queryset(self):
-        queryset = CustomerTestimonial.objects.all()
+        queryset = CustomerTestimonial.objects.select_related('project')
         
         # By default, only show approved testimonials to non-admin users
         if not self.request.user.is_staff:
@@ -715,7 +1056,7 @@ class TileCategoryViewSet(viewsets.ModelViewSet):
         return obj
     
     def get_queryset(self):
-        queryset = TileCategory.objects.all()
+        queryset = TileCategory.objects.for_listing()
         
         # Filter by active status if specified
         active = self.request.query_params.get('active')
@@ -841,7 +1182,7 @@ class TileViewSet(viewsets.ModelViewSet):
         return obj
     
     def get_queryset(self):
-        queryset = Tile.objects.all()
+        queryset = Tile.objects.for_listing()
         
         # Filter by product type
         product_type = self.request.query_params.get('product_type')
@@ -1041,7 +1382,10 @@ class ProjectViewSet(viewsets.ModelViewSet):
         return obj
     
     def get_queryset(self):
-        queryset = Project.objects.all()
+        if self.action == 'retrieve':
+            queryset = Project.objects.for_detail()
+        else:
+            queryset = Project.objects.for_listing()
         
         # Filter by status
         status_param = self.request.query_params.get('status')
@@ -1156,6 +1500,11 @@ class ContactViewSet(viewsets.ModelViewSet):
         else:
             permission_classes = [IsAdminUser]
         return [permission() for permission in permission_classes]
+    
+    def get_throttles(self):
+        if self.action == 'create':
+            return [ContactRateThrottle()]
+        return super().get_throttles()
 
     @action(detail=True, methods=['post'], permission_classes=[IsAdminUser])
     def mark_responded(self, request, pk=None):
@@ -1178,6 +1527,11 @@ class SubscriberViewSet(viewsets.ModelViewSet):
             permission_classes = [IsAdminUser]
         return [permission() for permission in permission_classes]
     
+    def get_throttles(self):
+        if self.action in ['create', 'subscribe']:
+            return [SubscribeRateThrottle()]
+        return super().get_throttles()
+    
     @action(detail=False, methods=['post'], permission_classes=[AllowAny])
     def subscribe(self, request):
         email = request.data.get('email')
@@ -1,11 +1,12 @@
 # server/api/views_auth.py
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status
 from django.contrib.auth import authenticate
 from rest_framework.authtoken.models import Token
 from .serializers import UserSerializer, RegisterSerializer
+from .throttling import LoginRateThrottle, LoginUsernameRateThrottle, RegisterRateThrottle
 import logging
 
 # Set up logger
@@ -13,6 +14,7 @@ logger = logging.getLogger(__name__)
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([LoginRateThrottle, LoginUsernameRateThrottle])
 def admin_login(request):
     """
     Authenticate user and return Token for successful login.
@@ -68,6 +70,7 @@ def admin_login(request):
         
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([RegisterRateThrottle])
 def register_user(request):
     """
     Register a new user without requiring authentication
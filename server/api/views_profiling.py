@@ -0,0 +1,51 @@
+# server/api/views_profiling.py
+import os
+
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import FileResponse, Http404
+from django.shortcuts import render
+
+from .profiling import list_profiles, load_profile, raw_profile_path
+
+
+@staff_member_required
+def profile_list(request):
+    """
+    Recent request profiles, newest first.
+    """
+    return render(request, 'api/profiles/list.html', {
+        **admin.site.each_context(request),
+        'title': 'Request profiles',
+        'profiles': list_profiles(),
+    })
+
+
+@staff_member_required
+def profile_detail(request, profile_id):
+    """
+    One profile: request details, the profiler report and every SQL
+    statement with its duration, slowest first.
+    """
+    profile = load_profile(profile_id)
+    if profile is None:
+        raise Http404("Profile not found")
+    
+    return render(request, 'api/profiles/detail.html', {
+        **admin.site.each_context(request),
+        'title': f"Profile {profile_id}",
+        'profile': profile,
+        'slowest_queries': sorted(profile['queries'], key=lambda query: query['ms'], reverse=True),
+        'has_raw': raw_profile_path(profile_id) is not None,
+    })
+
+
+@staff_member_required
+def profile_download(request, profile_id):
+    """
+    The raw .prof (pstats, snakeviz) or .folded (flame graph) file.
+    """
+    path = raw_profile_path(profile_id)
+    if path is None:
+        raise Http404("Profile not found")
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=os.path.basename(path))
@@ -0,0 +1,120 @@
+# server/api/views_realtime.py
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from .authentication import get_token_user
+from .events import get_backend, publish_to_users, user_channel
+from .metrics import PUSH_CONNECTIONS
+from .models import Message
+from .presence import stream_closed, stream_opened, touch
+import logging
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+
+async def get_stream_user(request):
+    """
+    Authenticate a stream request by token or session.
+
+    EventSource cannot set headers, so the token may also be passed as
+    ``?token=``.
+    """
+    auth_header = request.META.get('HTTP_AUTHORIZATION', '')
+    token_key = request.GET.get('token')
+    if auth_header.startswith('Token '):
+        token_key = auth_header.split(' ')[1]
+
+    if token_key:
+        return await sync_to_async(get_token_user)(request, token_key)
+
+    user = await request.auser()
+    return user if user.is_authenticated else None
+
+
+def mark_delivered(message_id, receiver_id):
+    """
+    Flip a pushed message from 'sent' to 'delivered' and tell its sender.
+    """
+    updated = Message.objects.filter(
+        id=message_id, receiver_id=receiver_id, status='sent'
+    ).update(status='delivered', updated_at=timezone.now())
+    if updated:
+        message = Message.objects.values('id', 'conversation_id', 'sender_id').get(id=message_id)
+        publish_to_users([message['sender_id']], 'message.status', {
+            'id': message['id'],
+            'conversation': message['conversation_id'],
+            'status': 'delivered',
+        })
+
+
+def format_event(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event['data'], cls=DjangoJSONEncoder)}\n\n"
+
+
+async def event_stream(user):
+    keepalive = getattr(settings, 'CHAT_EVENTS', {}).get('KEEPALIVE', 15)
+    subscription = await get_backend().subscribe(user_channel(user.pk))
+    PUSH_CONNECTIONS.inc()
+    counted = False
+    try:
+        yield 'retry: 3000\n\n'
+        # An open stream is what keeps a user online
+        await sync_to_async(stream_opened)(user.pk)
+        counted = True
+        last_touch = time.monotonic()
+        while True:
+            event = await subscription.get(keepalive)
+            if time.monotonic() - last_touch >= keepalive:
+                await sync_to_async(touch)(user.pk)
+                last_touch = time.monotonic()
+            if event is None:
+                # Comment line keeps proxies from closing an idle stream
+                yield ': keepalive\n\n'
+                continue
+
+            yield format_event(event)
+
+            data = event['data']
+            if event['type'] == 'message.created' and data.get('receiver') == user.pk:
+                await sync_to_async(mark_delivered)(data['id'], user.pk)
+    finally:
+        PUSH_CONNECTIONS.dec()
+        await subscription.close()
+        if counted:
+            await sync_to_async(stream_closed)(user.pk)
+
+
+async def chat_stream(request):
+    """
+    Server-Sent Events stream of chat events for the current user:
+    ``message.created``, ``message.read``, ``message.status``,
+    ``presence`` and ``typing``.
+
+    Needs the ASGI application (server/asgi.py under uvicorn); a WSGI
+    worker would hold the stream in memory forever.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {'error': 'Chat streaming requires the ASGI server'},
+            status=501
+        )
+
+    user = await get_stream_user(request)
+    if user is None:
+        return JsonResponse(
+            {'error': 'Authentication credentials were not provided.'},
+            status=401
+        )
+
+    response = StreamingHttpResponse(event_stream(user), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
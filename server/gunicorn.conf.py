@@ -0,0 +1,22 @@
+# server/gunicorn.conf.py
+# Loaded automatically by gunicorn started from this directory.
+import os
+import shutil
+import tempfile
+
+# Workers write Prometheus samples here; /metrics merges them
+multiproc_dir = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'tolatiles-prometheus')
+)
+
+
+def on_starting(server):
+    # Samples from a previous run would be merged into the new totals
+    shutil.rmtree(multiproc_dir, ignore_errors=True)
+    os.makedirs(multiproc_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    # Drop the dead worker's live gauges (in-flight, push connections)
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
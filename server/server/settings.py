@@ -24,7 +24,9 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-hnhkq-qltrj6ibcu!@r6n_2*l5l7ctt55u4bgnzj89p3g0)60$'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# DEBUG also keeps every query in connection.queries; use REQUEST_METRICS
+# for query counts and timings instead.
+DEBUG = os.environ.get('DJANGO_DEBUG', '1') == '1'
 
 FILE_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024
 DATA_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024 
@@ -50,13 +52,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'api.middleware.AdmissionControlMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'api.middleware.CrossDomainAuthMiddleware',  
+    'api.middleware.ReplicaRoutingMiddleware',
+    'api.middleware.ProfilingMiddleware',
     'api.middleware.FileUploadMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -131,23 +137,276 @@ WSGI_APPLICATION = 'server.wsgi.application'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    # Anonymous clients are throttled by REMOTE_ADDR. Behind N trusted
+    # proxies set NUM_PROXIES=N so the client address is read from
+    # X-Forwarded-For; a client-supplied header is never trusted otherwise.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', '0')),
+    # Per-client limits for api.throttling scopes, counted in CACHES['default']
+    'DEFAULT_THROTTLE_RATES': {
+        'login': '10/min',
+        'login_username': '30/hour',
+        'register': '5/hour',
+        'contact': '5/hour',
+        'subscribe': '10/hour',
+        'testimonial': '5/hour',
+        'chat_send': '60/min',
+        'chat_typing': '120/min',
+    },
+}
+
+# Load tests (manage.py benchmark --mode live) run with rate limits off
+if os.environ.get('DISABLE_THROTTLING') == '1':
+    REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] = {
+        scope: None for scope in REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']
+    }
+
+# Cache shared by token auth and other per-client state.
+# Set REDIS_URL to share it across gunicorn workers. The api.cache_backends
+# classes count hits and misses for RequestMetricsMiddleware.
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'api.cache_backends.CountingRedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'api.cache_backends.CountingLocMemCache',
+            'LOCATION': 'tolatiles',
+        }
+    }
+
+# Per-request SQL/serializer/render timings from RequestMetricsMiddleware,
+# logged on 'api.requests' for a SAMPLE_RATE share of requests. Requests
+# over SLOW_REQUEST_MS log at WARNING. Sampled staff requests also get a
+# Server-Timing header; EXPOSE_HEADER sends it to every client.
+REQUEST_METRICS = {
+    'SAMPLE_RATE': float(os.environ.get('REQUEST_METRICS_SAMPLE_RATE', '1.0')),
+    'SERVER_TIMING': True,
+    'EXPOSE_HEADER': os.environ.get('REQUEST_METRICS_EXPOSE_HEADER') == '1',
+    'SLOW_REQUEST_MS': 500,
+}
+
+# /metrics (Prometheus). Under gunicorn, workers share samples through
+# PROMETHEUS_MULTIPROC_DIR, set up by gunicorn.conf.py. Scrapers send
+# "Authorization: Bearer <TOKEN>"; staff logins may also read it. PUBLIC
+# drops the check, for when only the scraper can reach the service.
+PROMETHEUS_METRICS = {
+    'ENABLED': os.environ.get('PROMETHEUS_METRICS', '1') == '1',
+    'TOKEN': os.environ.get('PROMETHEUS_METRICS_TOKEN'),
+    'PUBLIC': os.environ.get('PROMETHEUS_METRICS_PUBLIC') == '1',
+}
+
+# Staff-only per-request profiles (?__profile=1 or ?__profile=sample),
+# saved under BASE_DIR/DIR and listed at /admin/profiles/. Only the
+# newest KEEP are kept.
+REQUEST_PROFILING = {
+    'DIR': 'profiles',
+    'KEEP': 200,
+}
+
+# Statements slower than THRESHOLD_MS (None disables) are appended to
+# BASE_DIR/FILE with their EXPLAIN plan; summarize them with
+# `manage.py slow_query_report`.
+SLOW_QUERY_LOG = {
+    'THRESHOLD_MS': float(os.environ.get('SLOW_QUERY_MS', '100')),
+    'EXPLAIN': True,
+    'FILE': 'slow_queries.jsonl',
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # Set REQUEST_LOG_LEVEL=INFO to log every sampled request
+        'api.requests': {
+            'handlers': ['console'],
+            'level': os.environ.get('REQUEST_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
+# Token -> user cache used by CrossDomainAuthMiddleware and CachedTokenAuthentication.
+# Revoking a token or deactivating a user retires every worker's LRU entries
+# through a generation counter in CACHES['default'], so share that cache
+# (REDIS_URL) when running more than one worker.
+TOKEN_AUTH_CACHE = {
+    'TTL': 300,  # seconds in the shared cache
+    'LOCAL_TTL': 30,  # seconds in the per-process LRU
+    'LOCAL_MAX_ENTRIES': 2048,
 }
 
+# Per-worker concurrency caps used by AdmissionControlMiddleware.
+# Requests wait up to QUEUE_TIMEOUT seconds (at most MAX_QUEUE at once)
+# before being shed with a 503. The caps count threads within one process,
+# so they do nothing under sync gunicorn workers.
+ADMISSION_CONTROL = {
+    'catalog': {'MAX_CONCURRENCY': 16, 'MAX_QUEUE': 32, 'QUEUE_TIMEOUT': 2.0},
+    'upload': {'MAX_CONCURRENCY': 2, 'MAX_QUEUE': 4, 'QUEUE_TIMEOUT': 5.0, 'RETRY_AFTER': 5},
+    'chat': {'MAX_CONCURRENCY': 8, 'MAX_QUEUE': 16, 'QUEUE_TIMEOUT': 1.0},
+    'admin': {'MAX_CONCURRENCY': 4, 'MAX_QUEUE': 8, 'QUEUE_TIMEOUT': 5.0},
+}
+
+# Chat push events for /api/chat/stream/ (served by the ASGI app).
+# The in-process backend only reaches clients on the same worker.
+CHAT_EVENTS = {
+    'BACKEND': 'api.events.RedisBackend' if REDIS_URL else 'api.events.InProcessBackend',
+    'KEEPALIVE': 15,  # seconds between SSE keepalive comments
+}
+
+# Presence and typing state lives only in the cache. A user is online
+# while a chat stream keeps refreshing their key, so ONLINE_TTL must
+# exceed CHAT_EVENTS['KEEPALIVE']. Closing their last stream takes them
+# offline at once; a stream lost with its worker lapses after ONLINE_TTL.
+CHAT_PRESENCE = {
+    'ONLINE_TTL': 45,
+    'LAST_SEEN_TTL': 7 * 24 * 3600,
+    'TYPING_TTL': 6,
+}
+
+# Defaults for the archive_messages command: read messages older than
+# MESSAGE_AGE_DAYS move to ArchivedMessage once their conversation has
+# been idle for INACTIVE_DAYS
+CHAT_ARCHIVE = {
+    'MESSAGE_AGE_DAYS': 180,
+    'INACTIVE_DAYS': 30,
+}
+
+# Unread-message digests (send_unread_digests command) go to users with
+# unread messages older than MIN_AGE_MINUTES, BATCH_SIZE mails per
+# SMTP round
+CHAT_DIGEST = {
+    'MIN_AGE_MINUTES': 30,
+    'BATCH_SIZE': 100,
+    'CHAT_URL': os.environ.get('CHAT_URL', 'https://tolatiles.com'),
+}
+
+# Outgoing mail. Without EMAIL_HOST, mail is written to files in
+# sent_emails/ instead of being sent.
+EMAIL_HOST = os.environ.get('EMAIL_HOST')
+if EMAIL_HOST:
+    EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+    EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 587))
+    EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
+    EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
+    EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', 'true').lower() == 'true'
+else:
+    EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+    EMAIL_FILE_PATH = BASE_DIR / 'sent_emails'
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'TolaTiles <no-reply@tolatiles.com>')
+
+# Token requests are stateless except under these prefixes, where
+# CrossDomainAuthMiddleware upgrades them to a session login
+TOKEN_AUTH_SESSION_PATHS = ('/admin/',)
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+def postgres_database(host):
+    """
+    PostgreSQL settings for ``host``. With POSTGRES_POOL (the default)
+    each process keeps a psycopg pool and requests borrow from it;
+    otherwise every worker thread keeps its own connection for
+    DB_CONN_MAX_AGE seconds. Either way a connection is checked before
+    reuse, so a restarted server or dropped socket costs one reconnect
+    instead of a failed request.
+    """
+    pooled = os.environ.get('POSTGRES_POOL', '1') == '1'
+    options = {}
+    if pooled:
+        options['pool'] = {
+            'min_size': int(os.environ.get('POSTGRES_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.environ.get('POSTGRES_POOL_MAX_SIZE', '10')),
+            'timeout': int(os.environ.get('POSTGRES_POOL_TIMEOUT', '10')),
+        }
+    return {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ['POSTGRES_DB'],
+        'USER': os.environ.get('POSTGRES_USER', 'postgres'),
+        'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+        'HOST': host,
+        'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+        # Pooled connections go back to the pool at the end of each request
+        'CONN_MAX_AGE': 0 if pooled else int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': options,
     }
+
+
+# PostgreSQL when POSTGRES_DB is set, SQLite otherwise. 'replica' is a
+# read-only copy of 'default'; see DATABASE_REPLICAS.
+# SQLite databases created with --run-syncdb, before the api app had
+# migrations, already hold the api.0001_initial schema. Upgrade them once
+# with `manage.py migrate --fake-initial`, then run
+# backfill_conversation_summaries, merge_duplicate_conversations and
+# rebuild_search_index to fill the tables added by api.0002.
+if os.environ.get('POSTGRES_DB'):
+    POSTGRES_HOST = os.environ.get('POSTGRES_HOST', 'localhost')
+    DATABASES = {
+        'default': postgres_database(POSTGRES_HOST),
+        'replica': postgres_database(os.environ.get('POSTGRES_REPLICA_HOST', POSTGRES_HOST)),
+    }
+    # Like SQLite below, tests get a separate, empty replica database
+    DATABASES['replica']['TEST'] = {'NAME': f"test_{os.environ['POSTGRES_DB']}_replica"}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        },
+        # Locally the same file unless DATABASE_REPLICA_NAME points at
+        # another one; tests get a separate, empty database, so a read
+        # that reaches it is easy to tell apart.
+        'replica': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DATABASE_REPLICA_NAME', BASE_DIR / 'db.sqlite3'),
+        },
+    }
+
+# Safe /api/ reads go to one of these aliases (see ReplicaRoutingMiddleware).
+# Empty, every query uses 'default'. A request that writes pins its client
+# to the primary for PIN_SECONDS so it reads its own writes.
+DATABASE_REPLICAS = [
+    alias for alias in os.environ.get('DATABASE_REPLICAS', '').split(',') if alias
+]
+DATABASE_ROUTERS = ['api.db_routers.PrimaryReplicaRouter']
+DATABASE_REPLICA_ROUTING = {
+    'PIN_SECONDS': int(os.environ.get('DATABASE_REPLICA_PIN_SECONDS', '5')),
+}
+
+# Production SQLite profile (api.sqlite_tuning), on by default when DEBUG
+# is off: WAL, synchronous=NORMAL, busy_timeout, mmap and page cache sizes
+# set on every new connection, BEGIN IMMEDIATE transactions, and writes
+# serialized per process with retry and backoff on "database is locked".
+# Check a setup with `manage.py sqlite_stress`. Ignored on PostgreSQL.
+# With serialized writes, a write gives up after at most
+#   (WRITE_RETRIES + 1) * (LOCK_TIMEOUT_MS + SERIALIZED_BUSY_TIMEOUT_MS)
+#   + RETRY_BACKOFF_MS * 1.5 * (2 ** WRITE_RETRIES - 1)
+# about 7.5 s with these values, and holds the per-process lock for at most
+# SERIALIZED_BUSY_TIMEOUT_MS plus the statement's own time per attempt.
+# BUSY_TIMEOUT_MS only applies with SERIALIZE_WRITES off.
+SQLITE_TUNING = {
+    'ENABLED': os.environ.get('SQLITE_PRODUCTION', '0' if DEBUG else '1') == '1',
+    'BUSY_TIMEOUT_MS': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000')),
+    'SERIALIZED_BUSY_TIMEOUT_MS': 100,
+    'LOCK_TIMEOUT_MS': 1000,
+    'WRITE_RETRIES': 5,
+    'RETRY_BACKOFF_MS': 20,
 }
 
 
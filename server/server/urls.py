@@ -18,11 +18,18 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from api.metrics import metrics_view
+from api import views_profiling
 
 
 urlpatterns = [
+    # Request profiles (api.profiling), ahead of the admin catch-all
+    path('admin/profiles/', views_profiling.profile_list, name='profile-list'),
+    path('admin/profiles/<str:profile_id>/', views_profiling.profile_detail, name='profile-detail'),
+    path('admin/profiles/<str:profile_id>/download/', views_profiling.profile_download, name='profile-download'),
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 # Serve media files in development